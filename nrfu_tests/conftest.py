@@ -35,6 +35,7 @@
 import re
 import pytest
 from py.xml import html
+from vane import test_step_client
 
 pytest_plugins = "vane.fixtures"
 
@@ -120,9 +121,5 @@ def pytest_runtest_makereport(item):
     outcome = yield
     report = outcome.get_result()
 
-    if str(item.function.__doc__).split("Args:", maxsplit=1)[0]:
-        report.description = str(item.function.__doc__).split("Args:", maxsplit=1)[0]
-    elif str(item.function.__doc__):
-        report.description = str(item.function.__doc__)
-    else:
-        report.description = "No Description"
+    # parsed once per test function, see test_step_client.function_docs
+    report.description = test_step_client.function_docs(item.function)["description"]
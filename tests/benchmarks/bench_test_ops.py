@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of TestOps instantiation.
+
+Compares the per-instantiation cost of TestOps when the test case name is
+found with inspect.stack(), as before, with the single frame lookup of
+caller_name and with a name passed in, as the tops fixture does.  Tests
+are instantiated under a deep stack, like the one pytest builds.
+
+Usage: python tests/benchmarks/bench_test_ops.py [--depth 80] [--number 2000]
+"""
+
+import argparse
+import inspect
+import logging
+import timeit
+from unittest import mock
+from vane import tests_tools
+
+TEST_SUITE = "test_memory.py"
+TEST_DEFINITIONS = {
+    "test_suites": [
+        {
+            "name": TEST_SUITE,
+            "testcases": [
+                {
+                    "name": "test_memory_utilization_on_",
+                    "show_cmd": "show version",
+                    "expected_output": 80,
+                }
+            ],
+        }
+    ]
+}
+DUT = {
+    "name": "DSR01",
+    "output": {"interface_list": [], "show version": {"json": {}, "text": ""}},
+    "results_dir": "reports/results",
+    "report_dir": "reports",
+}
+
+
+def test_memory_utilization_on_(test_case=None):
+    """Instantiate TestOps the way a test case does"""
+    return tests_tools.TestOps(TEST_DEFINITIONS, TEST_SUITE, DUT, test_case=test_case)
+
+
+def at_depth(depth, func):
+    """Call func below depth extra frames"""
+    if depth:
+        return at_depth(depth - 1, func)
+    return func()
+
+
+def per_call_us(depth, number, func):
+    """Return the microseconds per call of func run below depth frames"""
+    seconds = at_depth(depth, lambda: timeit.timeit(func, number=number))
+    return seconds / number * 1e6
+
+
+def main():
+    """Print the per-instantiation cost of each test case name lookup"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depth", type=int, default=80, help="extra stack frames")
+    parser.add_argument("--number", type=int, default=2000, help="instantiations")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    with mock.patch("vane.tests_tools.caller_name", lambda: inspect.stack()[2][3]):
+        assert test_memory_utilization_on_().test_case == "test_memory_utilization_on_"
+        before = per_call_us(args.depth, args.number // 10 or 1, test_memory_utilization_on_)
+
+    assert test_memory_utilization_on_().test_case == "test_memory_utilization_on_"
+    after = per_call_us(args.depth, args.number, test_memory_utilization_on_)
+    fixture = per_call_us(
+        args.depth, args.number, lambda: test_memory_utilization_on_("test_memory_utilization_on_")
+    )
+
+    print(f"TestOps instantiation, {args.depth} extra frames:")
+    print(f"  inspect.stack()   {before:10.1f} us")
+    print(f"  caller_name()     {after:10.1f} us")
+    print(f"  test_case passed  {fixture:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()
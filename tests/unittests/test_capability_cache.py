@@ -0,0 +1,58 @@
+"""Test class for capability_cache.py"""
+import yaml
+from vane import capability_cache
+
+PLATFORM = ("vEOS-lab", "4.29.2F")
+
+
+def test_platform():
+    """Validates that the platform is read from the json output of show version"""
+    show_version = {"modelName": "vEOS-lab", "version": "4.29.2F", "memTotal": 1}
+
+    assert capability_cache.CapabilityCache.platform(show_version) == PLATFORM
+    assert capability_cache.CapabilityCache.platform({"modelName": "vEOS-lab"}) is None
+    assert capability_cache.CapabilityCache.platform(None) is None
+
+
+def test_add_save_and_load(tmp_path):
+    """Validates that rejected commands are persisted and skipped on the next run"""
+    cache_file = str(tmp_path / "cache" / "capabilities.yaml")
+    show_cmds = ["show version", "show lldp neighbors", "show ip bgp summary"]
+
+    cache = capability_cache.CapabilityCache(cache_file)
+    assert cache.supported_cmds(PLATFORM, "json", show_cmds) == show_cmds
+
+    cache.add(PLATFORM, "json", ["show lldp neighbors"])
+    cache.add(PLATFORM, "json", ["show lldp neighbors"])
+    cache.save()
+
+    with open(cache_file, "r", encoding="utf-8") as yaml_in:
+        assert yaml.safe_load(yaml_in) == {
+            "vEOS-lab": {"4.29.2F": {"json": ["show lldp neighbors"]}}
+        }
+
+    cache = capability_cache.CapabilityCache(cache_file)
+
+    assert cache.supported_cmds(PLATFORM, "json", show_cmds) == [
+        "show version",
+        "show ip bgp summary",
+    ]
+    assert cache.supported_cmds(PLATFORM, "text", show_cmds) == show_cmds
+    assert cache.supported_cmds(("vEOS-lab", "4.30.1F"), "json", show_cmds) == show_cmds
+    assert cache.supported_cmds(None, "json", show_cmds) == show_cmds
+
+
+def test_disabled_cache(tmp_path, mocker):
+    """Validates that a cache without a file neither records nor writes anything"""
+    cache = capability_cache.configure_capability_cache({})
+    dump = mocker.patch("yaml.safe_dump")
+
+    assert not cache.enabled
+    assert capability_cache.get_capability_cache() is cache
+
+    cache.add(PLATFORM, "json", ["show lldp neighbors"])
+    cache.save()
+
+    assert cache.unsupported_cmds(PLATFORM, "json") == []
+    dump.assert_not_called()
+    assert not list(tmp_path.iterdir())
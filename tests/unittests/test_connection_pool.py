@@ -0,0 +1,138 @@
+"""Test class for connection_pool.py"""
+import threading
+import pytest
+from vane import connection_pool
+
+KEY = ("DSR01", "ssh", 60, None)
+
+
+def test_checkout_reuses_released_connection(mocker):
+    """Validates that a healthy released connection is checked out again"""
+    pool = connection_pool.ConnectionPool()
+    conn = mocker.Mock()
+    conn.is_alive.return_value = True
+    create = mocker.Mock(return_value=conn)
+
+    with pool.connection(KEY, create) as pooled_conn:
+        assert pooled_conn is conn
+    assert pool.checkout(KEY, create) is conn
+    assert create.call_count == 1
+
+    # a different timeout is a different connection
+
+    assert pool.checkout(("DSR01", "ssh", 120, None), create) is conn
+    assert create.call_count == 2
+
+
+def test_checkout_is_exclusive(mocker):
+    """Validates that a checked out connection is not handed to a second caller"""
+    pool = connection_pool.ConnectionPool()
+    create = mocker.Mock(side_effect=lambda: mocker.Mock())
+
+    first_conn = pool.checkout(KEY, create)
+    second_conn = pool.checkout(KEY, create)
+
+    assert first_conn is not second_conn
+
+    # both are kept once released, neither overwrites the other
+
+    pool.release(KEY, first_conn)
+    pool.release(KEY, second_conn)
+    pool.close_all()
+
+    first_conn.close.assert_called_once_with()
+    second_conn.close.assert_called_once_with()
+
+
+def test_checkout_concurrently(mocker):
+    """Validates that concurrent callers never share a connection"""
+    pool = connection_pool.ConnectionPool()
+    create = mocker.Mock(side_effect=lambda: mocker.Mock())
+    lock = threading.Lock()
+    in_use = set()
+    shared = []
+
+    def use_conn():
+        for _ in range(50):
+            with pool.connection(KEY, create) as conn:
+                with lock:
+                    shared.append(id(conn) in in_use)
+                    in_use.add(id(conn))
+                with lock:
+                    in_use.discard(id(conn))
+
+    threads = [threading.Thread(target=use_conn) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not any(shared)
+    assert create.call_count <= 8
+
+
+def test_checkout_replaces_dead_connection(mocker):
+    """Validates that a connection failing its health check is closed and replaced"""
+    pool = connection_pool.ConnectionPool()
+    dead_conn, new_conn = mocker.Mock(), mocker.Mock()
+    dead_conn.is_alive.return_value = False
+    create = mocker.Mock(side_effect=[dead_conn, new_conn])
+
+    pool.release(KEY, pool.checkout(KEY, create))
+
+    assert pool.checkout(KEY, create) is new_conn
+    dead_conn.close.assert_called_once_with()
+
+
+def test_idle_eviction(mocker):
+    """Validates that connections idle longer than the idle timeout are closed"""
+    monotonic = mocker.patch("time.monotonic", return_value=100)
+    pool = connection_pool.ConnectionPool(idle_timeout=30)
+    old_conn, new_conn = mocker.Mock(), mocker.Mock()
+    create = mocker.Mock(side_effect=[old_conn, new_conn])
+
+    pool.release(KEY, pool.checkout(KEY, create))
+    monotonic.return_value = 140
+
+    assert pool.checkout(KEY, create) is new_conn
+    old_conn.close.assert_called_once_with()
+    old_conn.is_alive.assert_not_called()
+
+
+def test_discard_and_close_all(mocker):
+    """Validates that discarded and idle connections are closed"""
+    pool = connection_pool.ConnectionPool()
+    first_conn, second_conn = mocker.Mock(), mocker.Mock()
+    second_conn.close.side_effect = OSError("socket is closed")
+
+    pool.discard(KEY, pool.checkout(KEY, lambda: first_conn))
+    first_conn.close.assert_called_once_with()
+
+    with pool.connection(("DCBBW1", "eapi", 0, None), lambda: second_conn):
+        pass
+
+    pool.close_all()
+    second_conn.close.assert_called_once_with()
+    assert first_conn.close.call_count == 1
+
+    # a connection used by a failed block may hold unread output
+
+    third_conn = mocker.Mock()
+    with pytest.raises(TimeoutError):
+        with pool.connection(KEY, lambda: third_conn):
+            raise TimeoutError("read timed out")
+    third_conn.close.assert_called_once_with()
+    assert pool.checkout(KEY, mocker.Mock) is not third_conn
+
+
+def test_configure_connection_pool(mocker):
+    """Validates that configuring a new pool closes the connections of the old one"""
+    conn = mocker.Mock()
+    with connection_pool.get_connection_pool().connection(KEY, lambda: conn):
+        pass
+
+    pool = connection_pool.configure_connection_pool({"conn_pool_idle_timeout": 10})
+
+    assert pool is connection_pool.get_connection_pool()
+    assert pool.idle_timeout == 10
+    conn.close.assert_called_once_with()
@@ -0,0 +1,432 @@
+"""Test class for device_interface.py"""
+import asyncio
+import gzip
+import http.server
+import json
+import re
+import threading
+import time
+from unittest.mock import Mock, call
+import pytest
+from pyeapi.eapilib import CommandError, ConnectionError as EapiConnectionError
+from vane import device_interface
+
+
+# Disable redefined-outer-name for using fixture functions
+# pylint: disable=redefined-outer-name
+
+
+async def serve_eapi(response, status="200 OK", chunked=False):
+    """Start a local HTTP server that answers every eAPI request with response
+
+    Returns:
+        server (asyncio.Server), requests (list): server and the received request bodies
+    """
+    requests = []
+
+    async def handler(reader, writer):
+        headers = {}
+        await reader.readline()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+        requests.append(json.loads(await reader.readexactly(int(headers["content-length"]))))
+
+        body = json.dumps(response).encode()
+        if chunked:
+            half = len(body) // 2
+            payload = (
+                f"{half:x}\r\n".encode()
+                + body[:half]
+                + f"\r\n{len(body) - half:x}\r\n".encode()
+                + body[half:]
+                + b"\r\n0\r\n\r\n"
+            )
+            header = f"HTTP/1.1 {status}\r\nTransfer-Encoding: chunked\r\n\r\n"
+        else:
+            payload = body
+            header = f"HTTP/1.1 {status}\r\nContent-Length: {len(body)}\r\n\r\n"
+        writer.write(header.encode() + payload)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    return server, requests
+
+
+def run_async_conn(response, cmds, encoding="json", status="200 OK", chunked=False):
+    """Run cmds through an AsyncEapiConn against a local eAPI server
+
+    Returns:
+        result (list), requests (list): command output and received request bodies
+    """
+
+    async def run():
+        server, requests = await serve_eapi(response, status, chunked)
+        port = server.sockets[0].getsockname()[1]
+        conn = device_interface.AsyncEapiConn()
+        conn.set_up_conn(
+            {
+                "name": "DSR01",
+                "mgmt_ip": "127.0.0.1",
+                "port": port,
+                "username": "admin",
+                "password": "admin",
+                "transport": "http",
+            }
+        )
+        try:
+            return await conn.run_commands(cmds, encoding=encoding), requests
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_async_eapi_conn_run_commands(chunked):
+    """Validates that AsyncEapiConn sends eAPI requests and strips the enable output"""
+    response = {"jsonrpc": "2.0", "id": "1", "result": [{}, {"modelName": "vEOS"}]}
+
+    result, requests = run_async_conn(response, ["show version"], chunked=chunked)
+
+    assert result == [{"modelName": "vEOS"}]
+    assert requests[0]["method"] == "runCmds"
+    assert requests[0]["params"] == {
+        "version": 1,
+        "cmds": ["enable", "show version"],
+        "format": "json",
+    }
+
+
+def test_async_eapi_conn_command_error():
+    """Validates that eAPI errors are raised as pyeapi CommandErrors"""
+    response = {
+        "jsonrpc": "2.0",
+        "id": "1",
+        "error": {
+            "code": 1002,
+            "message": "CLI command 2 of 2 'show bogus' failed: invalid command",
+            "data": [{}, {"errors": ["Invalid input"]}],
+        },
+    }
+
+    with pytest.raises(CommandError) as exception:
+        run_async_conn(response, ["show bogus"], encoding="text")
+
+    assert "show bogus" in str(exception.value)
+
+
+def test_async_eapi_conn_unauthorized():
+    """Validates that an authentication failure is raised as a pyeapi ConnectionError"""
+
+    with pytest.raises(EapiConnectionError):
+        run_async_conn({}, ["show version"], status="401 Unauthorized")
+
+
+def test_async_eapi_conn_invalid_transport():
+    """Validates that only http and https transports are supported"""
+    conn = device_interface.AsyncEapiConn()
+
+    with pytest.raises(ValueError):
+        conn.set_up_conn(
+            {
+                "name": "DSR01",
+                "mgmt_ip": "1.1.1.1",
+                "username": "",
+                "password": "",
+                "transport": "socket",
+            }
+        )
+
+
+def test_lazy_conn_connects_once_on_first_use():
+    """Validates that LazyConn sets up its driver once, on the first forwarded call"""
+    set_ups = []
+
+    class FakeConn:
+        """Driver that records its set up"""
+
+        def set_up_conn(self, device_data):
+            """Record the set up"""
+            time.sleep(0.01)
+            set_ups.append(device_data["name"])
+
+        def run_commands(self, cmds, encoding="json"):
+            """Echo the commands"""
+            return [{"cmd": cmd, "encoding": encoding} for cmd in cmds]
+
+    conn = device_interface.LazyConn(FakeConn, {"name": "DSR01"})
+
+    assert not conn.connected
+    assert not set_ups
+
+    threads = [
+        threading.Thread(target=conn.run_commands, args=(["show version"],)) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert conn.connected
+    assert set_ups == ["DSR01"]
+    assert conn.run_commands(["show clock"], encoding="text") == [
+        {"cmd": "show clock", "encoding": "text"}
+    ]
+
+    with pytest.raises(AttributeError):
+        _ = conn._missing  # pylint: disable=protected-access
+
+
+class KeepAliveEapiHandler(http.server.BaseHTTPRequestHandler):
+    """eAPI handler that keeps connections open and records them"""
+
+    protocol_version = "HTTP/1.1"
+    connections = []
+    requests = []
+
+    def setup(self):
+        super().setup()
+        self.connections.append(self.client_address)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Answer runCmds with one output per command"""
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(dict(self.headers))
+        result = [{"cmd": cmd} for cmd in request["params"]["cmds"]]
+        body = json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": result}).encode()
+
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep the test output quiet"""
+
+
+@pytest.fixture
+def keepalive_server():
+    """Serve eAPI over http with keep-alive from a background thread"""
+    KeepAliveEapiHandler.connections = []
+    KeepAliveEapiHandler.requests = []
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveEapiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("use_gzip", [False, True])
+def test_pyeapi_conn_keepalive(keepalive_server, use_gzip):
+    """Validates that the keep-alive transport reuses one connection for many requests"""
+    conn = device_interface.PyeapiConn()
+    conn.set_up_conn(
+        {
+            "name": "DSR01",
+            "mgmt_ip": "127.0.0.1",
+            "port": keepalive_server.server_address[1],
+            "username": "admin",
+            "password": "admin",
+            "transport": "http_keepalive",
+            "eapi_gzip": use_gzip,
+        }
+    )
+
+    for _ in range(3):
+        assert conn.run_commands(["show version"]) == [{"cmd": "show version"}]
+
+    assert len(KeepAliveEapiHandler.connections) == 1
+    assert all(
+        ("gzip" in request.get("Accept-Encoding", "")) == use_gzip
+        for request in KeepAliveEapiHandler.requests
+    )
+
+    # a connection closed by the device is reopened once
+
+    conn.close()
+    assert conn.run_commands(["show clock"], encoding="text") == [{"cmd": "show clock"}]
+    assert len(KeepAliveEapiHandler.connections) == 2
+
+
+def test_resuming_https_connection(mocker):
+    """Validates that a reconnect resumes the TLS session, whose TLS 1.3 ticket
+    only arrives after the handshake"""
+    mocker.patch("http.client.HTTPConnection.connect")
+    mocker.patch("http.client.HTTPConnection.getresponse")
+    context = mocker.Mock()
+    transport = device_interface.ResumingHttpsConnection(
+        "/command-api", "127.0.0.1", 443, context=context
+    )
+
+    first_sock = mocker.Mock(session=None)
+    context.wrap_socket.return_value = first_sock
+    transport.connect()
+    assert context.wrap_socket.call_args[1]["session"] is None
+
+    # the ticket is received with the first response
+    first_sock.session = "ticket session"
+    transport.getresponse()
+    assert transport.tls_session == "ticket session"
+
+    first_sock.session = "renewed session"
+    transport.close()
+    transport.connect()
+    assert context.wrap_socket.call_args[1] == {
+        "server_hostname": "127.0.0.1",
+        "session": "renewed session",
+    }
+
+
+def test_pyeapi_conn_checkpoint_config(keepalive_server):
+    """Validates that the checkpoint and the config are sent in a single eAPI request"""
+    conn = device_interface.PyeapiConn()
+    conn.set_up_conn(
+        {
+            "name": "DSR01",
+            "mgmt_ip": "127.0.0.1",
+            "port": keepalive_server.server_address[1],
+            "username": "admin",
+            "password": "admin",
+            "transport": "http_keepalive",
+        }
+    )
+
+    output = conn.checkpoint_config(
+        "configure checkpoint save test", ["interface Ethernet1", "no switchport"]
+    )
+
+    assert output == [{"cmd": "interface Ethernet1"}, {"cmd": "no switchport"}]
+    assert len(KeepAliveEapiHandler.requests) == 1
+
+
+def test_is_rejected_cmd():
+    """Validates that only unsupported commands count as rejected by the device"""
+    assert device_interface.is_rejected_cmd(CommandError(1002, "invalid command"))
+    assert device_interface.is_rejected_cmd(CommandError(1003, "unconverted command"))
+    assert device_interface.is_rejected_cmd(
+        device_interface.CommandError("Could not execute show bogus", ["show bogus"])
+    )
+    assert not device_interface.is_rejected_cmd(CommandError(1000, "internal error"))
+    assert not device_interface.is_rejected_cmd(EapiConnectionError("DSR01", "refused"))
+    assert not device_interface.is_rejected_cmd(ValueError("Expecting value"))
+
+
+def test_pyeapi_conn_is_alive():
+    """Validates that a pyeapi connection whose last request hit a socket error is not alive"""
+    conn = device_interface.PyeapiConn()
+    conn._connection = Mock()  # pylint: disable=protected-access
+    conn._connection.connection.socket_error = None  # pylint: disable=protected-access
+
+    assert conn.is_alive()
+
+    conn._connection.connection.socket_error = OSError("reset")  # pylint: disable=protected-access
+    assert not conn.is_alive()
+
+
+class FakeEosChannel:
+    """Emulates an EOS ssh session which echoes each line written to it after the prompt"""
+
+    base_prompt = "DSR01"
+    outputs = {
+        "show version | json": '{"modelName": "vEOS"}',
+        "show clock | json": '{"utcTime": 1}',
+        "show hostname | json": '{"hostname": "DSR01"}',
+        "show bogus | json": "% Invalid input",
+    }
+
+    def __init__(self):
+        self.writes = []
+        self.buffer = ""
+        self.enable = Mock()
+        self.send_command = Mock()
+
+    def write_channel(self, data):
+        """Echo every line and answer the commands"""
+        self.writes.append(data)
+        for line in data.splitlines():
+            self.buffer += f"DSR01#{line}\r\n"
+            if not line.startswith("!"):
+                self.buffer += f"{self.outputs[line]}\r\n"
+        self.buffer += "DSR01#"
+
+    def read_until_pattern(self, pattern, read_timeout):
+        """Return everything written so far, the pattern has to match it"""
+        assert re.search(pattern, self.buffer)
+        output, self.buffer = self.buffer, ""
+        return output
+
+
+def test_netmiko_conn_batch_cmds(mocker):
+    """Validates that batched ssh commands are sent in one write and enable is entered once"""
+    mocker.patch("os.makedirs")
+    channel = FakeEosChannel()
+    mocker.patch("vane.device_interface.Netmiko", return_value=channel)
+
+    conn = device_interface.NetmikoConn()
+    conn.set_up_conn(
+        {
+            "name": "DSR01",
+            "mgmt_ip": "10.0.0.1",
+            "username": "admin",
+            "password": "admin",
+            "ssh_batch_cmds": True,
+        }
+    )
+
+    output = conn.run_commands(["show version", "show clock", "show hostname"])
+    assert output == [{"modelName": "vEOS"}, {"utcTime": 1}, {"hostname": "DSR01"}]
+    assert len(channel.writes) == 1
+    assert channel.send_command.call_count == 0
+
+    with pytest.raises(device_interface.CommandError):
+        conn.run_commands(["show version", "show bogus"])
+
+    assert channel.enable.call_count == 1
+
+    # a new session enters enable mode again
+    conn.set_up_conn(conn._device_data)  # pylint: disable=protected-access
+    conn.run_commands(["show version", "show clock"])
+    assert channel.enable.call_count == 2
+
+
+def test_netmiko_conn_batch_cmds_missing_marker(mocker):
+    """Validates that batched commands whose output can not be split are resent one by one"""
+    mocker.patch("os.makedirs")
+    channel = FakeEosChannel()
+    mocker.patch("vane.device_interface.Netmiko", return_value=channel)
+    channel.send_command.side_effect = lambda cmd: FakeEosChannel.outputs[cmd]
+
+    conn = device_interface.NetmikoConn()
+    conn.set_up_conn(
+        {
+            "name": "DSR01",
+            "mgmt_ip": "10.0.0.1",
+            "username": "admin",
+            "password": "admin",
+            "ssh_batch_cmds": True,
+        }
+    )
+
+    # the echo of the first marker is lost
+    write_channel = channel.write_channel
+    channel.write_channel = lambda data: write_channel(data.split("\n", 1)[1])
+
+    output = conn.run_commands(["show version", "show clock"])
+
+    assert output == [{"modelName": "vEOS"}, {"utcTime": 1}]
+    assert channel.send_command.call_args_list == [
+        call("show version | json"),
+        call("show clock | json"),
+    ]
@@ -8,6 +8,7 @@ fixtures.py unit tests
 import datetime
 import logging
 import sys
+import threading
 
 from unittest.mock import call
 import pytest
@@ -88,48 +89,48 @@ def test_perform_setup_via_name(loginfo, logdebug, mocker):
     checkpoint_str = f"{test_name}_{date_str}"
     assert checkpoint == checkpoint_str
 
-    # Verify the calls to enable and config
+    # Verify the checkpoint and config are sent to each dut in one request
     dev_intf_calls = [
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
             [
                 "interface Ethernet5",
                 "no switchport",
                 "vrf DVT-2",
                 "ip address 192.168.2.1/31",
                 "ip route vrf DVT-2 0.0.0.0/0 192.168.2.0",
-            ]
+            ],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
-            ["interface Ethernet16", "no switchport", "ip address 192.168.2.2/31"]
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
+            ["interface Ethernet16", "no switchport", "ip address 192.168.2.2/31"],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
             [
                 "interface Ethernet5",
                 "no switchport",
                 "vrf DVT-2",
                 "ip address 192.168.2.3/31",
                 "ip route vrf DVT-2 0.0.0.0/0 192.168.2.0",
-            ]
+            ],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
-            ["interface Ethernet16", "no switchport", "ip address 192.168.2.4/31"]
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
+            ["interface Ethernet16", "no switchport", "ip address 192.168.2.4/31"],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
             [
                 "interface Ethernet5",
                 "no switchport",
                 "vrf DVT-2",
                 "ip address 192.168.2.5/31",
                 "ip route vrf DVT-2 0.0.0.0/0 192.168.2.0",
-            ]
+            ],
         ),
     ]
-    dev_intf.assert_has_calls(dev_intf_calls)
+    dev_intf.assert_has_calls(dev_intf_calls, any_order=True)
 
     # Verify info logging calls
     loginfo_calls = [
@@ -143,7 +144,7 @@ def test_perform_setup_via_name(loginfo, logdebug, mocker):
         call("Sending checkpoint command and config to dut DCBBE1"),
         call("Sending checkpoint command and config to dut DCBBE2"),
     ]
-    loginfo.assert_has_calls(loginfo_calls)
+    loginfo.assert_has_calls(loginfo_calls, any_order=True)
 
     # Verify debug logging calls
     logdebug_calls = [
@@ -187,7 +188,7 @@ def test_perform_setup_via_name(loginfo, logdebug, mocker):
             "192.168.2.5/31', 'ip route vrf DVT-2 0.0.0.0/0 192.168.2.0']"
         ),
     ]
-    logdebug.assert_has_calls(logdebug_calls)
+    logdebug.assert_has_calls(logdebug_calls, any_order=True)
 
 
 def test_perform_setup_via_role(loginfo, logdebug, mocker):
@@ -220,48 +221,48 @@ def test_perform_setup_via_role(loginfo, logdebug, mocker):
     checkpoint_str = f"{test_name}_{date_str}"
     assert checkpoint == checkpoint_str
 
-    # Verify the calls to enable and config
+    # Verify the checkpoint and config are sent to each dut in one request
     dev_intf_calls = [
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
             [
                 "interface Ethernet3",
                 "no switchport",
                 "vrf DVT-2",
                 "ip address 192.168.2.4/31",
                 "ip route vrf DVT-2 0.0.0.0/0 192.168.2.0",
-            ]
+            ],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
             [
                 "interface Ethernet3",
                 "no switchport",
                 "vrf DVT-2",
                 "ip address 192.168.2.4/31",
                 "ip route vrf DVT-2 0.0.0.0/0 192.168.2.0",
-            ]
+            ],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
-            ["interface Ethernet13", "no switchport", "ip address 192.168.2.5/31"]
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
+            ["interface Ethernet13", "no switchport", "ip address 192.168.2.5/31"],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
-            ["interface Ethernet13", "no switchport", "ip address 192.168.2.5/31"]
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
+            ["interface Ethernet13", "no switchport", "ip address 192.168.2.5/31"],
         ),
-        call.PyeapiConn().enable([f"configure checkpoint save {checkpoint_str}"]),
-        call.PyeapiConn().config(
+        call.PyeapiConn().checkpoint_config(
+            f"configure checkpoint save {checkpoint_str}",
             [
                 "interface Ethernet7",
                 "no switchport",
                 "vrf DVT-2",
                 "ip address 192.168.2.6/31",
                 "ip route vrf DVT-2 0.0.0.0/0 192.168.2.0",
-            ]
+            ],
         ),
     ]
-    dev_intf.assert_has_calls(dev_intf_calls)
+    dev_intf.assert_has_calls(dev_intf_calls, any_order=True)
 
     # Verify info logging calls
     loginfo_calls = [
@@ -278,7 +279,7 @@ def test_perform_setup_via_role(loginfo, logdebug, mocker):
         call("Performing setup for role: host3"),
         call("Sending checkpoint command and config to dut DCBBW2"),
     ]
-    loginfo.assert_has_calls(loginfo_calls)
+    loginfo.assert_has_calls(loginfo_calls, any_order=True)
 
     # Verify debug logging calls
     logdebug_calls = [
@@ -317,7 +318,7 @@ def test_perform_setup_via_role(loginfo, logdebug, mocker):
             "192.168.2.6/31', 'ip route vrf DVT-2 0.0.0.0/0 192.168.2.0']"
         ),
     ]
-    logdebug.assert_has_calls(logdebug_calls)
+    logdebug.assert_has_calls(logdebug_calls, any_order=True)
 
 
 def test_perform_teardown_via_name(loginfo, logdebug, mocker):
@@ -356,7 +357,7 @@ def test_perform_teardown_via_name(loginfo, logdebug, mocker):
     # There are 5 duts, each making the same call
     dev_intf_calls = [call.PyeapiConn().config(call_data)] * 5
 
-    dev_intf.assert_has_calls(dev_intf_calls)
+    dev_intf.assert_has_calls(dev_intf_calls, any_order=True)
 
     # Verify info logging calls
     loginfo_calls = [
@@ -369,7 +370,7 @@ def test_perform_teardown_via_name(loginfo, logdebug, mocker):
         call("Restoring configuration and deleting checkpoint on dut DCBBE1"),
         call("Restoring configuration and deleting checkpoint on dut DCBBE2"),
     ]
-    loginfo.assert_has_calls(loginfo_calls)
+    loginfo.assert_has_calls(loginfo_calls, any_order=True)
 
     # Verify debug logging calls
     #   Each dut teardown has 2 debug calls
@@ -383,7 +384,7 @@ def test_perform_teardown_via_name(loginfo, logdebug, mocker):
     #   And there are 5 duts
     logdebug_calls = each_dut_teardown * 5
 
-    logdebug.assert_has_calls(logdebug_calls)
+    logdebug.assert_has_calls(logdebug_calls, any_order=True)
 
 
 def test_perform_teardown_via_role(loginfo, logdebug, mocker):
@@ -422,7 +423,7 @@ def test_perform_teardown_via_role(loginfo, logdebug, mocker):
     # There are 5 duts, each making the same call
     dev_intf_calls = [call.PyeapiConn().config(call_data)] * 5
 
-    dev_intf.assert_has_calls(dev_intf_calls)
+    dev_intf.assert_has_calls(dev_intf_calls, any_order=True)
 
     # Verify info logging calls
     loginfo_calls = [
@@ -438,7 +439,7 @@ def test_perform_teardown_via_role(loginfo, logdebug, mocker):
         call("Performing teardown for role: host3"),
         call("Restoring configuration and deleting checkpoint on dut DCBBW2"),
     ]
-    loginfo.assert_has_calls(loginfo_calls)
+    loginfo.assert_has_calls(loginfo_calls, any_order=True)
 
     # Verify debug logging calls
     #   Each dut teardown has 2 debug calls
@@ -452,4 +453,322 @@ def test_perform_teardown_via_role(loginfo, logdebug, mocker):
     #   And there are 5 duts
     logdebug_calls = each_dut_teardown * 5
 
-    logdebug.assert_has_calls(logdebug_calls)
+    logdebug.assert_has_calls(logdebug_calls, any_order=True)
+
+
+def test_streaming_collection_hooks(mocker):
+    """Validates that tests of collected duts run first and wait for their dut otherwise"""
+    vane.tests_tools.track_collection([{"name": "DSR01"}, {"name": "DCBBW1"}])
+    vane.tests_tools.mark_dut_collected("DCBBW1")
+
+    class_a, class_b = mocker.Mock(), mocker.Mock()
+    items = []
+    for parent, dut_name in [
+        (class_a, "DSR01"),
+        (class_a, "DCBBW1"),
+        (class_b, "DSR01"),
+        (class_b, "DCBBW1"),
+    ]:
+        item = mocker.Mock()
+        item.parent = parent
+        item.callspec.params = {"dut": {"name": dut_name}}
+        items.append(item)
+
+    pytest_config = mocker.Mock()
+    pytest_config.option.loadgroup = False
+    pytest_config.option.dist = "no"
+
+    expected_items = [items[1], items[0], items[3], items[2]]
+    vane.fixtures.pytest_collection_modifyitems(pytest_config, items)
+
+    assert items == expected_items
+
+    wait = mocker.patch("threading.Event.wait")
+    vane.fixtures.pytest_runtest_setup(items[0])
+    wait.assert_not_called()
+
+    vane.fixtures.pytest_runtest_setup(items[1])
+    wait.assert_called_once_with()
+
+    vane.tests_tools.mark_dut_collected("DSR01")
+    vane.fixtures.pytest_runtest_setup(items[1])
+    wait.assert_called_once_with()
+
+    # once every dut is collected the order is left alone
+
+    vane.fixtures.pytest_collection_modifyitems(pytest_config, items)
+    assert items == expected_items
+    assert not any(item.add_marker.called for item in items)
+
+
+def test_setup_waits_for_streaming_collection(mocker):
+    """Validates that a dut is only set up once its show output is collected"""
+    mocker.patch("vane.config.test_parameters", {"parameters": {}})
+    vane.tests_tools.track_collection([{"name": "DSR01"}, {"name": "DCBBW1"}])
+    vane.tests_tools.mark_dut_collected("DCBBW1")
+    duts = {}
+    for name in ["DSR01", "DCBBW1"]:
+        duts[name] = {"name": name, "role": "leaf", "connection": mocker.Mock()}
+    setup_config = {name: {"schema": None, "template": "interface Ethernet1\n"} for name in duts}
+
+    setup = threading.Thread(
+        target=vane.fixtures.perform_setup, args=(duts, "test_setup", setup_config)
+    )
+    setup.start()
+    setup.join(0.2)
+
+    assert setup.is_alive()
+    assert duts["DCBBW1"]["connection"].checkpoint_config.called
+    assert not duts["DSR01"]["connection"].checkpoint_config.called
+
+    vane.tests_tools.mark_dut_collected("DSR01")
+    setup.join()
+
+    assert duts["DSR01"]["connection"].checkpoint_config.called
+    vane.tests_tools.track_collection([])
+
+
+def test_dut_affinity(mocker):
+    """Validates that tests are grouped by dut and suites are set up per dut"""
+    mocker.patch("vane.config.dut_objs", [{"name": "DSR01"}, {"name": "DCBBW1"}])
+    vane.tests_tools.track_collection([])
+
+    pytest_config = mocker.Mock()
+    pytest_config.option.loadgroup = True
+    assert vane.fixtures.dut_affinity(pytest_config)
+
+    dut_item, all_duts_item = mocker.Mock(), mocker.Mock()
+    dut_item.callspec.params = {"dut": {"name": "DSR01"}}
+    all_duts_item.callspec.params = {}
+
+    vane.fixtures.pytest_collection_modifyitems(pytest_config, [dut_item, all_duts_item])
+
+    assert dut_item.add_marker.call_args[0][0].args == ("DSR01",)
+    assert all_duts_item.add_marker.call_args[0][0].args == (vane.fixtures.ALL_DUTS_GROUP,)
+
+    perform_setup = mocker.patch("vane.fixtures.perform_setup", return_value="checkpoint")
+    perform_teardown = mocker.patch("vane.fixtures.perform_teardown")
+    duts = {"DSR01": {"name": "DSR01"}, "DCBBW1": {"name": "DCBBW1"}}
+    suite_setup = vane.fixtures.DutSuiteSetup(duts, "TestSuite", {"key": "name"})
+
+    suite_setup.setup(["DSR01"])
+    suite_setup.setup(["DSR01"])
+    perform_setup.assert_called_once_with({"DSR01": duts["DSR01"]}, "TestSuite", {"key": "name"})
+
+    suite_setup.teardown()
+    perform_teardown.assert_called_once_with(
+        {"DSR01": duts["DSR01"]}, "checkpoint", {"key": "name"}
+    )
+
+
+def test_dut_affinity_runs_all_duts_tests_last(mocker, tmp_path):
+    """Validates that tests of every dut run after the tests of single duts
+    finished on every worker"""
+    mocker.patch("vane.config.dut_objs", [{"name": "DSR01"}, {"name": "DCBBW1"}])
+    vane.tests_tools.track_collection([])
+
+    pytest_config = mocker.Mock()
+    pytest_config.option.loadgroup = True
+
+    items = []
+    for nodeid, params in [
+        ("test_all_a", {}),
+        ("test_dsr01", {"dut": {"name": "DSR01"}}),
+        ("test_all_b", {}),
+        ("test_dcbbw1", {"dut": {"name": "DCBBW1"}}),
+    ]:
+        item = mocker.Mock()
+        item.nodeid = nodeid
+        item.config = pytest_config
+        item.callspec.params = params
+        items.append(item)
+
+    vane.fixtures.pytest_collection_modifyitems(pytest_config, items)
+    assert [item.nodeid for item in items] == [
+        "test_dsr01",
+        "test_dcbbw1",
+        "test_all_a",
+        "test_all_b",
+    ]
+
+    mocker.patch.dict("os.environ", {"VANE_DUT_PHASE": str(tmp_path), "PYTEST_XDIST_WORKER": "gw0"})
+    (tmp_path / "gw1").write_text("1")
+    vane.fixtures.pytest_runtest_logfinish("test_all_a", None)
+    assert not (tmp_path / "gw0").exists()
+
+    # the worker of DSR01 waits for DCBBW1 on gw1 and vice versa
+    sleep = mocker.patch("time.sleep")
+    vane.fixtures.pytest_runtest_logfinish("test_dsr01@DSR01", None)
+    assert (tmp_path / "gw0").read_text() == "1"
+    vane.fixtures.pytest_runtest_logfinish("test_all_b@all_duts", None)
+    assert (tmp_path / "gw0").read_text() == "1"
+
+    vane.fixtures.pytest_runtest_setup(items[2])
+    sleep.assert_not_called()
+
+    vane.fixtures.dut_phase["done"] = False
+    (tmp_path / "gw1").write_text("0")
+    sleep.side_effect = lambda _: (tmp_path / "gw1").write_text("1")
+    vane.fixtures.pytest_runtest_setup(items[2])
+    sleep.assert_called_once_with(vane.fixtures.DUT_PHASE_POLL_INTERVAL)
+
+    # tests of single duts that never finish only hold the run until the stall timeout
+    vane.fixtures.dut_phase["done"] = False
+    (tmp_path / "gw1").write_text("0")
+    sleep.side_effect = None
+    mocker.patch("time.monotonic", side_effect=[0, 0, vane.fixtures.DUT_PHASE_STALL_TIMEOUT + 1])
+    vane.fixtures.wait_for_dut_tests()
+    assert vane.fixtures.dut_phase["done"]
+
+
+def test_perform_setup_failure_restores_touched_duts(mocker):
+    """Validates that a failed setup restores only the duts it sent config to"""
+    mocker.patch("vane.config.test_parameters", {"parameters": {"setup_max_workers": 1}})
+    duts = {}
+    for name in ["DSR01", "DCBBW1", "DCBBW2"]:
+        duts[name] = {"name": name, "role": "leaf", "connection": mocker.Mock()}
+    duts["DCBBW1"]["connection"].checkpoint_config.side_effect = ValueError("config failed")
+    setup_config = {name: {"schema": None, "template": "interface Ethernet1\n"} for name in duts}
+
+    with pytest.raises(ValueError):
+        vane.fixtures.perform_setup(duts, "test_setup", setup_config)
+
+    assert duts["DSR01"]["connection"].config.call_count == 1
+    assert duts["DCBBW1"]["connection"].config.call_count == 1
+    assert not duts["DCBBW2"]["connection"].checkpoint_config.called
+    assert not duts["DCBBW2"]["connection"].config.called
+
+
+def test_reuse_test_setup(mocker):
+    """Validates that tests sharing a setup file run together and set it up once"""
+    mocker.patch("vane.config.test_parameters", {"parameters": {"reuse_test_setup": True}})
+    mocker.patch("vane.config.dut_objs", [{"name": "DSR01"}])
+    mocker.patch(
+        "vane.config.test_defs",
+        {
+            "test_suites": [
+                {
+                    "name": "test_suite.py",
+                    "dir_path": "tests",
+                    "testcases": [
+                        {"name": "test_x"},
+                        {"name": "test_a", "test_setup": "setup_a.yaml"},
+                        {"name": "test_b", "test_setup": "setup_b.yaml"},
+                        {"name": "test_y"},
+                        {"name": "test_c", "test_setup": "setup_a.yaml"},
+                        {"name": "test_d"},
+                    ],
+                }
+            ]
+        },
+    )
+    import_yaml = mocker.patch("vane.tests_tools.import_yaml", return_value={"key": "name"})
+    perform_setup = mocker.patch("vane.fixtures.perform_setup", return_value="checkpoint")
+    perform_teardown = mocker.patch("vane.fixtures.perform_teardown")
+
+    items = []
+    for name in ["test_x", "test_a", "test_b", "test_y", "test_c", "test_d"]:
+        item = mocker.Mock(originalname=name)
+        item.parent = "TestSuite"
+        item.config.option.loadgroup = False
+        item.config.option.dist = "no"
+        items.append(item)
+
+    # only tests with a setup file move
+    items = vane.fixtures.order_by_setup(items)
+    assert [item.originalname for item in items] == [
+        "test_x",
+        "test_a",
+        "test_c",
+        "test_b",
+        "test_y",
+        "test_d",
+    ]
+
+    duts = {"DSR01": {"name": "DSR01"}}
+    for item, nextitem in zip(items, items[1:] + [None]):
+        vane.fixtures.start_testcase_setup(item, duts, item.originalname)
+        vane.fixtures.end_testcase_setup(item, nextitem)
+
+    assert import_yaml.call_args_list == [call("tests/setup_a.yaml"), call("tests/setup_b.yaml")]
+    assert [setup[0][1] for setup in perform_setup.call_args_list] == ["test_a", "test_b"]
+    assert perform_teardown.call_count == 2
+    assert not vane.fixtures.active_testcase_setup
+
+
+def test_reuse_test_setup_is_opt_in(mocker):
+    """Validates that a test case setup is restored after each test unless
+    reuse_test_setup is set"""
+    mocker.patch("vane.config.test_parameters", {"parameters": {}})
+    mocker.patch("vane.config.dut_objs", [{"name": "DSR01"}])
+    mocker.patch("vane.fixtures.testcase_setup_file", return_value="tests/setup_a.yaml")
+    mocker.patch("vane.tests_tools.import_yaml", return_value={"key": "name"})
+    perform_setup = mocker.patch("vane.fixtures.perform_setup", return_value="checkpoint")
+    perform_teardown = mocker.patch("vane.fixtures.perform_teardown")
+
+    assert not vane.fixtures.reuse_test_setup()
+
+    items = []
+    for name in ["test_a", "test_b"]:
+        item = mocker.Mock(originalname=name)
+        item.parent = "TestSuite"
+        item.config.option.loadgroup = False
+        item.config.option.dist = "no"
+        items.append(item)
+
+    duts = {"DSR01": {"name": "DSR01"}}
+    for item, nextitem in zip(items, items[1:] + [None]):
+        vane.fixtures.start_testcase_setup(item, duts, item.originalname)
+        vane.fixtures.end_testcase_setup(item, nextitem)
+
+    assert perform_setup.call_count == 2
+    assert perform_teardown.call_count == 2
+
+
+def test_reuse_test_setup_next_test_skipped(mocker):
+    """Validates that a setup kept for a skipped test is restored when its
+    class or the session ends"""
+    mocker.patch("vane.config.test_parameters", {"parameters": {"reuse_test_setup": True}})
+    mocker.patch("vane.config.dut_objs", [{"name": "DSR01"}])
+    mocker.patch("vane.config.test_defs", {"test_suites": []})
+    mocker.patch("vane.fixtures.testcase_setup_file", return_value="tests/setup_a.yaml")
+    mocker.patch("vane.tests_tools.import_yaml", return_value={"key": "name"})
+    mocker.patch("vane.fixtures.perform_setup", return_value="checkpoint")
+    perform_teardown = mocker.patch("vane.fixtures.perform_teardown")
+    mocker.patch("vane.fixtures.get_current_fixture_testclass", return_value="TestSuite")
+
+    items = []
+    for name in ["test_a", "test_b"]:
+        item = mocker.Mock(originalname=name)
+        item.parent = "TestSuite"
+        item.config.option.loadgroup = False
+        item.config.option.dist = "no"
+        items.append(item)
+
+    duts = {"DSR01": {"name": "DSR01"}}
+
+    # test_b shares the setup but is skipped, so its setup_testcase never runs
+    request = mocker.Mock()
+    request.config.option.loadgroup = False
+    request.config.option.dist = "no"
+    suite = vane.fixtures.setup_testsuite.__wrapped__(request, duts)
+    next(suite)
+    vane.fixtures.start_testcase_setup(items[0], duts, "test_a")
+    vane.fixtures.end_testcase_setup(items[0], items[1])
+    assert vane.fixtures.active_testcase_setup
+
+    with pytest.raises(StopIteration):
+        next(suite)
+    assert not vane.fixtures.active_testcase_setup
+    assert call(duts, "checkpoint", {"key": "name"}) in perform_teardown.call_args_list
+
+    # the session restores a setup left by tests outside a class
+    perform_teardown.reset_mock()
+    vane.fixtures.start_testcase_setup(items[0], duts, "test_a")
+    vane.fixtures.end_testcase_setup(items[0], items[1])
+    session = vane.fixtures.testcase_setups.__wrapped__(None)
+    next(session)
+    with pytest.raises(StopIteration):
+        next(session)
+    perform_teardown.assert_called_once_with(duts, "checkpoint", {"key": "name"})
+    assert not vane.fixtures.active_testcase_setup
@@ -0,0 +1,153 @@
+"""Test class for output_store.py"""
+import gc
+import os
+import pytest
+from vane import output_store, tests_tools
+from vane.utils import RawJson
+
+
+def test_output_file_append_read(tmp_path):
+    """Validates that values are read back from the file as it grows"""
+    output_file = output_store.OutputFile(str(tmp_path / "DSR01.outputs"))
+
+    first = output_file.append({"modelName": "vEOS"})
+    assert output_file.read(first) == {"modelName": "vEOS"}
+
+    second = output_file.append("Arista vEOS\n")
+    assert output_file.read(second) == "Arista vEOS\n"
+    assert output_file.read(first) == {"modelName": "vEOS"}
+
+    output_file.close()
+
+
+def test_dut_output(tmp_path):
+    """Validates that show outputs are stored on disk and decoded on read"""
+    store = output_store.OutputStore(str(tmp_path))
+    dut = {"name": "DSR01"}
+    dut["output"] = store.new_output(dut)
+
+    dut["output"]["interface_list"] = ["Ethernet1"]
+    tests_tools.add_dut_output(
+        dut,
+        ["show version", "show clock"],
+        ([{"modelName": "vEOS"}], ["show version"]),
+        ([{"output": "Arista vEOS"}, {"output": "Tue Oct 17"}], ["show version", "show clock"]),
+    )
+
+    assert isinstance(dut["output"], output_store.DutOutput)
+    assert sorted(dut["output"]) == ["interface_list", "show clock", "show version"]
+    assert dut["output"]["interface_list"] == ["Ethernet1"]
+    assert dut["output"]["show version"] == {"json": {"modelName": "vEOS"}, "text": "Arista vEOS"}
+    assert dut["output"]["show clock"] == {"json": "", "text": "Tue Oct 17"}
+    assert (tmp_path / "DSR01.outputs").stat().st_size > 0
+
+    # decoded outputs are shared while referenced and released afterwards
+    output = dut["output"]["show version"]
+    assert dut["output"]["show version"] is output
+    del output
+    gc.collect()
+    assert not dut["output"]._decoded  # pylint: disable=protected-access
+    assert dut["output"]["show version"]["json"] == {"modelName": "vEOS"}
+
+    # updates are written back to the store
+    dut["output"]["show version"]["text"] = "updated"
+    assert dut["output"]["show version"]["text"] == "updated"
+
+    store.close_all()
+
+
+def test_stored_output_decodes_fields_on_read(mocker, tmp_path):
+    """Validates that only the fields of an output that are read get decoded"""
+    store = output_store.OutputStore(str(tmp_path))
+    dut = {"name": "DSR01"}
+    dut["output"] = store.new_output(dut)
+    dut["output"]["show version"] = {"json": {"modelName": "vEOS"}, "text": "Arista vEOS"}
+    read = mocker.spy(dut["output"].output_file, "read")
+
+    output = dut["output"]["show version"]
+
+    assert "text" in output
+    assert sorted(output) == ["json", "text"]
+    assert read.call_count == 0
+
+    assert output["json"] == {"modelName": "vEOS"}
+    assert output["json"] == {"modelName": "vEOS"}
+    assert read.call_count == 1
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_output_store_keeps_no_files_open(tmp_path):
+    """Validates that a store for many duts does not keep a file open per dut"""
+    store = output_store.OutputStore(str(tmp_path))
+    fd_dir = f"/proc/{os.getpid()}/fd"
+    open_fds = len(os.listdir(fd_dir))
+    duts = []
+
+    for index in range(200):
+        dut = {"name": f"DSR{index}"}
+        dut["output"] = store.new_output(dut)
+        dut["output"]["show version"] = {"json": {"index": index}}
+        duts.append(dut)
+
+    assert duts[150]["output"]["show version"]["json"] == {"index": 150}
+    assert len(os.listdir(fd_dir)) <= open_fds + 1
+
+    store.close_all()
+
+
+def test_dut_output_lazy_text(mocker, tmp_path):
+    """Validates that text output collected lazily is fetched on first read and stored"""
+    store = output_store.OutputStore(str(tmp_path))
+    dut = {"name": "DSR01", "connection": mocker.Mock(), "text_conn": mocker.Mock()}
+    dut["output"] = store.new_output(dut, tests_tools.fetch_text)
+    send_cmds = mocker.patch(
+        "vane.tests_tools.send_cmds", return_value=([{"output": "Arista vEOS"}], ["show version"])
+    )
+
+    tests_tools.add_dut_output(dut, ["show version"], ([{"modelName": "vEOS"}], ["show version"]))
+
+    assert "text" not in dut["output"]["show version"]
+    assert dut["output"]["show version"]["text"] == "Arista vEOS"
+    assert dut["output"]["show version"].get("text") == "Arista vEOS"
+    assert send_cmds.call_count == 1
+
+    tests_tools.fetch_text(dut, ["show version"])
+    assert send_cmds.call_count == 1
+
+    store.close_all()
+
+
+def test_dut_output_raw_json(tmp_path):
+    """Validates that raw json is stored undecoded and decoded on read"""
+    store = output_store.OutputStore(str(tmp_path))
+    dut = {"name": "DSR01"}
+    dut["output"] = store.new_output(dut)
+
+    tests_tools.add_dut_output(
+        dut,
+        ["show version"],
+        ([RawJson('{"modelName": "vEOS"}')], ["show version"]),
+        ([{"output": "Arista vEOS"}], ["show version"]),
+    )
+
+    assert (tmp_path / "DSR01.outputs").read_bytes().startswith(b'{"modelName": "vEOS"}')
+    assert dut["output"]["show version"]["json"] == {"modelName": "vEOS"}
+
+    store.close_all()
+
+
+def test_configure_output_store(tmp_path):
+    """Validates that the store is only enabled with an output directory"""
+    store = output_store.configure_output_store({})
+
+    assert output_store.get_output_store() is store
+    assert not store.enabled
+    assert store.new_output({"name": "DSR01"}) == {}
+
+    store = output_store.configure_output_store({"output_store": str(tmp_path)})
+
+    assert output_store.get_output_store() is store
+    assert store.enabled
+    assert isinstance(store.new_output({"name": "DSR01"}), output_store.DutOutput)
+
+    output_store.configure_output_store({})
@@ -0,0 +1,134 @@
+"""Test class for request_scheduler.py"""
+import asyncio
+import threading
+import time
+from vane import request_scheduler
+
+
+def run_concurrently(scheduler, duts, hold=0.05):
+    """Run one request per dut in its own thread and record the peak concurrency
+
+    Returns:
+        peak (dict): peak number of requests in flight overall and per role
+    """
+    lock = threading.Lock()
+    in_flight = {"all": 0}
+    peak = {"all": 0}
+
+    def request(dut):
+        with scheduler.slot(dut):
+            with lock:
+                for key in ("all", dut["role"]):
+                    in_flight[key] = in_flight.get(key, 0) + 1
+                    peak[key] = max(peak.get(key, 0), in_flight[key])
+            time.sleep(hold)
+            with lock:
+                for key in ("all", dut["role"]):
+                    in_flight[key] -= 1
+
+    threads = [threading.Thread(target=request, args=(dut,)) for dut in duts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return peak
+
+
+def test_slot_global_cap():
+    """Validates that the scheduler caps the requests in flight across duts"""
+    scheduler = request_scheduler.RequestScheduler(max_in_flight=2)
+    duts = [{"name": f"leaf{index}", "role": "leaf"} for index in range(6)]
+
+    peak = run_concurrently(scheduler, duts)
+
+    assert peak["all"] == 2
+
+
+def test_slot_role_cap():
+    """Validates that a role limit only applies to duts of that role"""
+    scheduler = request_scheduler.RequestScheduler(max_in_flight=0, role_limits={"spine": 1})
+    duts = [{"name": f"spine{index}", "role": "spine"} for index in range(3)]
+    duts += [{"name": f"leaf{index}", "role": "leaf"} for index in range(3)]
+
+    peak = run_concurrently(scheduler, duts)
+
+    assert peak["spine"] == 1
+    assert peak["leaf"] == 3
+
+
+def test_slot_role_cap_does_not_hold_global_slots():
+    """Validates that requests queued on a capped role leave global slots to other roles"""
+    scheduler = request_scheduler.RequestScheduler(max_in_flight=4, role_limits={"spine": 1})
+    duts = [{"name": f"spine{index}", "role": "spine"} for index in range(6)]
+    duts += [{"name": f"leaf{index}", "role": "leaf"} for index in range(3)]
+
+    peak = run_concurrently(scheduler, duts)
+
+    assert peak["spine"] == 1
+    assert peak["leaf"] == 3
+    assert peak["all"] == 4
+
+
+def test_slot_rate_limit(mocker):
+    """Validates that requests to the same dut are spaced by the rate limit"""
+    mocker.patch("time.monotonic", return_value=100.0)
+    sleep = mocker.patch("time.sleep")
+    scheduler = request_scheduler.RequestScheduler(rate_limit=4)
+    dut = {"name": "leaf1", "role": "leaf"}
+
+    for _ in range(3):
+        with scheduler.slot(dut):
+            pass
+
+    # first request goes out immediately, the next ones are paced 0.25s apart
+    assert [args[0][0] for args in sleep.call_args_list] == [0.25, 0.5]
+
+    # other duts are paced independently
+    with scheduler.slot({"name": "leaf2", "role": "leaf"}):
+        pass
+    assert sleep.call_count == 2
+
+
+def test_async_slot_global_cap():
+    """Validates that the asyncio slot shares the limits of the scheduler"""
+    scheduler = request_scheduler.RequestScheduler(max_in_flight=3)
+    state = {"in_flight": 0, "peak": 0}
+
+    async def request(dut):
+        async with scheduler.async_slot(dut):
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.01)
+            state["in_flight"] -= 1
+
+    async def run():
+        await asyncio.gather(*(request({"name": f"leaf{index}"}) for index in range(10)))
+
+    # semaphores are rebound to each new event loop
+    asyncio.run(run())
+    asyncio.run(run())
+
+    assert state["peak"] == 3
+
+
+def test_configure_scheduler():
+    """Validates that the scheduler is built from the definitions parameters"""
+    scheduler = request_scheduler.configure_scheduler(
+        {
+            "collection_max_in_flight": 10,
+            "collection_rate_limit": 5,
+            "collection_role_limits": {"spine": 2},
+        }
+    )
+
+    assert request_scheduler.get_scheduler() is scheduler
+    assert scheduler.max_in_flight == 10
+    assert scheduler.rate_limit == 5
+    assert scheduler.role_limits == {"spine": 2}
+
+    scheduler = request_scheduler.configure_scheduler({})
+
+    # the in-flight cap is opt-in
+    assert scheduler.max_in_flight is None
+    assert scheduler.rate_limit == 0
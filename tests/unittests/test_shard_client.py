@@ -0,0 +1,181 @@
+"""Test class for shard_client.py"""
+import json
+import os
+import stat
+import pytest
+import yaml
+from vane import shard_client
+from vane.tests_tools import import_yaml
+
+
+def write_inputs(tmp_path, dut_count):
+    """Write a definitions and a duts file with results inside tmp_path
+
+    Returns:
+        definitions_file (str), duts_file (str): input files
+    """
+    report_dir = str(tmp_path / "reports")
+    definitions = {
+        "parameters": {
+            "html_report": f"{report_dir}/report",
+            "json_report": f"{report_dir}/report",
+            "report_dir": report_dir,
+            "results_dir": f"{report_dir}/results",
+            "test_dirs": ["tests/unittests/fixtures/test_steps"],
+        }
+    }
+    duts = {
+        "duts": [
+            {
+                "name": f"DSR0{dut}",
+                "mgmt_ip": f"10.0.0.{dut}",
+                "username": "cvpadmin",
+                "password": "cvp123!",
+            }
+            for dut in range(dut_count)
+        ],
+        "servers": [],
+    }
+
+    definitions_file = str(tmp_path / "definitions.yaml")
+    duts_file = str(tmp_path / "duts.yaml")
+    with open(definitions_file, "w", encoding="utf-8") as file:
+        yaml.safe_dump(definitions, file)
+    with open(duts_file, "w", encoding="utf-8") as file:
+        yaml.safe_dump(duts, file)
+
+    return definitions_file, duts_file
+
+
+def fake_shard_run(shard_dir):
+    """Write the results a vane run of the shard leaves behind"""
+    parameters = import_yaml(shard_client.shard_files(shard_dir)[0])["parameters"]
+    dut_name = import_yaml(shard_client.shard_files(shard_dir)[1])["duts"][0]["name"]
+
+    os.makedirs(parameters["results_dir"])
+    with open(f"{parameters['results_dir']}/result-test_version-{dut_name}.yml", "w") as file:
+        yaml.safe_dump({"dut": dut_name}, file)
+
+    evidence = f"{parameters['report_dir']}/TEST RESULTS/1.1 test_version"
+    os.makedirs(evidence)
+    with open(f"{evidence}/1.1 {dut_name} Verify version.txt", "w") as file:
+        file.write(dut_name)
+
+    report = {
+        "report": {
+            "created_at": f"2023-10-17 10:0{dut_name[-1]}:00",
+            "environment": {"Python": "3.9"},
+            "tests": [{"name": f"test_version[{dut_name}]", "outcome": "passed"}],
+            "summary": {"passed": 1, "num_tests": 1, "duration": 2.0 + int(dut_name[-1])},
+        }
+    }
+    with open(f"{parameters['json_report']}.json", "w") as file:
+        json.dump(report, file)
+
+    shard_client.mark_shard_done(shard_dir, 0)
+
+
+def test_write_shards(tmp_path):
+    """Validates that duts are split round robin and shard results stay in the shard"""
+    definitions_file, duts_file = write_inputs(tmp_path, 5)
+    client = shard_client.ShardClient(definitions_file, duts_file, 2)
+
+    shard_dirs = client.write_shards()
+
+    assert shard_dirs == [str(tmp_path / "reports/shards/shard-0"), f"{client.shard_dir}/shard-1"]
+    shard_duts = [import_yaml(shard_client.shard_files(shard)[1])["duts"] for shard in shard_dirs]
+    assert [[dut["name"] for dut in duts] for duts in shard_duts] == [
+        ["DSR00", "DSR02", "DSR04"],
+        ["DSR01", "DSR03"],
+    ]
+
+    parameters = import_yaml(shard_client.shard_files(shard_dirs[1])[0])["parameters"]
+    assert parameters["report_dir"] == f"{shard_dirs[1]}/reports"
+    assert parameters["results_dir"] == f"{shard_dirs[1]}/reports/results"
+    assert parameters["json_report"] == f"{shard_dirs[1]}/reports/report"
+    assert parameters["test_dirs"] == ["tests/unittests/fixtures/test_steps"]
+
+    # credentials stay in the coordinator duts file
+
+    for shard in shard_dirs:
+        with open(shard_client.shard_files(shard)[1], encoding="utf-8") as file:
+            assert "cvp123!" not in file.read()
+
+    shard_duts_file = shard_client.write_shard_duts(shard_client.shard_files(shard_dirs[1])[1])
+    try:
+        assert stat.S_IMODE(os.stat(shard_duts_file).st_mode) == 0o600
+        assert import_yaml(shard_duts_file) == {
+            "duts": [import_yaml(duts_file)["duts"][1], import_yaml(duts_file)["duts"][3]],
+            "servers": [],
+        }
+    finally:
+        os.remove(shard_duts_file)
+
+    # more shards than duts leaves no empty shard
+    assert len(shard_client.ShardClient(definitions_file, duts_file, 8).split_duts()) == 5
+
+
+def test_run_merges_shards(mocker, tmp_path):
+    """Validates that results, pytest json and evidence of all shards are merged"""
+    definitions_file, duts_file = write_inputs(tmp_path, 2)
+    client = shard_client.ShardClient(definitions_file, duts_file, 2)
+    launch = mocker.patch.object(
+        client, "launch_local", side_effect=lambda dirs: [fake_shard_run(d) for d in dirs]
+    )
+    os.makedirs(tmp_path / "reports/results")
+    (tmp_path / "reports/results/result-stale-DSR09.yml").write_text("dut: DSR09")
+
+    statuses = client.run()
+
+    launch.assert_called_once()
+    assert [status["exit_code"] for status in statuses.values()] == [0, 0]
+    assert sorted(os.listdir(tmp_path / "reports/results")) == [
+        "result-test_version-DSR00.yml",
+        "result-test_version-DSR01.yml",
+    ]
+    assert sorted(os.listdir(tmp_path / "reports/TEST RESULTS/1.1 test_version")) == [
+        "1.1 DSR00 Verify version.txt",
+        "1.1 DSR01 Verify version.txt",
+    ]
+
+    with open(tmp_path / "reports/report.json", encoding="utf-8") as file:
+        report = json.load(file)["report"]
+    assert [test["name"] for test in report["tests"]] == [
+        "test_version[DSR00]",
+        "test_version[DSR01]",
+    ]
+    assert report["summary"] == {"passed": 2, "num_tests": 2, "duration": 3.0}
+    assert report["created_at"] == "2023-10-17 10:00:00"
+    assert report["environment"] == {"Python": "3.9"}
+
+
+def test_launch_local(mocker, tmp_path):
+    """Validates that local shards run as vane subprocesses and crashed shards are marked done"""
+    definitions_file, duts_file = write_inputs(tmp_path, 2)
+    client = shard_client.ShardClient(definitions_file, duts_file, 2)
+    shard_dirs = client.write_shards()
+    popen = mocker.patch("subprocess.Popen")
+    popen.return_value.wait.return_value = 3
+
+    client.launch_local(shard_dirs)
+
+    assert popen.call_args_list[1][0][0][1:] == [
+        "-m",
+        "vane.vane_cli",
+        "--run-shard",
+        shard_dirs[1],
+    ]
+    # each shard clears and writes its own logs
+    assert popen.call_args_list[1][1]["env"]["VANE_LOG_ROOT"] == shard_dirs[1]
+    assert shard_client.shard_done(shard_dirs[0])["exit_code"] == 3
+
+
+def test_wait_for_shards_timeout(tmp_path):
+    """Validates that the file launcher gives up on shards which never finish"""
+    definitions_file, duts_file = write_inputs(tmp_path, 2)
+    client = shard_client.ShardClient(definitions_file, duts_file, 2)
+    shard_dirs = client.write_shards()
+    shard_client.mark_shard_done(shard_dirs[0], 0)
+
+    with pytest.raises(TimeoutError):
+        client.wait_for_shards(shard_dirs, timeout=0, interval=0)
@@ -0,0 +1,157 @@
+"""Test class for snapshot.py"""
+import os
+import stat
+import yaml
+import vane.config
+from vane import device_interface, output_store, snapshot, tests_tools
+from vane.utils import RawJson
+
+
+TEST_PARAMETERS = {
+    "parameters": {"eos_conn": "eapi", "results_dir": "reports/results", "report_dir": "reports"}
+}
+TEST_DUTS = {
+    "duts": [
+        {
+            "name": "DSR01",
+            "mgmt_ip": "10.255.106.71",
+            "username": "cvpadmin",
+            "password": "cvp123!",
+            "role": "leaf",
+            "neighbors": [],
+            "transport": "https",
+        }
+    ]
+}
+
+
+def write_duts_file(tmp_path):
+    """Write TEST_DUTS to a duts file
+
+    Returns:
+        duts_file (str): path of the duts file
+    """
+    duts_file = str(tmp_path / "duts.yaml")
+    with open(duts_file, "w", encoding="utf-8") as duts_out:
+        yaml.dump(TEST_DUTS, duts_out)
+
+    return duts_file
+
+
+def test_write_load_snapshot(mocker, tmp_path):
+    """Validates that workers load the collected duts with new, unconnected connections"""
+    dut = tests_tools.login_duts(TEST_PARAMETERS, TEST_DUTS)[0]
+    dut["output"] = {"interface_list": [{"interface_name": "Ethernet1"}]}
+    dut["failed_cmds"] = {"json": ["show bogus"]}
+    tests_tools.add_dut_output(
+        dut,
+        ["show version", "show clock"],
+        ([RawJson('{"modelName": "vEOS"}'), {"utcTime": 1}], ["show version", "show clock"]),
+    )
+    dut["output"]["show clock"]["text"] = "Tue Oct 17"
+    test_defs = {"test_suites": [{"name": "test_suite.py", "testcases": []}]}
+    duts_file = write_duts_file(tmp_path)
+
+    snapshot_file = snapshot.write_snapshot([dut], test_defs, TEST_PARAMETERS, duts_file)
+    assert isinstance(dict.__getitem__(dut["output"]["show version"], "json"), RawJson)
+
+    # the snapshot is private and holds no credentials
+    assert stat.S_IMODE(os.stat(snapshot_file).st_mode) == 0o600
+    with open(snapshot_file, "r", encoding="utf-8") as snapshot_in:
+        assert "cvp123!" not in snapshot_in.read()
+
+    mocker.patch.object(vane.config, "dut_objs", [])
+    mocker.patch.object(vane.config, "test_defs", {})
+    mocker.patch.object(vane.config, "test_parameters", {})
+    mocker.patch.object(vane.config, "test_duts", {})
+
+    # only pytest-xdist workers load the snapshot
+    mocker.patch.dict("os.environ", {snapshot.SNAPSHOT_ENV: snapshot_file})
+    mocker.patch.dict("os.environ").pop("PYTEST_XDIST_WORKER", None)
+    assert not snapshot.load_worker_snapshot()
+
+    mocker.patch.dict("os.environ", {"PYTEST_XDIST_WORKER": "gw0"})
+    assert snapshot.load_worker_snapshot()
+
+    assert vane.config.test_defs == test_defs
+    assert vane.config.test_parameters == TEST_PARAMETERS
+    assert vane.config.test_duts == TEST_DUTS
+
+    loaded = vane.config.dut_objs[0]
+    assert loaded["name"] == "DSR01"
+    assert loaded["password"] == "cvp123!"
+    assert loaded["failed_cmds"] == {"json": ["show bogus"]}
+    assert isinstance(loaded["connection"], device_interface.LazyConn)
+    assert not loaded["connection"].connected
+    assert loaded["output"]["interface_list"] == [{"interface_name": "Ethernet1"}]
+    # raw json is written as collected and decoded by the worker on first read
+    assert isinstance(dict.__getitem__(loaded["output"]["show version"], "json"), RawJson)
+    assert loaded["output"]["show version"]["json"] == {"modelName": "vEOS"}
+    assert loaded["output"]["show clock"] == {"json": {"utcTime": 1}, "text": "Tue Oct 17"}
+
+    # text output that was not fetched yet is fetched by the worker
+    send_cmds = mocker.patch(
+        "vane.tests_tools.send_cmds", return_value=([{"output": "Arista vEOS"}], ["show version"])
+    )
+    assert loaded["output"]["show version"].lazy_text
+    assert not loaded["output"]["show clock"].lazy_text
+    assert loaded["output"]["show version"]["text"] == "Arista vEOS"
+    send_cmds.assert_called_once_with(["show version"], loaded["text_conn"], "text", loaded)
+
+    # a worker that already has duts keeps them
+    assert not snapshot.load_worker_snapshot()
+
+    mocker.patch.dict("os.environ", {snapshot.SNAPSHOT_ENV: snapshot_file})
+    snapshot.remove_snapshot()
+    assert not os.path.exists(snapshot_file)
+    assert snapshot.SNAPSHOT_ENV not in os.environ
+
+
+def test_snapshot_output_store(mocker, tmp_path):
+    """Validates that with an output store workers read the outputs from the store"""
+    store = output_store.OutputStore(str(tmp_path / "outputs"))
+    dut = tests_tools.login_duts(TEST_PARAMETERS, TEST_DUTS)[0]
+    dut["output"] = store.new_output(dut, tests_tools.fetch_text)
+    dut["output"]["interface_list"] = []
+    tests_tools.add_dut_output(
+        dut, ["show version"], ([RawJson('{"modelName": "vEOS"}')], ["show version"])
+    )
+    outputs_file = dut["output"].output_file.path
+    outputs_size = os.path.getsize(outputs_file)
+
+    snapshot_file = snapshot.write_snapshot([dut], {}, TEST_PARAMETERS, write_duts_file(tmp_path))
+
+    with open(snapshot_file, "r", encoding="utf-8") as snapshot_in:
+        assert "vEOS" not in snapshot_in.read()
+
+    mocker.patch.object(vane.config, "dut_objs", [])
+    loaded = snapshot.load_snapshot(snapshot_file)[0]
+
+    assert isinstance(loaded["output"], output_store.DutOutput)
+    assert loaded["output"]["interface_list"] == []
+    assert loaded["output"]["show version"]["json"] == {"modelName": "vEOS"}
+
+    # text fetched by a worker is kept in its memory, the store file is not written
+    mocker.patch(
+        "vane.tests_tools.send_cmds", return_value=([{"output": "Arista vEOS"}], ["show version"])
+    )
+    assert loaded["output"]["show version"]["text"] == "Arista vEOS"
+    assert os.path.getsize(outputs_file) == outputs_size
+
+    os.remove(snapshot_file)
+    store.close_all()
+
+
+def test_dut_phase_dir(mocker):
+    """Validates that the directory workers publish finished tests in is removed after the run"""
+    mocker.patch.dict("os.environ", {})
+
+    dut_phase_dir = snapshot.create_dut_phase_dir()
+
+    assert os.environ[snapshot.DUT_PHASE_ENV] == dut_phase_dir
+    assert os.path.isdir(dut_phase_dir)
+
+    snapshot.remove_dut_phase_dir()
+
+    assert snapshot.DUT_PHASE_ENV not in os.environ
+    assert not os.path.exists(dut_phase_dir)
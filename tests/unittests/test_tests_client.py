@@ -385,6 +385,24 @@ def test__set_test_parameters_unset_cmd_line(loginfo, logwarn):
     logwarn.assert_has_calls(logwarn_calls, any_order=False)
 
 
+def test__set_processes():
+    """Validate that parallel runs keep the tests of each dut on one worker"""
+
+    client = vane.tests_client.TestsClient(
+        "tests/unittests/fixtures/defs_set_test_params.yaml", DUTS
+    )
+    client.test_parameters = []
+
+    client.data_model["parameters"]["processes"] = 4
+    client._set_processes()
+    client._set_processes()
+    assert client.test_parameters == ["-n 4", "--dist=loadgroup"]
+
+    client.data_model["parameters"]["processes"] = None
+    client._set_processes()
+    assert client.test_parameters == []
+
+
 def test__remove_result_files(loginfo):
     """Validate _remove_result_files removes pre-existing results files"""
 
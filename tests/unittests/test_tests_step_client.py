@@ -4,6 +4,7 @@ from unittest.mock import call
 import os
 import pytest
 from vane import test_step_client
+from tests.unittests.fixtures.test_steps import test_steps
 
 
 # Global test parameters
@@ -259,3 +260,22 @@ def test_output_md_multiple_tests():
     file_clean_up("tests/unittests/fixtures/api/api.md")
 
     assert expected_output == actual_output
+
+
+def test_function_docs(mocker):
+    """Validates that test steps and descriptions are parsed once per test function"""
+    mocker.patch.dict(test_step_client._function_docs, clear=True)
+    getsourcelines = mocker.spy(test_step_client.inspect, "getsourcelines")
+    test_class = test_steps.TestSyslogFunctionality
+
+    docs = test_step_client.function_docs(test_class.test_syslog_functionality_on_switch)
+
+    assert docs["description"].strip() == (
+        "TD: Testcase for verification of syslog logging server and\n"
+        "            source-interface information"
+    )
+    assert docs["steps"][0] == (
+        " Running show logging command on dut and collecting the text output"
+    )
+    assert test_step_client.function_docs(test_class().test_syslog_functionality_on_switch) is docs
+    assert getsourcelines.call_count == 1
@@ -3,13 +3,17 @@ import logging
 import os
 import shutil
 import sys
+import asyncio
+import threading
 from unittest.mock import call
 import pytest
 import yaml
 import pyeapi.eapilib
+from netmiko.exceptions import ReadTimeout
 import vane
 from tests.unittests.fixtures.test_steps import test_steps
 from vane import tests_tools
+from vane.utils import RawJson
 
 
 # TEST UTILITY FUNCTIONS
@@ -51,6 +55,12 @@ def logerror(mocker):
     return mocker.patch("vane.vane_logging.logging.error")
 
 
+@pytest.fixture
+def logwarning(mocker):
+    """Fixture to mock logger warning calls from vane.tests_tools"""
+    return mocker.patch("vane.vane_logging.logging.warning")
+
+
 def read_yaml(yaml_file):
     """Import YAML file as python data structure
 
@@ -174,13 +184,9 @@ def test_parametrize_duts(loginfo, logdebug):
 
     logdebug_calls = [
         call(
-            "Creating dut parameters.  \nDuts: [{'role': 'Role1', 'name': 'DLFW3'}, "
-            "{'role': 'Role2', 'name': 'Test Dut 2'}] \nIds: ['DLFW3', 'Test Dut 2']"
-        ),
-        call(
-            "Creating dut parameters.  \nDuts: [{'role': 'Role1', 'name': 'DLFW3'}]"
-            " \nIds: ['DLFW3']"
+            "Creating dut parameters for test_local_user_access.  " "\nIds: ['DLFW3', 'Test Dut 2']"
         ),
+        call("Creating dut parameters for test_tacacs_functionality.  \nIds: ['DLFW3']"),
     ]
     logdebug.assert_has_calls(logdebug_calls, any_order=False)
 
@@ -196,6 +202,82 @@ def test_parametrize_duts(loginfo, logdebug):
     assert expected_dut_parameters == actual_dut_parameters
 
 
+def test_parametrize_duts_large_inventory():
+    """Validates indexed filtering and that dut parameters are computed once per test suite"""
+    duts = [{"role": f"Role{index % 4}", "name": f"DUT{index}"} for index in range(5000)]
+    test_defs = {
+        "test_suites": [
+            {
+                "name": "nrfu_tests",
+                "testcases": [
+                    {"name": f"test_{index}", "criteria": "roles", "filter": ["Role3", "Role1"]}
+                    for index in range(200)
+                ]
+                + [
+                    {"name": "test_names", "criteria": "names", "filter": ["DUT7", "DUT2"]},
+                    {"name": "test_regex", "criteria": "regex", "filter": "DUT49[0-9]$"},
+                ],
+            }
+        ]
+    }
+
+    dut_parameters = tests_tools.parametrize_duts("nrfu_tests", test_defs, duts)
+
+    assert dut_parameters["test_0"]["ids"][:2] == ["DUT3", "DUT7"]
+    assert len(dut_parameters["test_199"]["duts"]) == 2500
+    assert dut_parameters["test_199"]["ids"][1250] == "DUT1"
+    assert dut_parameters["test_names"]["ids"] == ["DUT7", "DUT2"]
+    assert dut_parameters["test_regex"]["ids"] == [f"DUT49{index}" for index in range(10)]
+
+    assert tests_tools.parametrize_duts("nrfu_tests", test_defs, duts) is dut_parameters
+    assert tests_tools.parametrize_duts("nrfu_tests", test_defs, duts[:10]) is not dut_parameters
+
+
+def test_index_topology():
+    """Validates the topology index and that it is built once per duts file data"""
+    test_duts = {
+        "duts": [
+            {
+                "name": f"DUT{index}",
+                "neighbors": [
+                    {
+                        "port": f"Ethernet{port}",
+                        "neighborDevice": f"DUT{(index + port) % 1000}",
+                        "neighborPort": f"Ethernet{port + 1}",
+                    }
+                    for port in range(1, 5)
+                ],
+            }
+            for index in range(1000)
+        ]
+        + [{"name": "DUT_NO_NEIGHBORS", "neighbors": None}]
+    }
+
+    topology = tests_tools.index_topology(test_duts)
+
+    assert topology.neighbor("DUT999", "Ethernet2") == {
+        "z_hostname": "DUT1",
+        "z_interface_name": "Ethernet3",
+    }
+    assert topology.neighbor("DUT999", "Ethernet9") is None
+    assert topology.neighbor("DUT_MISSING", "Ethernet1") is None
+    assert len(topology.neighbors["DUT500"]) == 4
+    assert topology.neighbors["DUT_NO_NEIGHBORS"] == []
+
+    assert tests_tools.return_interfaces("DUT999", test_duts)[0] == {
+        "hostname": "DUT999",
+        "interface_name": "Ethernet1",
+        "z_hostname": "DUT0",
+        "z_interface_name": "Ethernet2",
+        "media_type": "",
+    }
+    assert tests_tools.return_interfaces("DUT_MISSING", test_duts) == []
+
+    assert tests_tools.index_topology(test_duts) is topology
+    test_duts["duts"].append({"name": "DUT1000", "neighbors": []})
+    assert tests_tools.index_topology(test_duts) is not topology
+
+
 # def test_setup_import_yaml():
 #     pass
 
@@ -249,11 +331,13 @@ def test_init_duts(loginfo, logdebug, mocker):
     test_parameters = read_yaml("tests/unittests/fixtures/fixture_definitions.yaml")
     test_duts = read_yaml("tests/unittests/fixtures/fixture_duts.yaml")
 
-    mocker.patch("vane.tests_tools.login_duts", return_value="DUTS")
+    duts = [{"name": "DSR01"}, {"name": "DCBBW1"}, {"name": "DCBBW2"}, {"name": "DCBBE1"}]
+    mocker.patch("vane.tests_tools.login_duts", return_value=duts)
     mocker.patch("vane.tests_tools.dut_worker")
     actual_output = tests_tools.init_duts(show_cmds, test_parameters, test_duts)
 
-    assert actual_output == "DUTS"
+    assert actual_output == duts
+    assert tests_tools.duts_collected()
 
     loginfo_calls = [
         call(
@@ -261,19 +345,103 @@ def test_init_duts(loginfo, logdebug, mocker):
             "on each dut. Return structured data of DUTs output "
             "data, hostname, and connection."
         ),
+        call(
+            "Request scheduler allows unbounded requests in flight, unbounded requests/s per dut "
+            "and role limits {}"
+        ),
         call("Returning duts data structure"),
     ]
     loginfo.assert_has_calls(loginfo_calls, any_order=False)
 
     logdebug_calls = [
-        call("Duts login info: DUTS and create 4 workers"),
+        call(f"Duts login info: {duts} and create 4 workers"),
         call("Passing the following show commands to workers: ['show version', 'show clock']"),
         call("Future object generated successfully"),
-        call("Return duts data structure: DUTS"),
+        call(f"Return duts data structure: {duts}"),
     ]
     logdebug.assert_has_calls(logdebug_calls, any_order=False)
 
 
+def test_init_duts_async(mocker):
+    """Validates that init_duts uses the asyncio engine when requested
+    FIXTURE NEEDED: fixture_definitions.yaml, fixture_duts.yaml"""
+    show_cmds = ["show version", "show clock"]
+    test_parameters = read_yaml("tests/unittests/fixtures/fixture_definitions.yaml")
+    test_parameters["parameters"]["collection_engine"] = "async"
+    test_parameters["parameters"]["collection_max_in_flight"] = 2
+    test_duts = read_yaml("tests/unittests/fixtures/fixture_duts.yaml")
+    duts = [{"name": "DSR01"}, {"name": "DCBBW1"}]
+
+    mocker.patch("vane.tests_tools.login_duts", return_value=duts)
+    thread_worker = mocker.patch("vane.tests_tools.dut_worker")
+    async_worker = mocker.patch("vane.tests_tools.async_dut_worker")
+
+    actual_output = tests_tools.init_duts(show_cmds, test_parameters, test_duts)
+
+    assert actual_output == duts
+    assert async_worker.call_count == 2
+    assert thread_worker.call_count == 0
+    assert tests_tools.get_scheduler().max_in_flight == 2
+
+    # async engine only drives eapi, ssh falls back to threads
+
+    test_parameters["parameters"]["eos_conn"] = "ssh"
+    tests_tools.init_duts(show_cmds, test_parameters, test_duts)
+    assert thread_worker.call_count == 2
+
+    test_parameters["parameters"]["collection_engine"] = "invalid_engine"
+    with pytest.raises(ValueError):
+        tests_tools.init_duts(show_cmds, test_parameters, test_duts)
+
+
+def test_async_dut_worker(mocker):
+    """Validates that async_dut_worker fills dut output in the same shape as dut_worker
+    FIXTURE NEEDED: fixture_duts.yaml"""
+    dut = {"name": "DSR01", "mgmt_ip": "10.255.50.212", "username": "cvpadmin", "password": ""}
+    show_cmds = ["show version", "show clock"]
+    test_duts = read_yaml("tests/unittests/fixtures/fixture_duts.yaml")
+
+    conn = mocker.patch("vane.device_interface.AsyncEapiConn").return_value
+    conn.run_commands = mocker.AsyncMock(
+        side_effect=[
+            [{"modelName": "vEOS"}, {"utcTime": 1}],
+            [{"output": "version text"}, {"output": "clock text"}],
+        ]
+    )
+
+    asyncio.run(tests_tools.async_dut_worker(dut, show_cmds, test_duts))
+
+    assert len(dut["output"]["interface_list"]) == 4
+    assert dut["output"]["show version"] == {"json": {"modelName": "vEOS"}, "text": "version text"}
+    assert dut["output"]["show clock"] == {"json": {"utcTime": 1}, "text": "clock text"}
+    conn.run_commands.assert_has_calls(
+        [call(show_cmds, encoding="json"), call(show_cmds, encoding="text")]
+    )
+
+
+def test_async_send_cmds_exception(mocker):
+    """Validates that async_send_cmds drops failing commands and stops on unrelated errors"""
+    dut = {"name": "DSR01", "role": "leaf"}
+    conn = mocker.Mock()
+    conn.run_commands = mocker.AsyncMock(
+        side_effect=[Exception("show lldp neighbors is erring"), [{"output": "version"}]]
+    )
+
+    outputs, cmds = asyncio.run(
+        tests_tools.async_send_cmds(["show version", "show lldp neighbors"], conn, "text", dut)
+    )
+
+    assert outputs == [{"output": "version"}]
+    assert cmds == ["show version"]
+
+    conn.run_commands = mocker.AsyncMock(side_effect=Exception("connection refused"))
+
+    outputs, cmds = asyncio.run(tests_tools.async_send_cmds(["show version"], conn, "json", dut))
+
+    assert outputs == []
+    assert cmds == []
+
+
 def test_login_duts(loginfo, mocker):
     """Validates the functionality of login_duts
     FIXTURE NEEDED: fixture_definitions.yaml, fixture_duts.yaml"""
@@ -296,18 +464,21 @@ def test_login_duts(loginfo, mocker):
 
     actual_output = tests_tools.login_duts(test_parameters, test_duts)
 
-    # assert called to NetmikoCOnn and PyeapiConn were made correctly
+    # assert connections are only set up on first use
 
-    assert netmiko_instance.set_up_conn.call_count == 2
+    assert netmiko_instance.set_up_conn.call_count == 0
 
-    assert pyeapi_instance.set_up_conn.call_count == 2
+    assert pyeapi_instance.set_up_conn.call_count == 0
 
     # assert values when pyeapi connection
 
     for index in range(0, 2):
         dut_info = actual_output[index]
-        assert dut_info["ssh_conn"] == netmiko_instance
-        assert dut_info["connection"] == pyeapi_instance
+        assert dut_info["ssh_conn"].connect() == netmiko_instance
+        assert dut_info["connection"].connect() == pyeapi_instance
+        assert dut_info["connection"] is dut_info["eapi_conn"]
+        assert dut_info["text_conn"] is not dut_info["connection"]
+        assert dut_info["text_conn"].connect() == pyeapi_instance
         assert dut_info["name"] == test_duts["duts"][index]["name"]
         assert dut_info["mgmt_ip"] == test_duts["duts"][index]["mgmt_ip"]
         assert dut_info["username"] == test_duts["duts"][index]["username"]
@@ -327,6 +498,10 @@ def test_login_duts(loginfo, mocker):
 
     loginfo.assert_has_calls(loginfo_calls, any_order=False)
 
+    assert netmiko_instance.set_up_conn.call_count == 2
+
+    assert pyeapi_instance.set_up_conn.call_count == 4
+
     # assert values when ssh connection
 
     test_parameters["parameters"]["eos_conn"] = "ssh"
@@ -335,7 +510,9 @@ def test_login_duts(loginfo, mocker):
 
     for index in range(0, 2):
         dut_info = actual_output[index]
-        assert dut_info["connection"] == netmiko_instance
+        assert dut_info["connection"].connect() == netmiko_instance
+        assert dut_info["connection"] is dut_info["ssh_conn"]
+        assert dut_info["text_conn"].connect() == netmiko_instance
 
     # assert values when neither pyeapi nor ssh connection
 
@@ -414,36 +591,83 @@ def test_send_cmds_exception(logdebug, logerror, mocker):
     )
 
     # asserting when run_commands raises an exception
-    assert show_cmds_output == ""
+    assert show_cmds_output == []
     assert show_cmd_list_output == []
-    logdebug_calls = [
-        call("New show_cmds: []"),
-    ]
-    logdebug.assert_has_calls(logdebug_calls, any_order=False)
+    assert mocker_object.call_count == 1
 
     logerror.assert_called_with("Error running all cmds: show version is erring")
 
 
-error = ["show lldp neighbors has an error in it", "show lldp neighbors status has an error in it"]
-show_cmds = [
-    ["show version", "show clock", "show lldp neighbors", "show lldp neighbors status"],
-    ["show version", "show clock", "show lldp neighbors", "show lldp neighbors status"],
-]
-expected_output = [
-    ["show version", "show clock", "show lldp neighbors status"],
-    ["show version", "show clock", "show lldp neighbors"],
-]
+def test_send_cmds_bisection(mocker):
+    """Validates that send_cmds isolates failing commands by splitting the batch"""
+    failing_cmds = ["show cmd 2", "show cmd 5"]
+    show_cmds = [f"show cmd {index}" for index in range(8)]
 
+    def run_commands(cmds, encoding="json"):
+        if any(cmd in failing_cmds for cmd in cmds):
+            raise pyeapi.eapilib.EapiError(f"CLI command failed: {cmds}")
+        return [{"cmd": cmd, "encoding": encoding} for cmd in cmds]
 
-@pytest.mark.parametrize(
-    "error, show_cmds, expected_output",
-    [(error[0], show_cmds[0], expected_output[0]), (error[1], show_cmds[1], expected_output[1])],
-)
-def test_remove_cmd(error, show_cmds, expected_output):
-    """Validates functionality of remove_cmd method"""
+    conn = mocker.Mock()
+    conn.run_commands.side_effect = run_commands
 
-    actual_output = tests_tools.remove_cmd(error, show_cmds)
-    assert expected_output == actual_output
+    outputs, ran_cmds = tests_tools.send_cmds(show_cmds.copy(), conn, "json")
+
+    assert ran_cmds == [cmd for cmd in show_cmds if cmd not in failing_cmds]
+    assert [output["cmd"] for output in outputs] == ran_cmds
+
+    # full batch, two halves, four quarters and four single commands
+
+    assert conn.run_commands.call_count == 11
+
+    # connection errors are not split command by command
+
+    conn.run_commands.reset_mock()
+    conn.run_commands.side_effect = pyeapi.eapilib.ConnectionError("https", "connection refused")
+
+    assert tests_tools.send_cmds(show_cmds.copy(), conn, "json") == ([], [])
+    assert conn.run_commands.call_count == 1
+
+    # nor are batches that timed out on a slow dut
+
+    conn.run_commands.reset_mock()
+    conn.run_commands.side_effect = ReadTimeout("Pattern not detected")
+
+    assert tests_tools.send_cmds(show_cmds.copy(), conn, "json") == ([], [])
+    assert conn.run_commands.call_count == 1
+
+
+def test_async_send_cmds_bisection(mocker):
+    """Validates that async_send_cmds isolates failing commands by splitting the batch"""
+    dut = {"name": "DSR01", "role": "leaf"}
+    show_cmds = ["show version", "show clock", "show lldp neighbors", "show hostname"]
+
+    async def run_commands(cmds, encoding="json"):
+        if "show lldp neighbors" in cmds:
+            raise pyeapi.eapilib.EapiError("CLI command failed")
+        return [{"output": cmd} for cmd in cmds]
+
+    conn = mocker.Mock()
+    conn.run_commands = mocker.AsyncMock(side_effect=run_commands)
+
+    outputs, ran_cmds = asyncio.run(tests_tools.async_send_cmds(show_cmds, conn, "text", dut))
+
+    assert ran_cmds == ["show version", "show clock", "show hostname"]
+    assert outputs == [{"output": cmd} for cmd in ran_cmds]
+
+
+def test_record_failed_cmds(logwarning):
+    """Validates that the commands which failed on a dut are recorded per encoding"""
+    dut = {"name": "DSR01"}
+    show_cmds = ["show version", "show clock", "show lldp neighbors"]
+
+    tests_tools.record_failed_cmds(dut, "json", show_cmds, ["show version", "show clock"])
+    tests_tools.record_failed_cmds(dut, "text", show_cmds, show_cmds)
+
+    assert dut["failed_cmds"] == {"json": ["show lldp neighbors"], "text": []}
+    logwarning.assert_called_once_with(
+        "Show commands failed on DSR01 with json encoding: ['show lldp neighbors']"
+    )
 
 
 def test_dut_worker(logdebug, mocker):
@@ -507,6 +731,365 @@ def test_dut_worker(logdebug, mocker):
     logdebug.assert_has_calls(logdebug_calls, any_order=False)
 
 
+def test_dut_worker_lazy_text(mocker):
+    """Validates that dut_worker defers text collection until the text output is read"""
+    dut = {
+        "connection": mocker.Mock(),
+        "text_conn": mocker.Mock(),
+        "name": "DSR01",
+        "role": "leaf",
+    }
+    show_cmds = ["show version", "show clock"]
+
+    send_cmds = mocker.patch("vane.tests_tools.send_cmds")
+    send_cmds.side_effect = [
+        [[{"modelName": "vEOS"}, {"utcTime": 1}], ["show version", "show clock"]],
+        [[{"output": "version text"}], ["show version"]],
+    ]
+    mocker.patch("vane.tests_tools.return_interfaces", return_value=[])
+
+    tests_tools.dut_worker(dut, show_cmds, {}, lazy_text=True)
+
+    assert send_cmds.call_count == 1
+    assert dut["output"]["show clock"]["json"] == {"utcTime": 1}
+    assert "text" not in dut["output"]["show version"]
+
+    # a single request fetches the text output of every pending command
+
+    tests_tools.fetch_text(dut, show_cmds)
+
+    assert send_cmds.call_count == 2
+    send_cmds.assert_called_with(show_cmds, dut["text_conn"], "text", dut)
+    assert dut["output"]["show version"]["text"] == "version text"
+    assert dut["output"]["show clock"]["text"] == ""
+
+    tests_tools.fetch_text(dut, show_cmds)
+    assert send_cmds.call_count == 2
+
+
+def test_dut_worker_capability_cache(tmp_path, mocker):
+    """Validates that dut_worker skips and records commands the platform rejects"""
+    cache_file = str(tmp_path / "capabilities.yaml")
+    cache = tests_tools.configure_capability_cache({"capability_cache": cache_file})
+    cache.add(("vEOS-lab", "4.29.2F"), "json", ["show lldp neighbors"])
+
+    dut = {"connection": mocker.Mock(), "name": "DSR01", "role": "leaf"}
+    show_cmds = ["show version", "show lldp neighbors", "show ip bgp summary", "show interfaces"]
+
+    def run_commands(cmds, encoding="json"):
+        if "show ip bgp summary" in cmds and encoding == "json":
+            raise pyeapi.eapilib.CommandError(1002, "invalid command")
+        if "show interfaces" in cmds and encoding == "json":
+            raise pyeapi.eapilib.CommandError(1000, "internal error")
+        if cmds == ["show version"]:
+            return [{"modelName": "vEOS-lab", "version": "4.29.2F"}]
+        return [{"output": cmd} for cmd in cmds]
+
+    dut["connection"].run_commands.side_effect = run_commands
+    mocker.patch("vane.tests_tools.return_interfaces", return_value=[])
+
+    tests_tools.dut_worker(dut, show_cmds, {})
+
+    sent_cmds = [args[0] for args, _ in dut["connection"].run_commands.call_args_list]
+    assert not any("show lldp neighbors" in cmds for cmds in sent_cmds[:4])
+    assert dut["failed_cmds"]["json"] == [
+        "show lldp neighbors",
+        "show ip bgp summary",
+        "show interfaces",
+    ]
+    # transient errors fail for this run only
+    assert dut["rejected_cmds"] == {"json": ["show ip bgp summary"]}
+    assert cache.unsupported_cmds(("vEOS-lab", "4.29.2F"), "json") == [
+        "show lldp neighbors",
+        "show ip bgp summary",
+    ]
+
+    tests_tools.configure_capability_cache({})
+
+
+def test_cmd_output_fetches_text(mocker):
+    """Validates that reading the text output of a lazy command fetches it once"""
+    dut = {"text_conn": mocker.Mock(), "name": "DSR01", "output": {}}
+    dut["output"]["show version"] = tests_tools.CmdOutput(dut, "show version")
+    dut["output"]["show version"]["json"] = {"modelName": "vEOS"}
+
+    send_cmds = mocker.patch(
+        "vane.tests_tools.send_cmds", return_value=[[{"output": "version text"}], ["show version"]]
+    )
+
+    assert dut["output"]["show version"]["text"] == "version text"
+    assert dut["output"]["show version"].get("text") == "version text"
+    assert dut["output"]["show version"].get("missing") is None
+    send_cmds.assert_called_once_with(["show version"], dut["text_conn"], "text", dut)
+
+    with pytest.raises(KeyError):
+        _ = dut["output"]["show version"]["missing"]
+
+
+def test_send_cmds_raw_json(mocker):
+    """Validates that raw json commands are piped to json and decoded on first read"""
+    conn = mocker.Mock()
+    conn.run_commands.return_value = [{"output": '{"modelName": "vEOS"}'}]
+
+    show_cmd_list, show_cmds = tests_tools.send_cmds(["show version"], conn, "json", raw_json=True)
+
+    conn.run_commands.assert_called_once_with(["show version | json"], encoding="text")
+    assert show_cmds == ["show version"]
+    assert isinstance(show_cmd_list[0], RawJson)
+
+    dut = {"connection": conn, "name": "DSR01", "output": {}}
+    tests_tools.add_dut_output(
+        dut, show_cmds, (show_cmd_list, show_cmds), ([{"output": "vEOS"}], show_cmds)
+    )
+
+    assert isinstance(dict.__getitem__(dut["output"]["show version"], "json"), RawJson)
+    assert dut["output"]["show version"]["json"] == {"modelName": "vEOS"}
+    assert dut["output"]["show version"].get("json") == {"modelName": "vEOS"}
+    assert dict.__getitem__(dut["output"]["show version"], "json") == {"modelName": "vEOS"}
+    assert dut["output"]["show version"]["text"] == "vEOS"
+
+
+def test_send_cmds_raw_json_error_response(mocker):
+    """Validates that a command answering its json pipe with a CLI error fails
+    at collection instead of when its output is read"""
+    unconverted = vane.device_interface.error_responses[0]
+
+    def run_commands(cmds, encoding="json"):
+        return [
+            {"output": unconverted if cmd == "show bogus | json" else f'{{"cmd": "{cmd}"}}'}
+            for cmd in cmds
+        ]
+
+    conn = mocker.Mock()
+    conn.run_commands.side_effect = run_commands
+    dut = {"name": "DSR01", "role": "leaf"}
+    show_cmds = ["show version", "show bogus", "show clock"]
+
+    show_cmd_list, ran_cmds = tests_tools.send_cmds(show_cmds, conn, "json", dut=dut, raw_json=True)
+
+    assert ran_cmds == ["show version", "show clock"]
+    assert [output.decode()["cmd"] for output in show_cmd_list] == [
+        "show version | json",
+        "show clock | json",
+    ]
+    assert dut["rejected_cmds"] == {"json": ["show bogus"]}
+
+
+def test_return_output_fields():
+    """Validates that output fields are merged per show command and only prune
+    commands whose test cases all list them"""
+    test_parameters = {
+        "test_suites": [
+            {
+                "name": "test_suite.py",
+                "testcases": [
+                    {"show_cmd": "show version", "output_fields": ["serialNumber"]},
+                    {"show_cmd": "show interfaces", "output_fields": ["interfaces.*.mtu"]},
+                    {
+                        "show_cmds": ["show interfaces", "show lldp neighbors"],
+                        "output_fields": {"show interfaces": ["interfaces.*.description"]},
+                    },
+                    {"show_cmd": "show ip bgp"},
+                    {"show_cmd": "show ip bgp", "output_fields": ["vrfs"]},
+                ],
+            }
+        ]
+    }
+
+    assert tests_tools.return_output_fields(test_parameters) == {
+        "show version": ["modelName", "serialNumber", "version"],
+        "show interfaces": ["interfaces.*.description", "interfaces.*.mtu"],
+    }
+
+
+def test_add_dut_output_output_fields():
+    """Validates that json output is pruned to the output fields after collection"""
+    dut = {"name": "DSR01", "output": {}}
+    raw_json = RawJson('{"modelName": "vEOS", "version": "4.30", "memTotal": 1}')
+    output_fields = {"show version": ["modelName"], "show clock": ["utcTime"]}
+
+    tests_tools.add_dut_output(
+        dut,
+        ["show version", "show clock"],
+        ([raw_json, {"utcTime": 1, "timezone": "UTC"}], ["show version", "show clock"]),
+        ([{"output": "vEOS"}, {"output": "1"}], ["show version", "show clock"]),
+        output_fields,
+    )
+
+    assert dut["output"]["show version"]["json"] == {"modelName": "vEOS"}
+    assert dut["output"]["show clock"]["json"] == {"utcTime": 1}
+
+
+def test_prefetch_duts_text(mocker):
+    """Validates that text output is prefetched only for lazy text collection"""
+    fetch_text = mocker.patch("vane.tests_tools.fetch_text")
+    executor = mocker.patch("concurrent.futures.ThreadPoolExecutor").return_value
+    duts = [{"name": "DSR01"}, {"name": "DCBBW1"}]
+    show_cmds = ["show version"]
+    test_parameters = {"parameters": {}}
+
+    tests_tools.prefetch_duts_text(duts, show_cmds, test_parameters)
+    assert executor.submit.call_count == 0
+
+    test_parameters["parameters"]["text_collection"] = "lazy"
+    tests_tools.prefetch_duts_text(duts, show_cmds, test_parameters)
+    executor.submit.assert_has_calls(
+        [call(fetch_text, duts[0], show_cmds), call(fetch_text, duts[1], show_cmds)]
+    )
+    executor.shutdown.assert_called_once_with(wait=False)
+
+    test_parameters["parameters"]["text_prefetch"] = False
+    tests_tools.prefetch_duts_text(duts, show_cmds, test_parameters)
+    assert executor.submit.call_count == 2
+
+
+TEST_SUITE_SOURCE = """
+import pytest
+
+pytestmark = [pytest.mark.nrfu]
+
+
+@pytest.mark.demo
+class BgpTests:
+    @pytest.mark.bgp
+    @pytest.mark.parametrize("dut", [], ids=[])
+    def test_bgp_peers_on_(self, dut):
+        pass
+
+    def test_bgp_routes_on_(self, dut):
+        pass
+"""
+
+
+def write_collection_plan_suite(tmp_path):
+    """Write a test suite and the test definitions that filter its test cases"""
+    (tmp_path / "test_bgp.py").write_text(TEST_SUITE_SOURCE, encoding="utf-8")
+
+    return {
+        "test_suites": [
+            {
+                "name": "test_bgp.py",
+                "dir_path": str(tmp_path),
+                "testcases": [
+                    {
+                        "name": "test_bgp_peers_on_",
+                        "show_cmd": "show ip bgp summary",
+                        "criteria": "roles",
+                        "filter": ["spine"],
+                    },
+                    {
+                        "name": "test_bgp_routes_on_",
+                        "show_cmds": ["show ip route", "show ip bgp summary"],
+                        "criteria": "names",
+                        "filter": ["DCBBW1"],
+                    },
+                    {
+                        "name": "test_missing_on_",
+                        "show_cmd": "show lldp neighbors",
+                        "criteria": "regex",
+                        "filter": "^DSR",
+                    },
+                ],
+            }
+        ]
+    }
+
+
+def test_return_test_functions(tmp_path):
+    """Validates that test functions are read from a test suite with their marks"""
+    test_defs = write_collection_plan_suite(tmp_path)
+    test_file = f"{test_defs['test_suites'][0]['dir_path']}/test_bgp.py"
+
+    test_functions = tests_tools.return_test_functions(test_file)
+
+    assert test_functions["test_bgp_peers_on_"]["class"] == "BgpTests"
+    assert test_functions["test_bgp_peers_on_"]["marks"] == {"nrfu", "demo", "bgp", "parametrize"}
+    assert test_functions["test_bgp_routes_on_"]["marks"] == {"nrfu", "demo"}
+    assert tests_tools.return_test_functions(f"{tmp_path}/missing.py") == {}
+
+
+def test_return_dut_show_cmds(tmp_path):
+    """Validates that each dut only collects the commands of the test cases selecting it"""
+    test_defs = write_collection_plan_suite(tmp_path)
+    test_parameters = {"parameters": {"test_cases": "All", "mark": None}}
+    test_duts = {
+        "duts": [
+            {"name": "DCBBW1", "role": "spine"},
+            {"name": "DCBBW2", "role": "spine"},
+            {"name": "DSR01", "role": "leaf"},
+        ]
+    }
+
+    assert tests_tools.return_dut_show_cmds(test_defs, test_parameters, test_duts) == {
+        "DCBBW1": ["show version", "show ip bgp summary", "show ip route"],
+        "DCBBW2": ["show version", "show ip bgp summary"],
+        "DSR01": ["show version", "show lldp neighbors"],
+    }
+
+    # -m bgp deselects test_bgp_routes_on_, test cases missing from the suite are kept
+
+    test_parameters["parameters"]["mark"] = "bgp"
+    assert tests_tools.return_dut_show_cmds(test_defs, test_parameters, test_duts) == {
+        "DCBBW1": ["show version", "show ip bgp summary"],
+        "DCBBW2": ["show version", "show ip bgp summary"],
+        "DSR01": ["show version", "show lldp neighbors"],
+    }
+
+    # -k matches test names, parametrize ids, classes, files and marks
+
+    test_parameters["parameters"]["mark"] = None
+    test_parameters["parameters"]["test_cases"] = "peers and DCBBW2"
+    assert tests_tools.return_dut_show_cmds(test_defs, test_parameters, test_duts) == {
+        "DCBBW1": ["show version"],
+        "DCBBW2": ["show version", "show ip bgp summary"],
+        "DSR01": ["show version", "show lldp neighbors"],
+    }
+
+    test_parameters["parameters"]["test_cases"] = "not BgpTests"
+    assert tests_tools.return_dut_show_cmds(test_defs, test_parameters, test_duts) == {
+        "DCBBW1": ["show version"],
+        "DCBBW2": ["show version"],
+        "DSR01": ["show version", "show lldp neighbors"],
+    }
+
+
+def test_return_collection_plan(tmp_path, mocker):
+    """Validates that the collection plan is global unless per_dut is requested"""
+    test_defs = write_collection_plan_suite(tmp_path)
+    test_duts = {"duts": [{"name": "DCBBW1", "role": "spine"}]}
+    test_parameters = {"parameters": {}}
+
+    assert tests_tools.return_collection_plan(
+        ["show version"], test_defs, test_parameters, test_duts
+    ) == ["show version"]
+
+    test_parameters["parameters"]["collection_plan"] = "per_dut"
+    assert tests_tools.return_collection_plan(
+        ["show version"], test_defs, test_parameters, test_duts
+    ) == {"DCBBW1": ["show version", "show ip bgp summary", "show ip route"]}
+
+    test_parameters["parameters"]["collection_plan"] = "invalid_plan"
+    with pytest.raises(ValueError):
+        tests_tools.return_collection_plan(["show version"], test_defs, test_parameters, test_duts)
+
+    # init_duts hands each worker the commands of its dut
+
+    duts = [{"name": "DCBBW1"}, {"name": "DSR01"}]
+    mocker.patch("vane.tests_tools.login_duts", return_value=duts)
+    worker = mocker.patch("vane.tests_tools.dut_worker")
+    test_parameters["parameters"]["collection_plan"] = "per_dut"
+
+    tests_tools.init_duts({"DCBBW1": ["show version"]}, test_parameters, test_duts)
+
+    worker.assert_has_calls(
+        [
+            call(duts[0], ["show version"], test_duts, False, False, None),
+            call(duts[1], [], test_duts, False, False, None),
+        ],
+        any_order=True,
+    )
+
+
 def test_return_interfaces(loginfo, logdebug):
     """Validates if interfaces are being read properly from test parameters
     FIXTURE NEEDED: fixture_duts.yaml"""
@@ -616,7 +1199,7 @@ def test_get_parameters(loginfo, logdebug):
     logdebug_calls = [
         call(
             "Suite_parameters:"
-            " [{'name': 'test_aaa.py',"
+            " {'name': 'test_aaa.py',"
             " 'testcases': [{'name': 'test_if_authentication_counters_are_incrementing_on_',"
             " 'description': 'Verify AAA counters are working correctly',"
             " 'show_cmds': ['show lldp neighbors', 'show aaa counters'], 'expected_output': None,"
@@ -633,7 +1216,7 @@ def test_get_parameters(loginfo, logdebug):
             " {'name': 'test_if_exec_authorization_methods_set_on_',"
             " 'description': 'Verify AAA exec authorization are method-lists set correct',"
             " 'exec_auth': ['none'], 'show_cmd': 'show aaa methods all', 'expected_output': None,"
-            " 'comment': None, 'result': True}], 'dir_path': 'sample_network_tests/aaa'}]"
+            " 'comment': None, 'result': True}], 'dir_path': 'sample_network_tests/aaa'}"
         ),
         call(
             "Case_parameters: {'name': 'test_if_exec_authorization_methods_set_on_',"
@@ -944,10 +1527,11 @@ OUTPUT = (
 def create_test_ops_instance(mocker):
     """Utility function to create tops object needed for testing TestOps methods"""
 
-    # creating test ops object and mocking inspect_stack call
-    mocker.patch("inspect.stack", return_value=["", ["", "", "", "test_memory_utilization_on_"]])
+    # creating test ops object from a function named after the test case
+    def test_memory_utilization_on_():
+        return tests_tools.TestOps(TEST_DEFINITION, TEST_SUITE, DUT)
 
-    tops = tests_tools.TestOps(TEST_DEFINITION, TEST_SUITE, DUT)
+    tops = test_memory_utilization_on_()
 
     return tops
 
@@ -1160,13 +1744,13 @@ def test_test_ops_get_parameters(loginfo, logdebug, mocker):
     logdebug_calls = [
         call("Return testcases for Test Suite: test_memory.py"),
         call(
-            "Suite_parameters: [{'name': 'test_memory.py', 'testcases': "
+            "Suite_parameters: {'name': 'test_memory.py', 'testcases': "
             "[{'name': 'test_memory_utilization_on_', "
             "'description': 'Verify memory is not exceeding high utilization', "
             "'show_cmd': 'show version', 'expected_output': 80, 'report_style': 'modern', "
             "'test_criteria': 'Verify memory is not exceeding high utilization', "
             "'criteria': 'names', 'filter': ['DSR01', 'DCBBW1'], 'comment': None, "
-            "'result': True}]}]"
+            "'result': True}]}"
         ),
         call(
             "Case_parameters: {'name': 'test_memory_utilization_on_', "
@@ -1698,3 +2282,160 @@ def test_test_ops_transfer_file(mocker):
             file_tranfer_log,
         ],
     }
+
+
+def test_init_duts_streaming(mocker):
+    """Validates that streaming collection returns after login and publishes each dut
+    FIXTURE NEEDED: fixture_definitions.yaml, fixture_duts.yaml"""
+    show_cmds = ["show version"]
+    test_parameters = read_yaml("tests/unittests/fixtures/fixture_definitions.yaml")
+    test_parameters["parameters"]["streaming_collection"] = True
+    test_parameters["parameters"]["processes"] = None
+    test_duts = read_yaml("tests/unittests/fixtures/fixture_duts.yaml")
+    duts = [{"name": "DSR01"}, {"name": "DCBBW1"}]
+    release = threading.Event()
+
+    mocker.patch("vane.tests_tools.login_duts", return_value=duts)
+    mocker.patch("vane.tests_tools.dut_worker", side_effect=lambda *args: release.wait())
+
+    actual_output = tests_tools.init_duts(show_cmds, test_parameters, test_duts)
+
+    assert actual_output == duts
+    assert not tests_tools.duts_collected(["DSR01"])
+
+    release.set()
+    tests_tools.wait_for_duts()
+
+    assert tests_tools.duts_collected()
+
+
+def test_test_ops_get_new_conn_pooled(mocker):
+    """Validates that get_new_conn reuses pooled connections across calls"""
+    mocker.patch("vane.tests_tools.TestOps._verify_show_cmd", return_value=True)
+    set_up_conn = mocker.patch("vane.device_interface.NetmikoConn.set_up_conn")
+    mocker.patch("vane.device_interface.NetmikoConn.is_alive", return_value=True)
+    mocker.patch("vane.device_interface.PyeapiConn.set_up_conn")
+    tests_tools.configure_connection_pool({})
+
+    tops = create_test_ops_instance(mocker)
+    dut = {
+        "name": "neighbor",
+        "transport": "https",
+        "mgmt_ip": "1.1.1.1",
+        "username": "user1",
+        "password": "pass1",
+    }
+
+    ssh_conn = tops.get_new_conn(dut, "ssh", 30)
+
+    # a connection in use is not handed out again until it is released
+
+    other_conn = tops.get_new_conn(dut, "ssh", 30)
+    assert other_conn is not ssh_conn
+    tops.release_conn(dut, "ssh", 30, ssh_conn)
+    tops.release_conn(dut, "ssh", 30, other_conn, reuse=False)
+
+    assert tops.get_new_conn(dut, "ssh", 30) is ssh_conn
+    assert tops.get_new_conn(dut, "ssh", 60) is not ssh_conn
+    assert isinstance(tops.get_new_conn(dut, "eapi", 30), vane.device_interface.PyeapiConn)
+    assert set_up_conn.call_count == 3
+
+    with pytest.raises(ValueError):
+        tops.get_new_conn(dut, "telnet", 30)
+
+    tests_tools.configure_connection_pool({})
+
+
+def test_test_ops_failed_cmds_discard_conn(mocker):
+    """Validates that a connection whose cmds failed is not handed back to the pool"""
+    mocker.patch("vane.tests_tools.TestOps._verify_show_cmd", return_value=True)
+    mocker.patch("vane.device_interface.NetmikoConn.set_up_conn")
+    mocker.patch("vane.device_interface.NetmikoConn.is_alive", return_value=True)
+    close = mocker.patch("vane.device_interface.NetmikoConn.close")
+    tests_tools.configure_connection_pool({})
+
+    tops = create_test_ops_instance(mocker)
+    dut = {
+        "name": "neighbor",
+        "transport": "https",
+        "mgmt_ip": "1.1.1.1",
+        "username": "user1",
+        "password": "pass1",
+    }
+    mocker.patch.object(tops, "_record_cmds", side_effect=ReadTimeout("read timed out"))
+    get_new_conn = mocker.spy(tops, "get_new_conn")
+
+    with pytest.raises(ReadTimeout):
+        tops.run_show_cmds(["show version"], dut, "text", conn_type="ssh", timeout=30)
+    failed_conn = get_new_conn.spy_return
+    close.assert_called_once_with()
+
+    mocker.patch.object(tops, "_record_cmds", return_value=["output"])
+    assert tops.run_show_cmds(["show version"], dut, "text", conn_type="ssh", timeout=30) == [
+        "output"
+    ]
+    used_conn = get_new_conn.spy_return
+    assert used_conn is not failed_conn
+    close.assert_called_once_with()
+
+    # a connection whose cmds succeeded is reused
+    assert tops.get_new_conn(dut, "ssh", 30) is used_conn
+
+    tests_tools.configure_connection_pool({})
+
+
+def test_index_test_defs():
+    """Validates name keyed lookups into test definitions and that the index is built once"""
+    test_defs = {
+        "test_suites": [
+            {
+                "name": "test_memory.py",
+                "dir_path": "tests/memory",
+                "testcases": [
+                    {"name": "test_memory_utilization_on_", "test_setup": "setup.yaml"},
+                    {"name": "test_memory_free_on_"},
+                ],
+            }
+        ]
+    }
+
+    test_defs_index = tests_tools.index_test_defs(test_defs)
+
+    assert tests_tools.index_test_defs(test_defs) is test_defs_index
+    assert test_defs_index.suite("tests/memory/test_memory.py") is test_defs["test_suites"][0]
+    assert test_defs_index.testcase("test_memory.py", "test_memory_free_on_") == {
+        "name": "test_memory_free_on_"
+    }
+    assert test_defs_index.setup_file("test_memory_utilization_on_") == "tests/memory/setup.yaml"
+    assert test_defs_index.setup_file("test_memory_free_on_") is None
+
+    with pytest.raises(KeyError):
+        test_defs_index.testcase("test_memory.py", "test_missing_on_")
+
+    assert tests_tools.index_test_defs({"test_suites": []}) is not test_defs_index
+
+
+def test_test_parameters_copy_on_write():
+    """Validates that test parameters share the test case definition until they change"""
+    testcase = {"name": "test_ntp_", "ntp_servers": ["10.0.0.1"], "configuration": "ntp server"}
+    test_parameters = tests_tools.TestParameters(testcase)
+
+    assert test_parameters == testcase
+    assert test_parameters["configuration"] is testcase["configuration"]
+
+    test_parameters["ntp_servers"].append("10.0.0.2")
+    test_parameters["comment"] = "ntp synchronised"
+    del test_parameters["configuration"]
+
+    assert testcase == {
+        "name": "test_ntp_",
+        "ntp_servers": ["10.0.0.1"],
+        "configuration": "ntp server",
+    }
+    assert dict(test_parameters) == {
+        "name": "test_ntp_",
+        "ntp_servers": ["10.0.0.1", "10.0.0.2"],
+        "comment": "ntp synchronised",
+    }
+    assert "configuration" not in test_parameters
+    assert len(test_parameters) == 3
@@ -55,3 +55,43 @@ class UtilsTests:
         expected_result = ""
         result = utils.remove_comments(input_string)
         assert result == expected_result
+
+
+def test_prune_output():
+    """Verify json output is pruned to the requested paths"""
+    output = {
+        "modelName": "vEOS",
+        "version": "4.30",
+        "interfaces": {
+            "Ethernet1": {"description": "uplink", "lineProtocolStatus": "up"},
+            "Ethernet2": {"description": "", "lineProtocolStatus": "down"},
+        },
+        "peers": [{"address": "10.0.0.1", "state": "up"}],
+    }
+
+    assert utils.prune_output(output, ["modelName"]) == {"modelName": "vEOS"}
+    assert utils.prune_output(
+        output, ["interfaces.*.lineProtocolStatus", "interfaces.Ethernet1", "peers.state"]
+    ) == {
+        "interfaces": {
+            "Ethernet1": {"description": "uplink", "lineProtocolStatus": "up"},
+            "Ethernet2": {"lineProtocolStatus": "down"},
+        },
+        "peers": [{"state": "up"}],
+    }
+
+    raw = utils.RawJson('{"modelName": "vEOS", "version": "4.30"}')
+    raw.output_fields = ["version"]
+    assert raw.decode() == {"version": "4.30"}
+
+
+def test_caller_name():
+    """Validates that caller_name returns the name of the caller of its caller"""
+
+    def test_case_name():
+        return utils.caller_name()
+
+    def test_memory_utilization_on_():
+        return test_case_name()
+
+    assert test_memory_utilization_on_() == "test_memory_utilization_on_"
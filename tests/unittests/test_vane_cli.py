@@ -36,16 +36,18 @@ def test_setup_vane(loginfo, mocker):
     # mocking these methods since they have been tested in tests_tools tests
 
     mocker_object = mocker.patch("vane.tests_tools.import_yaml")
-    mocker_object.side_effect = ["Duts_file", "Test_parameters"]
+    mocker_object.side_effect = ["Duts_file", {"parameters": {}}]
     mocker.patch("vane.tests_tools.return_test_defs", return_value="Test definitions")
     mocker.patch("vane.tests_tools.return_show_cmds", return_value="show_commands")
+    mocker.patch("vane.tests_tools.return_collection_plan", return_value="show_commands")
+    mocker.patch("vane.tests_tools.return_output_fields", return_value={})
     mocker.patch("vane.tests_tools.init_duts", return_value="Dut object")
 
     vane_cli.setup_vane()
 
     # assert the vane.configs got set correctly
     assert vane.config.test_duts == "Duts_file"
-    assert vane.config.test_parameters == "Test_parameters"
+    assert vane.config.test_parameters == {"parameters": {}}
     assert vane.config.test_defs == "Test definitions"
     assert vane.config.dut_objs == "Dut object"
 
@@ -80,6 +82,30 @@ def test_run_tests(loginfo, mocker):
     loginfo.assert_called_with("Using class TestsClient to create vane_tests_client object")
 
 
+def test_run_shard(loginfo, mocker, tmp_path):
+    """Validates that a shard runs with a temporary duts file holding its credentials"""
+    duts_file = tmp_path / "duts.yaml"
+    duts_file.write_text("duts:\n- name: DSR01\n  password: cvp123!\n")
+    shard_dir = tmp_path / "shard-0"
+    shard_dir.mkdir()
+    (shard_dir / "duts.yaml").write_text(f"duts:\n- name: DSR01\nsource_duts_file: {duts_file}\n")
+
+    run_duts_files = []
+
+    def run_tests(definitions_file, run_duts_file):
+        assert definitions_file == f"{shard_dir}/definitions.yaml"
+        assert vane.config.DUTS_FILE == run_duts_file
+        run_duts_files.append(run_duts_file)
+        assert vane.tests_tools.import_yaml(run_duts_file)["duts"][0]["password"] == "cvp123!"
+
+    mocker.patch("vane.vane_cli.run_tests", side_effect=run_tests)
+
+    vane_cli.run_shard(str(shard_dir))
+
+    assert not os.path.exists(run_duts_files[0])
+    assert vane.shard_client.shard_done(str(shard_dir))["exit_code"] == 0
+
+
 def test_write_results(loginfo, mocker):
     """Validates functionality of write_results method"""
 
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2023, Arista Networks EOS+
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the Arista nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Cache of the show commands each platform rejects.
+
+The cache is stored as a yaml file keyed by model name and EOS version from
+'show version'.  Commands a platform rejected in a previous run are not sent
+to duts of the same platform again.
+"""
+
+import os
+import threading
+import yaml
+from vane.vane_logging import logging
+
+
+class CapabilityCache:
+    """Show commands rejected per platform and encoding"""
+
+    def __init__(self, cache_file=None):
+        """Initializes the Capability Cache
+
+        Args:
+            cache_file (str): yaml file the cache is stored in, None disables the cache
+        """
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._changed = False
+        self._platforms = {}
+
+        if cache_file and os.path.isfile(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as yaml_in:
+                self._platforms = yaml.safe_load(yaml_in) or {}
+
+            logging.info(f"Loaded capability cache {cache_file}")
+
+    @property
+    def enabled(self):
+        """Return True when a cache file is configured"""
+
+        return bool(self.cache_file)
+
+    @staticmethod
+    def platform(show_version):
+        """Return the platform of a dut from its 'show version' json output
+
+        Args:
+            show_version (dict): json output of 'show version'
+
+        Returns:
+            platform (tuple): model name and EOS version, None when unknown
+        """
+        if not isinstance(show_version, dict):
+            return None
+
+        model, version = show_version.get("modelName"), show_version.get("version")
+        if not model or not version:
+            return None
+
+        return model, version
+
+    def unsupported_cmds(self, platform, encoding):
+        """Return the commands a platform rejected with an encoding
+
+        Args:
+            platform (tuple): model name and EOS version
+            encoding (str): encoding type of show commands: either json or text
+
+        Returns:
+            show_cmds (list): rejected show commands
+        """
+        if not platform:
+            return []
+
+        model, version = platform
+
+        with self._lock:
+            return list(self._platforms.get(model, {}).get(version, {}).get(encoding, []))
+
+    def supported_cmds(self, platform, encoding, show_cmds):
+        """Remove the commands a platform is known to reject from show_cmds
+
+        Args:
+            platform (tuple): model name and EOS version
+            encoding (str): encoding type of show commands: either json or text
+            show_cmds (list): List of show commands
+
+        Returns:
+            show_cmds (list): show commands that are not known to be rejected
+        """
+        unsupported = self.unsupported_cmds(platform, encoding)
+
+        if unsupported:
+            logging.info(
+                f"Skipping {encoding} commands {unsupported} unsupported on {' '.join(platform)}"
+            )
+
+        return [show_cmd for show_cmd in show_cmds if show_cmd not in unsupported]
+
+    def add(self, platform, encoding, show_cmds):
+        """Record commands a platform rejected with an encoding
+
+        Args:
+            platform (tuple): model name and EOS version
+            encoding (str): encoding type of show commands: either json or text
+            show_cmds (list): rejected show commands
+        """
+        if not self.enabled or not platform or not show_cmds:
+            return
+
+        model, version = platform
+
+        with self._lock:
+            cached_cmds = (
+                self._platforms.setdefault(model, {})
+                .setdefault(version, {})
+                .setdefault(encoding, [])
+            )
+            for show_cmd in show_cmds:
+                if show_cmd not in cached_cmds:
+                    cached_cmds.append(show_cmd)
+                    self._changed = True
+
+    def save(self):
+        """Write the cache file when new rejected commands were recorded"""
+
+        with self._lock:
+            if not self.enabled or not self._changed:
+                return
+
+            cache_dir = os.path.dirname(self.cache_file)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+
+            with open(self.cache_file, "w", encoding="utf-8") as yaml_out:
+                yaml.safe_dump(self._platforms, yaml_out, default_flow_style=False)
+
+            self._changed = False
+
+        logging.info(f"Saved capability cache {self.cache_file}")
+
+
+_capability_cache = CapabilityCache()
+
+
+def configure_capability_cache(parameters):
+    """Load the capability cache named in the definitions file parameters
+
+    Args:
+        parameters (dict): parameters section of the definitions file
+
+    Returns:
+        cache (CapabilityCache): the loaded cache
+    """
+    global _capability_cache  # pylint: disable=global-statement
+
+    _capability_cache = CapabilityCache(parameters.get("capability_cache"))
+
+    return _capability_cache
+
+
+def get_capability_cache():
+    """Return the capability cache shared by the collection workers"""
+
+    return _capability_cache
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2023, Arista Networks EOS+
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the Arista nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Pool of reusable connections to duts.
+
+TestOps checks connections with a specific transport and read timeout out of
+the pool instead of logging in to the dut for every request, and releases
+them when its request is done.  A connection is only used by the caller that
+checked it out.  Idle connections are keyed by dut, transport, timeout and
+session log, are health checked before they are checked out again and are
+closed once they have been idle too long.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from vane.vane_logging import logging
+
+
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+class ConnectionPool:
+    """Reusable connections keyed by dut, transport, timeout and session log"""
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """Initializes the Connection Pool
+
+        Args:
+            idle_timeout (int): Seconds a connection may stay unused before it is closed
+        """
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # idle connections and the time they were released, by key
+        self._connections = {}
+
+    @staticmethod
+    def _close(key, conn):
+        """Close a connection, ignoring errors from connections that already died"""
+
+        logging.info(f"Closing pooled {key[1]} connection to {key[0]}")
+
+        try:
+            conn.close()
+        # pylint: disable-next=broad-exception-caught
+        except Exception as err:
+            logging.debug(f"Error closing pooled connection to {key[0]}: {err}")
+
+    def _evict_idle(self):
+        """Remove connections that have been idle longer than the idle timeout
+
+        Returns:
+            evicted (list): keys and connections that were removed
+        """
+        current = time.monotonic()
+        evicted = []
+
+        for key, idle in list(self._connections.items()):
+            evicted += [
+                (key, conn) for conn, released in idle if current - released > self.idle_timeout
+            ]
+            idle[:] = [
+                (conn, released)
+                for conn, released in idle
+                if current - released <= self.idle_timeout
+            ]
+            if not idle:
+                del self._connections[key]
+
+        return evicted
+
+    def checkout(self, key, create):
+        """Take an idle connection for key out of the pool, creating one when
+        there is no healthy idle connection.  The connection is not handed to
+        anyone else until it is released.
+
+        Args:
+            key (tuple): dut name, transport, timeout and session log
+            create (callable): creates a new connection
+
+        Returns:
+            conn (DeviceConn): connection to the dut
+        """
+        with self._lock:
+            evicted = self._evict_idle()
+            idle = self._connections.get(key)
+            conn = idle.pop()[0] if idle else None
+            if idle == []:
+                del self._connections[key]
+
+        for evicted_key, evicted_conn in evicted:
+            self._close(evicted_key, evicted_conn)
+
+        if conn is not None:
+            if conn.is_alive():
+                logging.info(f"Reusing pooled {key[1]} connection to {key[0]}")
+            else:
+                logging.info(f"Pooled {key[1]} connection to {key[0]} is not alive")
+                self._close(key, conn)
+                conn = None
+
+        if conn is None:
+            conn = create()
+
+        return conn
+
+    def release(self, key, conn):
+        """Return a checked out connection to the pool
+
+        Args:
+            key (tuple): dut name, transport, timeout and session log
+            conn (DeviceConn): connection returned by checkout
+        """
+        with self._lock:
+            self._connections.setdefault(key, []).append((conn, time.monotonic()))
+
+    def discard(self, key, conn):
+        """Close a checked out connection instead of releasing it, e.g. after
+        it was altered
+
+        Args:
+            key (tuple): dut name, transport, timeout and session log
+            conn (DeviceConn): connection returned by checkout
+        """
+        self._close(key, conn)
+
+    @contextmanager
+    def connection(self, key, create):
+        """Hold a checked out connection while the with block runs.  The
+        connection is closed instead of released when the block raises
+
+        Args:
+            key (tuple): dut name, transport, timeout and session log
+            create (callable): creates a new connection
+        """
+        conn = self.checkout(key, create)
+
+        try:
+            yield conn
+        except BaseException:
+            self.discard(key, conn)
+            raise
+        self.release(key, conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+
+        with self._lock:
+            connections = [
+                (key, conn) for key, idle in self._connections.items() for conn, _ in idle
+            ]
+            self._connections.clear()
+
+        for key, conn in connections:
+            self._close(key, conn)
+
+
+_pool = ConnectionPool()
+
+
+def configure_connection_pool(parameters):
+    """Create the connection pool from the definitions file parameters
+
+    Args:
+        parameters (dict): parameters section of the definitions file
+
+    Returns:
+        pool (ConnectionPool): the configured pool
+    """
+    global _pool  # pylint: disable=global-statement
+
+    _pool.close_all()
+    _pool = ConnectionPool(parameters.get("conn_pool_idle_timeout", DEFAULT_IDLE_TIMEOUT))
+
+    return _pool
+
+
+def get_connection_pool():
+    """Return the connection pool shared by the test cases"""
+
+    return _pool
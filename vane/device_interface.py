@@ -29,20 +29,62 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
-"""Device connection drivers - two types of drivers
+"""Device connection drivers - three types of drivers
    1. EAPI driver - uses pyeapi package
    2. ssh driver - uses Netmiko package
+   3. async EAPI driver - sends eAPI JSON-RPC requests from an asyncio event loop
+
+LazyConn wraps a driver so the device is only connected on first use.
+
+The EAPI driver also supports the http_keepalive and https_keepalive
+transports, which keep one connection per device open between requests.
 """
 
 import os
+import re
+import uuid
+import gzip
 import json
+import ssl
+import http.client
+import base64
+import asyncio
+import threading
 import pyeapi
+from pyeapi.eapilib import CommandError as EapiCommandError
+from pyeapi.eapilib import ConnectionError as EapiConnectionError
 import netmiko
 import paramiko
 from netmiko.ssh_autodetect import SSHDetect
 from netmiko import Netmiko, file_transfer
+from netmiko.exceptions import (
+    ConnectionException,
+    NetmikoAuthenticationException,
+    NetmikoTimeoutException,
+    ReadTimeout,
+)
 from vane.utils import make_iterable
+from vane.vane_logging import NETMIKO_LOG_DIRECTORY, logging
+
+
+# errors raised when a device can not be reached or does not answer in
+# time, as opposed to a failing command
+CONNECTION_ERRORS = (
+    EapiConnectionError,
+    OSError,
+    asyncio.TimeoutError,
+    ConnectionException,
+    NetmikoAuthenticationException,
+    NetmikoTimeoutException,
+    ReadTimeout,
+)
+
+# eAPI error codes of a command the device does not support: invalid
+# command (1002) and no json output for the command (1003)
+REJECTED_CMD_CODES = (1002, 1003)
 
+# keep-alive transports and the eAPI transport they are built on
+KEEPALIVE_TRANSPORTS = {"http_keepalive": "http", "https_keepalive": "https"}
 
 error_responses = [
     '% This is an unconverted command\n{\n    "errors": '
@@ -96,6 +138,16 @@ class CommandError(Exception):
         return trace
 
 
+def is_rejected_cmd(err):
+    """returns True when err is the device rejecting a command it does not
+    support, as opposed to a transient failure of the command"""
+
+    if isinstance(err, EapiCommandError):
+        return err.error_code in REJECTED_CMD_CODES
+
+    return isinstance(err, CommandError)
+
+
 class DeviceConn:
     """Base class for connecting to Arista devices"""
 
@@ -119,10 +171,192 @@ class DeviceConn:
         """Configures the node with the specified commands"""
         pass
 
+    def checkpoint_config(self, checkpoint_cmd, commands, **kwargs):
+        """Saves a checkpoint and configures the node with the specified commands"""
+        pass
+
     def transfer_file(self, src_file, dest_file, file_system, operation, sftp=False):
         """Transfer the file to/from the dut"""
         pass
 
+    def is_alive(self):
+        """Checks if the device conn can still be used"""
+        pass
+
+    def close(self):
+        """Closes the device conn"""
+        pass
+
+
+class ResumingHttpsConnection(pyeapi.eapilib.HttpsConnection):
+    """https transport that resumes the TLS session of its previous connection
+    when it has to reconnect"""
+
+    def __init__(self, path, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self.tls_session = None
+
+    def connect(self):
+        """Connect to the host, resuming the previous TLS session if there is one"""
+
+        # pylint: disable=bad-super-call
+        super(http.client.HTTPSConnection, self).connect()
+
+        self.sock = self._context.wrap_socket(
+            self.sock, server_hostname=self.host, session=self.tls_session
+        )
+
+    def save_tls_session(self):
+        """Remember the TLS session of the open connection.  With TLS 1.3 the
+        session ticket only arrives after the handshake, so the session is
+        saved once a response was read"""
+
+        session = getattr(self.sock, "session", None)
+        if session is not None:
+            self.tls_session = session
+
+    def getresponse(self):
+        response = super().getresponse()
+        self.save_tls_session()
+        return response
+
+    def close(self):
+        self.save_tls_session()
+        super().close()
+
+
+class KeepAliveEapiConnection(pyeapi.eapilib.EapiConnection):
+    """eAPI connection that keeps its http(s) connection open between requests.
+    Requests are serialized with a lock, so the connection can be shared by
+    threads."""
+
+    def __init__(
+        self,
+        host,
+        port=None,
+        path=None,
+        username=None,
+        password=None,
+        timeout=60,
+        use_https=True,
+        use_gzip=False,
+    ):
+        """Initializes the keep-alive eAPI connection
+
+        Args:
+            host (str): device address
+            port (int): eAPI port, defaults to 443 for https and 80 for http
+            path (str): eAPI path
+            username (str): eAPI username
+            password (str): eAPI password
+            timeout (int): read timeout
+            use_https (bool): connect with https
+            use_gzip (bool): ask for gzip encoded responses
+        """
+        super().__init__()
+        path = path or pyeapi.eapilib.DEFAULT_HTTP_PATH
+
+        if use_https:
+            # EOS uses self-signed certificates, same as the pyeapi default transport
+            # pylint: disable=protected-access
+            self.transport = ResumingHttpsConnection(
+                path,
+                host,
+                int(port or pyeapi.eapilib.DEFAULT_HTTPS_PORT),
+                context=ssl._create_unverified_context(),
+                timeout=timeout,
+            )
+        else:
+            self.transport = pyeapi.eapilib.HttpConnection(
+                path, host, int(port or pyeapi.eapilib.DEFAULT_HTTP_PORT), timeout=timeout
+            )
+
+        self.use_gzip = use_gzip
+        self._lock = threading.Lock()
+        self.authentication(username, password)
+
+    def _request(self, data):
+        """Send the eAPI request over the open connection
+
+        Returns:
+            status (int), reason (str), content (str): the http response
+        """
+        self.transport.putrequest("POST", "/command-api", skip_accept_encoding=self.use_gzip)
+        self.transport.putheader("Content-type", "application/json-rpc")
+        self.transport.putheader("Content-length", str(len(data)))
+        self.transport.putheader("Connection", "keep-alive")
+
+        if self.use_gzip:
+            self.transport.putheader("Accept-Encoding", "gzip")
+        if self._auth:
+            self.transport.putheader(*self._auth)
+
+        self.transport.endheaders(message_body=data)
+
+        response = self.transport.getresponse()
+        content = response.read()
+
+        if response.getheader("Content-Encoding", "") == "gzip":
+            content = gzip.decompress(content)
+        if response.will_close:
+            self.transport.close()
+
+        return response.status, response.reason, content.decode()
+
+    def send(self, data):
+        """Sends the eAPI request to the destination node over the kept-alive
+        connection, reconnecting once when the device closed an idle connection
+
+        Args:
+            data (string): The data to be included in the body of the eAPI
+                request object
+
+        Returns:
+            A decoded response
+        """
+        data = data.encode()
+
+        with self._lock:
+            try:
+                # a connection that was open may have been closed by the device
+                reused = self.transport.sock is not None
+                try:
+                    status, reason, content = self._request(data)
+                except (OSError, http.client.HTTPException):
+                    if not reused:
+                        raise
+                    self.transport.close()
+                    status, reason, content = self._request(data)
+
+                if status == 401:
+                    raise EapiConnectionError(str(self), f"{reason}. {content}")
+
+                decoded = json.loads(content)
+            except (OSError, http.client.HTTPException) as exc:
+                self.transport.close()
+                self.socket_error = exc
+                self.error = exc
+                raise EapiConnectionError(
+                    str(self), f"Socket error during eAPI connection: {exc}"
+                ) from exc
+            except ValueError as exc:
+                self.transport.close()
+                self.socket_error = None
+                self.error = exc
+                raise EapiConnectionError(str(self), "unable to connect to eAPI") from exc
+
+        if "error" in decoded:
+            code, message, command_error, output = self._parse_error_message(decoded)
+            raise EapiCommandError(code, message, command_error=command_error, output=output)
+
+        return decoded
+
+    def close(self):
+        """Close the kept-alive connection"""
+
+        with self._lock:
+            self.transport.close()
+
 
 class PyeapiConn(DeviceConn):
     """PyeapiConn connects to Arista devices using PyEAPI"""
@@ -134,15 +368,35 @@ class PyeapiConn(DeviceConn):
 
     def set_up_conn(self, device_data):
         """connects to device using pyeapi"""
+        transport = device_data["transport"]
+
         # pylint: disable=attribute-defined-outside-init
-        self._connection = pyeapi.connect(
-            transport=device_data["transport"],
-            host=device_data["mgmt_ip"],
-            username=device_data["username"],
-            password=device_data["password"],
-            timeout=device_data.get("timeout", 60),
-            return_node=True,
-        )
+        if transport in KEEPALIVE_TRANSPORTS:
+            connection = KeepAliveEapiConnection(
+                host=device_data["mgmt_ip"],
+                port=device_data.get("port"),
+                username=device_data["username"],
+                password=device_data["password"],
+                timeout=device_data.get("timeout", 60),
+                use_https=KEEPALIVE_TRANSPORTS[transport] == "https",
+                use_gzip=device_data.get("eapi_gzip", False),
+            )
+            self._connection = pyeapi.client.Node(
+                connection,
+                transport=KEEPALIVE_TRANSPORTS[transport],
+                host=device_data["mgmt_ip"],
+                username=device_data["username"],
+                password=device_data["password"],
+            )
+        else:
+            self._connection = pyeapi.connect(
+                transport=transport,
+                host=device_data["mgmt_ip"],
+                username=device_data["username"],
+                password=device_data["password"],
+                timeout=device_data.get("timeout", 60),
+                return_node=True,
+            )
         if device_data.get("enable_pwd", ""):
             self._connection.enable_authentication(device_data["enable_pwd"])
 
@@ -166,10 +420,27 @@ class PyeapiConn(DeviceConn):
         output = self._connection.config(commands, **kwargs)
         return output
 
+    def checkpoint_config(self, checkpoint_cmd, commands, **kwargs):
+        """Saves a checkpoint and sends the config commands in a single eAPI
+        request, returns the output of the config commands"""
+        commands = [checkpoint_cmd, "configure", *make_iterable(commands), "end"]
+        output = self._connection.run_commands(commands, **kwargs)
+        return output[2:-1]
+
     def transfer_file(self, src_file, dest_file, file_system, operation, sftp=False):
         """Transfer the file to/from the dut"""
         raise NotImplementedError("PyeapiConn does not implement transfer_file()")
 
+    def is_alive(self):
+        """checks that the last eapi request did not fail to reach the device"""
+        return self._connection.connection.socket_error is None
+
+    def close(self):
+        """closes the connection kept open by the keep-alive transports"""
+        connection = self._connection.connection
+        if isinstance(connection, KeepAliveEapiConnection):
+            connection.close()
+
 
 class NetmikoConn(DeviceConn):
     """NetmikoConn connects to Arista devices using ssh conn"""
@@ -182,15 +453,20 @@ class NetmikoConn(DeviceConn):
         """sets up conn to device using _config params"""
 
         self.name = device_data["name"]
+        # pylint: disable=attribute-defined-outside-init
+        self._device_data = device_data
+        self._batch_cmds = device_data.get("ssh_batch_cmds", False)
+        # a new session starts in exec mode
+        self._enabled = False
 
         default_device_type = "arista_eos"
 
         try:
-            os.makedirs("netmiko-logs")
+            os.makedirs(NETMIKO_LOG_DIRECTORY)
         except FileExistsError:
             pass
 
-        logfile = f'netmiko-logs/netmiko-session-{device_data["name"]}.log'
+        logfile = os.path.join(NETMIKO_LOG_DIRECTORY, f'netmiko-session-{device_data["name"]}.log')
         remote_device = {
             "device_type": device_data.get("device_type", default_device_type),
             "host": device_data["mgmt_ip"],
@@ -232,7 +508,8 @@ class NetmikoConn(DeviceConn):
                 output = self._connection.send_command(cmd)
             except netmiko.exceptions.NetmikoTimeoutException:
                 # try resetting connection and see if it works
-                self.set_up_conn(self.name)
+                self.set_up_conn(self._device_data)
+                self._enter_enable()
                 output = self._connection.send_command(cmd)
 
             if output not in error_responses:
@@ -258,7 +535,8 @@ class NetmikoConn(DeviceConn):
             output = self._connection.send_command(cmds)
         except netmiko.exceptions.NetmikoTimeoutException:
             # try resetting connection and see if it works
-            self.set_up_conn(self.name)
+            self.set_up_conn(self._device_data)
+            self._enter_enable()
             output = self._connection.send_command(cmds)
 
         if output not in error_responses:
@@ -274,6 +552,86 @@ class NetmikoConn(DeviceConn):
 
         return cmds_op
 
+    def _write_batch(self, cmds, markers):
+        """writes cmds to the ssh channel in one write, each command preceded
+        by its marker comment, and reads the output up to the prompt following
+        the last marker"""
+
+        lines = []
+        for marker, cmd in zip(markers, cmds):
+            lines += [marker, cmd]
+        lines.append(markers[-1])
+
+        self._connection.write_channel("\n".join(lines) + "\n")
+        prompt = re.escape(self._connection.base_prompt)
+        output = self._connection.read_until_pattern(
+            pattern=rf"{re.escape(markers[-1])}[^\n]*\n[^\n]*{prompt}",
+            read_timeout=10.0 * len(cmds),
+        )
+
+        return output.replace("\r\n", "\n").replace("\r", "\n")
+
+    def send_batch_cmds(self, cmds, encoding="json"):
+        """send_batch_cmds: sends the list of commands to device conn in a
+        single write and collects the output as list.  Every command is
+        preceded by a unique comment line, which the device echoes back, so
+        the output can be split per command"""
+
+        token = uuid.uuid4().hex[:8]
+        markers = [f"! vane-batch-{token}-{i}" for i in range(len(cmds) + 1)]
+
+        try:
+            output = self._write_batch(cmds, markers)
+        except netmiko.exceptions.NetmikoTimeoutException:
+            # try resetting connection and see if it works
+            self.set_up_conn(self._device_data)
+            self._enter_enable()
+            output = self._write_batch(cmds, markers)
+
+        lines = output.split("\n")
+        positions = []
+        for marker in markers:
+            positions.append(
+                next((i for i, line in enumerate(lines) if line.rstrip().endswith(marker)), None)
+            )
+
+        if None in positions:
+            # e.g. truncated output or a prompt that did not match, the channel
+            # was read up to the last marker so the commands can be resent
+            logging.warning(
+                f"Could not split the batch output of {cmds} on "
+                f"{self._device_data['name']}, sending the commands one by one"
+            )
+            return self.send_list_cmds(cmds=cmds, encoding=encoding)
+
+        cmds_op = []
+
+        for i, cmd in enumerate(cmds):
+            start, end = positions[i] + 1, positions[i + 1]
+            cmd_lines = lines[start:end]
+            # drop the echo of the command
+            if cmd_lines and cmd_lines[0].rstrip().endswith(cmd):
+                cmd_lines = cmd_lines[1:]
+            cmd_output = "\n".join(cmd_lines).strip()
+
+            if cmd_output in error_responses:
+                err_msg = f"Could not execute {cmd}.Got error: {cmd_output}"
+                raise CommandError(err_msg, cmds)
+
+            if encoding == "json":
+                cmds_op.append(json.loads(cmd_output))
+            elif encoding == "text":
+                cmds_op.append({"output": cmd_output})
+
+        return cmds_op
+
+    def _enter_enable(self):
+        """enters enable mode once per ssh session"""
+
+        if not self._enabled:
+            self._connection.enable()
+            self._enabled = True
+
     def run_commands(self, cmds, encoding="json", send_enable=True, **kwargs):
         """This function is added to make sure both PyeapiConn and NetmikoConn
         support same functions. This will help the code to work seemlessly
@@ -283,7 +641,7 @@ class NetmikoConn(DeviceConn):
         local_cmds = []
 
         if send_enable:
-            self._connection.enable()
+            self._enter_enable()
 
         if encoding == "json":
             # for json encoding, lets try to run cmds using | json
@@ -294,7 +652,9 @@ class NetmikoConn(DeviceConn):
             # when cmds is a string and encoding is text
             local_cmds = cmds
 
-        if isinstance(cmds, list):
+        if isinstance(cmds, list) and self._batch_cmds and len(cmds) > 1:
+            cmds_op = self.send_batch_cmds(cmds=local_cmds, encoding=encoding)
+        elif isinstance(cmds, list):
             cmds_op = self.send_list_cmds(cmds=local_cmds, encoding=encoding)
         elif isinstance(cmds, str):
             cmds_op = self.send_str_cmds(cmds=local_cmds, encoding=encoding)
@@ -367,11 +727,16 @@ class NetmikoConn(DeviceConn):
         commands = make_iterable(commands)
         commands = list(commands)
 
-        self._connection.enable()
+        self._enter_enable()
         response = self._connection.send_config_set(commands)
 
         return response
 
+    def checkpoint_config(self, checkpoint_cmd, commands, **kwargs):
+        """Saves a checkpoint and configures the node with the specified commands"""
+        self.enable([checkpoint_cmd])
+        return self.config(commands, **kwargs)
+
     def transfer_file(self, src_file, dest_file, file_system, operation, sftp=False):
         """Transfer the file to/from the dut"""
 
@@ -379,7 +744,7 @@ class NetmikoConn(DeviceConn):
             transport = self._connection.remote_conn.get_transport()
             self._connection.remote_conn = paramiko.SFTPClient.from_transport(transport)
 
-        self._connection.enable()
+        self._enter_enable()
         transfer = file_transfer(
             self._connection,
             source_file=src_file,
@@ -390,3 +755,205 @@ class NetmikoConn(DeviceConn):
         )
 
         return transfer
+
+    def is_alive(self):
+        """wrapper around netmiko is_alive func"""
+        return self._connection.is_alive()
+
+    def close(self):
+        """wrapper around netmiko disconnect func"""
+        self._connection.disconnect()
+
+
+class LazyConn:
+    """LazyConn sets up a driver connection on first use.  Attribute access is
+    forwarded to the driver, so LazyConn is used in place of the driver"""
+
+    def __init__(self, conn_class, device_data):
+        """Initializes the lazy connection
+
+        Args:
+            conn_class (class): driver class, PyeapiConn or NetmikoConn
+            device_data (dict): device parameters passed to set_up_conn
+        """
+        self._conn_class = conn_class
+        self._device_data = device_data
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self):
+        """returns True once the driver connection is set up"""
+        return self._conn is not None
+
+    def connect(self):
+        """sets up the driver connection if it is not set up yet
+
+        Returns:
+            conn (DeviceConn): driver connection
+        """
+        with self._lock:
+            if self._conn is None:
+                conn = self._conn_class()
+                conn.set_up_conn(self._device_data)
+                self._conn = conn
+
+        return self._conn
+
+    def __getattr__(self, name):
+        # private attributes are never forwarded, copy and pickle probe them
+        # before __init__ has run
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return getattr(self.connect(), name)
+
+
+class AsyncEapiConn:
+    """AsyncEapiConn connects to Arista devices using eAPI JSON-RPC requests
+    driven from an asyncio event loop, so that a single thread can keep many
+    devices busy at once"""
+
+    def set_up_conn(self, device_data):
+        """stores the parameters needed to reach the device eAPI endpoint"""
+
+        transport = device_data.get("transport", "https")
+        transport = KEEPALIVE_TRANSPORTS.get(transport, transport)
+        if transport not in ("http", "https"):
+            raise ValueError(f"AsyncEapiConn does not support transport {transport}")
+
+        # pylint: disable=attribute-defined-outside-init
+        self.name = device_data["name"]
+        self._host = device_data["mgmt_ip"]
+        self._port = int(device_data.get("port", 443 if transport == "https" else 80))
+        self._timeout = device_data.get("timeout", 60)
+        self._enable_pwd = device_data.get("enable_pwd", "")
+        self._ssl_context = None
+
+        if transport == "https":
+            # EOS uses self-signed certificates, same as the pyeapi default transport
+            # pylint: disable=protected-access
+            self._ssl_context = ssl._create_unverified_context()
+
+        credentials = f'{device_data["username"]}:{device_data["password"]}'
+        self._auth = base64.b64encode(credentials.encode()).decode()
+
+    async def run_commands(self, cmds, encoding="json", send_enable=True, **kwargs):
+        """async counterpart of pyeapi run_commands func"""
+
+        commands = list(cmds)
+
+        if send_enable:
+            if self._enable_pwd:
+                commands.insert(0, {"cmd": "enable", "input": self._enable_pwd})
+            else:
+                commands.insert(0, "enable")
+
+        request = {
+            "jsonrpc": "2.0",
+            "method": "runCmds",
+            "params": {"version": 1, "cmds": commands, "format": encoding},
+            "id": f"vane-{self.name}",
+        }
+        response = await asyncio.wait_for(
+            self._send(json.dumps(request).encode()), timeout=self._timeout
+        )
+
+        if "error" in response:
+            error = response["error"]
+            command_error = None
+            if "data" in error:
+                command_error = ", ".join(
+                    f"{key}: {repr(value)}" for data in error["data"] for key, value in data.items()
+                )
+            raise EapiCommandError(
+                error["code"],
+                error["message"],
+                command_error=command_error,
+                output=error.get("data"),
+            )
+
+        result = response["result"]
+        if send_enable:
+            result.pop(0)
+
+        return result
+
+    async def _send(self, payload):
+        """sends one eAPI request over a new connection and returns the decoded response"""
+
+        try:
+            reader, writer = await asyncio.open_connection(
+                self._host, self._port, ssl=self._ssl_context
+            )
+        except OSError as err:
+            raise EapiConnectionError(
+                self.name, f"Socket error during eAPI connection: {err}"
+            ) from err
+
+        try:
+            header = (
+                f"POST /command-api HTTP/1.1\r\n"
+                f"Host: {self._host}\r\n"
+                f"Content-Type: application/json-rpc\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Authorization: Basic {self._auth}\r\n"
+                f"Connection: close\r\n\r\n"
+            )
+            writer.write(header.encode() + payload)
+            await writer.drain()
+
+            status, reason, headers = await self._read_headers(reader)
+            body = await self._read_body(reader, headers)
+        except (OSError, asyncio.IncompleteReadError) as err:
+            raise EapiConnectionError(
+                self.name, f"Socket error during eAPI connection: {err}"
+            ) from err
+        finally:
+            writer.close()
+
+        if status == 401:
+            raise EapiConnectionError(self.name, f"{reason}. {body.decode(errors='replace')}")
+
+        try:
+            return json.loads(body)
+        except ValueError as err:
+            raise EapiConnectionError(self.name, "unable to connect to eAPI") from err
+
+    @staticmethod
+    async def _read_headers(reader):
+        """reads the HTTP status line and headers of a response"""
+
+        status_line = (await reader.readline()).decode("latin-1").split(" ", 2)
+        status = int(status_line[1])
+        reason = status_line[2].strip() if len(status_line) > 2 else ""
+        headers = {}
+
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        return status, reason, headers
+
+    @staticmethod
+    async def _read_body(reader, headers):
+        """reads the HTTP response body honouring chunked and sized encodings"""
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            return b"".join(chunks)
+
+        if "content-length" in headers:
+            return await reader.readexactly(int(headers["content-length"]))
+
+        return await reader.read()
@@ -37,16 +37,51 @@
 Fixture setup and teardown functions
 """
 
+import concurrent.futures
 import datetime
+import inspect
+import itertools
+import os
+import time
 import pytest
 
 from jinja2 import Template
-from vane import tests_tools
-from vane.config import dut_objs, test_defs
+from vane import config, snapshot, test_step_client, tests_tools
+from vane.connection_pool import get_connection_pool
+from vane.output_store import get_output_store
+from vane.request_scheduler import get_scheduler
 from vane.utils import get_current_fixture_testclass, get_current_fixture_testname, remove_comments
 from vane.vane_logging import logging
 
 
+# pytest-xdist workers load the duts collected by the vane process
+snapshot.load_worker_snapshot()
+
+# threads setting up or tearing down duts at once
+DEFAULT_SETUP_MAX_WORKERS = 32
+
+# xdist group of the tests that run on every dut
+ALL_DUTS_GROUP = "all_duts"
+
+# seconds the tests of every dut keep waiting for the tests of single duts
+# while none of them finishes, e.g. after a worker crashed
+DUT_PHASE_STALL_TIMEOUT = 600
+DUT_PHASE_POLL_INTERVAL = 0.5
+
+# with dut affinity, the tests of single duts collected and finished by this
+# process, the tests of every dut run once all workers finished them
+dut_phase = {"nodeids": set(), "finished": 0, "done": False}
+
+# test suite setups performed per dut with dut affinity, by test class node id
+suite_setups = {}
+
+# test case setup kept applied while the next tests share it
+active_testcase_setup = {}
+
+# test run next by pytest, by node id of the test being torn down
+runtest_nextitems = {}
+
+
 def idfn(val):
     """id function for the current fixture data
 
@@ -61,7 +96,7 @@ def idfn(val):
     return val["name"]
 
 
-@pytest.fixture(scope="session", params=dut_objs, ids=idfn)
+@pytest.fixture(scope="session", params=config.dut_objs, ids=idfn)
 def dut(request):
     """Parameterize each dut for a test case
 
@@ -87,13 +122,42 @@ def duts():
 
     logging.debug("Invoking fixture to get list of duts")
     duts_dict = {}
-    for dutt in dut_objs:
+    for dutt in config.dut_objs:
         duts_dict[dutt["name"]] = dutt
 
     logging.debug(f"Returning duts dictionary: {duts_dict}")
     return duts_dict
 
 
+@pytest.fixture(scope="session", autouse=True)
+def connection_pool():
+    """Share pooled dut connections across test cases and close them at the
+    end of the session
+
+    Yields:
+        [ConnectionPool]: the connection pool
+    """
+
+    yield get_connection_pool()
+
+    logging.debug("Closing pooled connections")
+    get_connection_pool().close_all()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def output_store():
+    """Keep the output files of the duts open until the end of the session
+
+    Yields:
+        [OutputStore]: the output store
+    """
+
+    yield get_output_store()
+
+    logging.debug("Closing output files")
+    get_output_store().close_all()
+
+
 @pytest.fixture()
 def tests_definitions():
     """Return test definitions to each test case
@@ -106,7 +170,429 @@ def tests_definitions():
     """
 
     logging.debug("Invoking fixture to get test definitions for each test case")
-    yield test_defs
+    yield config.test_defs
+
+
+@pytest.fixture(scope="session")
+def topology():
+    """Returns the topology of the duts under test
+
+    Returns:
+        [TopologyIndex]: neighbors and links of each dut by name
+    """
+
+    logging.debug("Invoking fixture to get the topology of the duts")
+    return tests_tools.index_topology(config.test_duts)
+
+
+@pytest.fixture()
+def tops(request, tests_definitions, dut):  # pylint: disable=redefined-outer-name
+    """Return the TestOps of the test case for the dut it runs on.  The test
+    case name comes from the test item instead of a stack lookup
+
+    Args:
+        request (pytest.FixtureRequest): request of the test case
+        tests_definitions (dict): test definitions
+        dut (dict): dut the test case runs on
+
+    Returns:
+        [TestOps]: TestOps of the test case
+    """
+
+    test_suite = getattr(request.module, "TEST_SUITE", request.node.fspath.basename)
+    return tests_tools.TestOps(
+        tests_definitions, test_suite, dut, test_case=request.node.originalname
+    )
+
+
+def item_dut_names(item):
+    """Return the names of the duts a test item runs on
+
+    Args:
+        item (pytest.Item): test item
+
+    Returns:
+        [list]: name of the parametrized dut, or every dut when the test is
+        not parametrized by dut
+    """
+
+    callspec = getattr(item, "callspec", None)
+    dutt = callspec.params.get("dut") if callspec else None
+
+    if isinstance(dutt, dict) and "name" in dutt:
+        return [dutt["name"]]
+
+    return [dutt["name"] for dutt in config.dut_objs]
+
+
+def dut_affinity(pytest_config):
+    """Return True when pytest-xdist runs the tests of each dut on a single worker
+
+    Args:
+        pytest_config (pytest.Config): pytest config
+
+    Returns:
+        [bool]: True with --dist=loadgroup
+    """
+
+    option = pytest_config.option
+    return bool(getattr(option, "loadgroup", False)) or getattr(option, "dist", "no") == "loadgroup"
+
+
+def item_dut_group(item):
+    """Return the xdist group of a test item: the name of its dut, or
+    ALL_DUTS_GROUP for tests that run on every dut
+
+    Args:
+        item (pytest.Item): test item
+    """
+
+    dut_names = item_dut_names(item)
+
+    return dut_names[0] if len(dut_names) == 1 else ALL_DUTS_GROUP
+
+
+def order_dut_phases(items):
+    """Run the tests of every dut after the tests of single duts
+
+    Args:
+        items (list): collected test items
+
+    Returns:
+        [list]: reordered test items
+    """
+
+    dut_items, all_duts_items = [], []
+    for item in items:
+        if item_dut_group(item) == ALL_DUTS_GROUP:
+            all_duts_items.append(item)
+        else:
+            dut_items.append(item)
+
+    dut_phase.update(nodeids={item.nodeid for item in dut_items}, finished=0, done=False)
+
+    return dut_items + all_duts_items
+
+
+def finish_dut_test(nodeid):
+    """Publish to the other workers that this worker finished a test of a
+    single dut
+
+    Args:
+        nodeid (str): node id of the finished test
+    """
+
+    if nodeid not in dut_phase["nodeids"]:
+        # xdist appends @<xdist group> to the node id of grouped tests
+        nodeid = nodeid.rpartition("@")[0]
+    if nodeid not in dut_phase["nodeids"]:
+        return
+
+    dut_phase["finished"] += 1
+
+    dut_phase_dir = os.environ.get(snapshot.DUT_PHASE_ENV)
+    if not dut_phase_dir:
+        return
+
+    path = os.path.join(dut_phase_dir, os.environ.get("PYTEST_XDIST_WORKER", "main"))
+    with open(f"{path}.tmp", "w", encoding="utf-8") as count_out:
+        count_out.write(str(dut_phase["finished"]))
+    os.replace(f"{path}.tmp", path)
+
+
+def finished_dut_tests(dut_phase_dir):
+    """Return the number of tests of single duts finished by all workers
+
+    Args:
+        dut_phase_dir (str): directory the workers publish their finished tests in
+    """
+
+    finished = 0
+    for name in os.listdir(dut_phase_dir):
+        if name.endswith(".tmp"):
+            continue
+        try:
+            with open(os.path.join(dut_phase_dir, name), "r", encoding="utf-8") as count_in:
+                finished += int(count_in.read())
+        except (OSError, ValueError):
+            continue
+
+    return finished
+
+
+def wait_for_dut_tests():
+    """Wait until the workers finished the tests of single duts, so tests of
+    every dut do not configure duts other workers are testing"""
+
+    dut_phase_dir = os.environ.get(snapshot.DUT_PHASE_ENV)
+    if dut_phase["done"] or not dut_phase_dir:
+        # in a single process the tests of every dut already run last
+        return
+
+    total = len(dut_phase["nodeids"])
+    progress, progress_time = -1, time.monotonic()
+
+    while True:
+        finished = finished_dut_tests(dut_phase_dir)
+        if finished >= total:
+            break
+
+        if finished != progress:
+            logging.info(f"Waiting for tests of single duts, {finished} of {total} finished")
+            progress, progress_time = finished, time.monotonic()
+        elif time.monotonic() - progress_time > DUT_PHASE_STALL_TIMEOUT:
+            logging.warning(
+                f"No test of a single dut finished in {DUT_PHASE_STALL_TIMEOUT}s, running "
+                f"tests of every dut with {total - finished} tests of single duts left"
+            )
+            break
+
+        time.sleep(DUT_PHASE_POLL_INTERVAL)
+
+    dut_phase["done"] = True
+
+
+def reuse_test_setup():
+    """Return True when consecutive tests sharing a setup file keep it applied"""
+
+    return config.test_parameters.get("parameters", {}).get("reuse_test_setup", False)
+
+
+def testcase_setup_file(testname):
+    """Return the setup file of a test case
+
+    Args:
+        testname (str): name of the test case
+
+    Returns:
+        [str]: path of the setup file, None when the test case has none
+    """
+
+    return tests_tools.index_test_defs(config.test_defs).setup_file(testname)
+
+
+def item_setup_key(item):
+    """Return what a test item sets up: its setup file and the duts it
+    configures, None when the test has no setup file
+
+    Args:
+        item (pytest.Item): test item
+    """
+
+    setup_file = testcase_setup_file(item.originalname)
+    if setup_file is None:
+        return None
+
+    if dut_affinity(item.config):
+        return (setup_file, tuple(item_dut_names(item)))
+
+    return (setup_file, tuple(dutt["name"] for dutt in config.dut_objs))
+
+
+def order_by_setup(items):
+    """Move the tests of a class with a setup file right after the first test
+    of the class sharing it, so the setup is applied once.  Tests without a
+    setup file keep their order
+
+    Args:
+        items (list): collected test items
+
+    Returns:
+        [list]: reordered test items
+    """
+
+    ordered_items = []
+    for _, class_items in itertools.groupby(items, key=lambda item: item.parent):
+        class_items = list(class_items)
+        setup_positions, positions = {}, []
+        for position, item in enumerate(class_items):
+            setup_file = testcase_setup_file(item.originalname)
+            if setup_file is not None:
+                position = setup_positions.setdefault(setup_file, position)
+            positions.append(position)
+        ordered_items += [
+            item for _, item in sorted(zip(positions, class_items), key=lambda pair: pair[0])
+        ]
+
+    return ordered_items
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):  # pylint: disable=redefined-outer-name
+    """With dut affinity, group the tests of each dut so a single xdist worker
+    runs them.  Parse test steps and descriptions.  Group the tests of a
+    class sharing a setup file.  With streaming collection, run the tests of
+    duts whose show output is already collected first, keeping the tests of a
+    class together
+
+    Args:
+        config (pytest.Config): pytest config
+        items (list): collected test items
+    """
+
+    if dut_affinity(config):
+        for item in items:
+            item.add_marker(pytest.mark.xdist_group(item_dut_group(item)))
+        # xdist assigns the group of the tests of every dut last
+        items[:] = order_dut_phases(items)
+
+    # parse test steps and descriptions once per test function
+    for function in {getattr(item, "function", None) for item in items}:
+        if inspect.isfunction(function):
+            test_step_client.function_docs(function)
+
+    if reuse_test_setup():
+        items[:] = order_by_setup(items)
+
+    if tests_tools.duts_collected():
+        return
+
+    logging.info("Running tests of collected duts first")
+
+    ordered_items = []
+    for _, class_items in itertools.groupby(items, key=lambda item: item.parent):
+        ordered_items += sorted(
+            class_items, key=lambda item: not tests_tools.duts_collected(item_dut_names(item))
+        )
+
+    items[:] = ordered_items
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    """Wait until the show output of the duts a test runs on is collected.
+    With dut affinity, tests of every dut also wait until the tests of single
+    duts are finished
+
+    Args:
+        item (pytest.Item): test item
+    """
+
+    if dut_affinity(item.config) and item_dut_group(item) == ALL_DUTS_GROUP:
+        wait_for_dut_tests()
+
+    tests_tools.wait_for_duts(item_dut_names(item))
+
+
+def pytest_runtest_logfinish(nodeid, location):  # pylint: disable=unused-argument
+    """Count the tests of single duts this worker finished
+
+    Args:
+        nodeid (str): node id of the test
+        location (tuple): file, line and name of the test
+    """
+
+    finish_dut_test(nodeid)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_teardown(item, nextitem):
+    """Remember the next test before the fixtures of item are finalized, so
+    setup_testcase can keep a setup the next test shares
+
+    Args:
+        item (pytest.Item): test item being torn down
+        nextitem (pytest.Item): next test item, None for the last one
+    """
+
+    runtest_nextitems[item.nodeid] = nextitem
+
+
+def setup_workers(count):
+    """Return the number of threads setting up or tearing down count duts
+
+    Args:
+        count (int): number of duts
+
+    Returns:
+        workers (int): number of threads
+    """
+    parameters = config.test_parameters.get("parameters", {})
+    workers = min(count, parameters.get("setup_max_workers", DEFAULT_SETUP_MAX_WORKERS))
+    if get_scheduler().max_in_flight:
+        # threads beyond the in-flight cap would only wait on the scheduler
+        workers = min(workers, get_scheduler().max_in_flight)
+    return max(workers, 1)
+
+
+def render_setup_config(dut_setup):
+    """Return the config lines of the setup of a dut
+
+    Args:
+        dut_setup (dict): schema and template of the dut setup
+
+    Returns:
+        dut_config (list): config lines
+    """
+    setup_schema = remove_comments(dut_setup["schema"])
+
+    if setup_schema is None:
+        temp_without_comments = remove_comments(dut_setup["template"])
+        return temp_without_comments.splitlines()
+
+    template = remove_comments(dut_setup["template"])
+    setup_template = Template(template)
+    return setup_template.render(setup_schema).splitlines()
+
+
+def setup_dut(dutt, dut_config, checkpoint):
+    """Creates checkpoint on a dut and sends its setup config in one request"""
+
+    checkpoint_cmd = f"configure checkpoint save {checkpoint}"
+
+    # with streaming collection, the show output must not mix pre and post
+    # setup state
+    tests_tools.wait_for_duts([dutt["name"]])
+
+    logging.info(f"Sending checkpoint command and config to dut {dutt['name']}")
+    logging.debug(f"Sending checkpoint command: {checkpoint_cmd}")
+    logging.debug(f"Sending config:\n{dut_config}")
+    with get_scheduler().slot(dutt):
+        dutt["connection"].checkpoint_config(checkpoint_cmd, dut_config)
+
+
+def run_setup(setup_plan, checkpoint):
+    """Runs the setup of the duts concurrently.  When a dut fails, duts not
+    started yet are skipped and only the duts that were touched are restored
+
+    Args:
+        setup_plan (list): (dut, config lines) of each dut to set up
+        checkpoint (str): checkpoint name
+    """
+    if not setup_plan:
+        return
+
+    touched = []
+    failures = []
+
+    def setup_worker(dutt, dut_config):
+        if failures:
+            return
+        touched.append(dutt)
+        try:
+            setup_dut(dutt, dut_config, checkpoint)
+        except BaseException as e:
+            failures.append(e)
+            raise
+
+    workers = setup_workers(len(setup_plan))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for dutt, dut_config in setup_plan:
+            executor.submit(setup_worker, dutt, dut_config)
+
+    if failures:
+        e = failures[0]
+        logging.info(f"setup failed with exception {e} and mesg {str(e)}")
+        logging.debug(f"reverting to checkpoint {checkpoint} on {[d['name'] for d in touched]}")
+        # something failed, restore the duts that were touched
+        checkpoint_restore_cmd = f"configure replace checkpoint:{checkpoint} skip-checkpoint"
+        delete_checkpoint_cmd = f"delete checkpoint:{checkpoint}"
+        try:
+            run_teardown(touched, checkpoint_restore_cmd, delete_checkpoint_cmd)
+        except BaseException as teardown_error:  # pylint: disable=broad-except
+            logging.error(f"restoring checkpoint {checkpoint} failed: {teardown_error}")
+        # reraise the exception
+        raise e
 
 
 def setup_via_name(duts, setup_config, checkpoint):
@@ -114,6 +600,7 @@ def setup_via_name(duts, setup_config, checkpoint):
     duts identified using the device name"""
 
     logging.info("Performing setup via dut names")
+    setup_plan = []
     for dev_name in setup_config:
         dutt = duts.get(dev_name, None)
 
@@ -121,34 +608,9 @@ def setup_via_name(duts, setup_config, checkpoint):
             logging.info(f"No dut named {dev_name} found, continuing to setup next dut")
             continue
 
-        setup_schema = remove_comments(setup_config[dev_name]["schema"])
-
-        if setup_schema is None:
-            temp_without_comments = remove_comments(setup_config[dev_name]["template"])
-            config = temp_without_comments.splitlines()
-        else:
-            template = remove_comments(setup_config[dev_name]["template"])
-            setup_template = Template(template)
-            config = setup_template.render(setup_schema).splitlines()
-
-        checkpoint_cmd = f"configure checkpoint save {checkpoint}"
-        gold_config = [checkpoint_cmd]
+        setup_plan.append((dutt, render_setup_config(setup_config[dev_name])))
 
-        logging.info(f"Sending checkpoint command and config to dut {dutt['name']}")
-        logging.debug(f"Sending checkpoint command: {checkpoint_cmd}")
-        logging.debug(f"Sending config:\n{config}")
-        try:
-            dutt["connection"].enable(gold_config)
-            dutt["connection"].config(config)
-        except BaseException as e:
-            logging.info(f"setup failed with exception {e} and mesg {str(e)}")
-            logging.debug(f"reverting to checkpoint {checkpoint}")
-            # something failed, call teardown
-            checkpoint_restore_cmd = f"configure replace checkpoint:{checkpoint} skip-checkpoint"
-            delete_checkpoint_cmd = f"delete checkpoint:{checkpoint}"
-            teardown_via_name(duts, setup_config, checkpoint_restore_cmd, delete_checkpoint_cmd)
-            # reraise the exception
-            raise e
+    run_setup(setup_plan, checkpoint)
 
 
 def setup_via_role(duts, setup_config, checkpoint):
@@ -156,41 +618,15 @@ def setup_via_role(duts, setup_config, checkpoint):
     duts identified using the device role"""
 
     logging.info("Performing setup via dut roles")
+    setup_plan = []
     for role in setup_config:
         logging.info(f"Performing setup for role: {role}")
         for _, dutt in duts.items():
             if dutt["role"] != role:
                 continue
-            setup_schema = remove_comments(setup_config[role]["schema"])
+            setup_plan.append((dutt, render_setup_config(setup_config[role])))
 
-            if setup_schema is None:
-                temp_without_comments = remove_comments(setup_config[role]["template"])
-                config = temp_without_comments.splitlines()
-            else:
-                template = remove_comments(setup_config[role]["template"])
-                setup_template = Template(template)
-                config = setup_template.render(setup_schema).splitlines()
-
-            checkpoint_cmd = f"configure checkpoint save {checkpoint}"
-            gold_config = [checkpoint_cmd]
-
-            logging.info(f"Sending checkpoint command and config to dut {dutt['name']}")
-            logging.debug(f"Sending checkpoint command: {checkpoint_cmd}")
-            logging.debug(f"Sending config:\n{config}")
-            try:
-                dutt["connection"].enable(gold_config)
-                dutt["connection"].config(config)
-            except BaseException as e:
-                logging.info(f"setup failed with exception {e} and mesg {str(e)}")
-                logging.debug(f"reverting to checkpoint {checkpoint}")
-                # something failed, call teardown
-                checkpoint_restore_cmd = (
-                    f"configure replace checkpoint:{checkpoint} skip-checkpoint"
-                )
-                delete_checkpoint_cmd = f"delete checkpoint:{checkpoint}"
-                teardown_via_role(duts, setup_config, checkpoint_restore_cmd, delete_checkpoint_cmd)
-                # reraise the exception
-                raise e
+    run_setup(setup_plan, checkpoint)
 
 
 def perform_setup(duts, test, setup_config):
@@ -214,36 +650,63 @@ def perform_setup(duts, test, setup_config):
     return checkpoint
 
 
+def teardown_dut(dutt, checkpoint_restore_cmd, delete_checkpoint_cmd):
+    """Restores the checkpoint on a dut and deletes it"""
+
+    restore_config = [checkpoint_restore_cmd, delete_checkpoint_cmd]
+    logging.info(f"Restoring configuration and deleting checkpoint on dut {dutt['name']}")
+    logging.debug(f"Sending checkpoint restore command: {checkpoint_restore_cmd}")
+    logging.debug(f"Sending delete checkpoint command: {delete_checkpoint_cmd}")
+    with get_scheduler().slot(dutt):
+        dutt["connection"].config(restore_config)
+
+
+def run_teardown(teardown_duts, checkpoint_restore_cmd, delete_checkpoint_cmd):
+    """Restores the checkpoints on the duts concurrently.  Every dut is
+    restored even if another one fails, the first failure is raised after"""
+
+    if not teardown_duts:
+        return
+
+    workers = setup_workers(len(teardown_duts))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(teardown_dut, dutt, checkpoint_restore_cmd, delete_checkpoint_cmd)
+            for dutt in teardown_duts
+        ]
+
+    for future in futures:
+        future.result()
+
+
 def teardown_via_name(duts, setup_config, checkpoint_restore_cmd, delete_checkpoint_cmd):
     """Restores the checkpoints on duts identified by their name"""
 
     logging.info("Performing teardown via dut names")
+    teardown_duts = []
     for dev_name in setup_config:
         dutt = duts.get(dev_name, None)
         if dutt is None:
             logging.info(f"No dut named {dev_name} found, continuing to teardown next dut")
             continue
-        restore_config = [checkpoint_restore_cmd, delete_checkpoint_cmd]
-        logging.info(f"Restoring configuration and deleting checkpoint on dut {dutt['name']}")
-        logging.debug(f"Sending checkpoint restore command: {checkpoint_restore_cmd}")
-        logging.debug(f"Sending delete checkpoint command: {delete_checkpoint_cmd}")
-        dutt["connection"].config(restore_config)
+        teardown_duts.append(dutt)
+
+    run_teardown(teardown_duts, checkpoint_restore_cmd, delete_checkpoint_cmd)
 
 
 def teardown_via_role(duts, setup_config, checkpoint_restore_cmd, delete_checkpoint_cmd):
     """Restores the checkpoints on duts identified by their role"""
 
     logging.info("Performing teardown via dut roles")
+    teardown_duts = []
     for role in setup_config:
         logging.info(f"Performing teardown for role: {role}")
         for _, dutt in duts.items():
             if dutt["role"] != role:
                 continue
-            restore_config = [checkpoint_restore_cmd, delete_checkpoint_cmd]
-            logging.info(f"Restoring configuration and deleting checkpoint on dut {dutt['name']}")
-            logging.debug(f"Sending checkpoint restore command: {checkpoint_restore_cmd}")
-            logging.debug(f"Sending delete checkpoint command: {delete_checkpoint_cmd}")
-            dutt["connection"].config(restore_config)
+            teardown_duts.append(dutt)
+
+    run_teardown(teardown_duts, checkpoint_restore_cmd, delete_checkpoint_cmd)
 
 
 def perform_teardown(duts, checkpoint, setup_config):
@@ -273,26 +736,162 @@ def perform_teardown(duts, checkpoint, setup_config):
         )
 
 
+class DutSuiteSetup:
+    """Setup of a test suite performed per dut, the first time a test of the
+    dut runs.  With dut affinity, each worker only sets up the duts it runs
+    tests on."""
+
+    def __init__(self, duts, testsuite, setup_config):
+        """Initializes the suite setup
+
+        Args:
+            duts (dict): duts by name
+            testsuite (str): name of the test suite
+            setup_config (dict): test suite setup file
+        """
+        self.duts = duts
+        self.testsuite = testsuite
+        self.setup_config = setup_config
+        self.checkpoints = {}
+
+    def setup(self, dut_names):
+        """Set up the duts that are not set up yet"""
+
+        pending = {
+            name: self.duts[name]
+            for name in dut_names
+            if name in self.duts and name not in self.checkpoints
+        }
+        if not pending:
+            return
+
+        checkpoint = perform_setup(pending, self.testsuite, self.setup_config)
+        logging.debug(f"Checkpoint created on {list(pending)}: {checkpoint}")
+        self.checkpoints.update({name: checkpoint for name in pending})
+
+    def teardown(self):
+        """Restore the checkpoints of the duts that were set up"""
+
+        for checkpoint in dict.fromkeys(self.checkpoints.values()):
+            set_up_duts = {
+                name: self.duts[name]
+                for name, dut_checkpoint in self.checkpoints.items()
+                if dut_checkpoint == checkpoint
+            }
+            perform_teardown(set_up_duts, checkpoint, self.setup_config)
+
+        self.checkpoints.clear()
+
+
+def end_active_testcase_setup():
+    """Restore the checkpoint of the test case setup kept applied"""
+
+    if active_testcase_setup:
+        perform_teardown(
+            active_testcase_setup["duts"],
+            active_testcase_setup["checkpoint"],
+            active_testcase_setup["setup_config"],
+        )
+        active_testcase_setup.clear()
+
+
+def start_testcase_setup(item, duts, testname):
+    """Setup the duts for a test case, unless the previous test case left the
+    same setup applied
+
+    Args:
+        item (pytest.Item): test item
+        duts (dict): duts the test case configures, by name
+        testname (str): name of the test case
+    """
+
+    setup_key = item_setup_key(item)
+
+    if active_testcase_setup.get("key") == setup_key:
+        if setup_key:
+            logging.info(f"Reusing setup of {active_testcase_setup['test']} for {testname}")
+        return
+
+    end_active_testcase_setup()
+
+    if setup_key:
+        logging.info(f"Performing setup for test case: {testname}")
+        logging.info("Applying test case setup_config file")
+        setup_config = tests_tools.import_yaml(setup_key[0])
+        checkpoint = perform_setup(duts, testname, setup_config)
+        logging.debug(f"Checkpoint created: {checkpoint}")
+        active_testcase_setup.update(
+            key=setup_key,
+            test=testname,
+            duts=duts,
+            checkpoint=checkpoint,
+            setup_config=setup_config,
+        )
+
+
+def end_testcase_setup(item, nextitem):
+    """Restore the test case setup unless the next test, in the same test
+    suite, shares it
+
+    Args:
+        item (pytest.Item): test item
+        nextitem (pytest.Item): next test item, None for the last one
+    """
+
+    if not active_testcase_setup:
+        return
+
+    if (
+        reuse_test_setup()
+        and nextitem is not None
+        and nextitem.parent == item.parent
+        and item_setup_key(nextitem) == active_testcase_setup["key"]
+    ):
+        logging.debug(f"Keeping setup of {active_testcase_setup['test']} for {nextitem.name}")
+        return
+
+    end_active_testcase_setup()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def testcase_setups(connection_pool):  # pylint: disable=redefined-outer-name,unused-argument
+    """Restore the test case setup still applied at the end of the session,
+    before the pooled connections are closed"""
+
+    yield
+
+    end_active_testcase_setup()
+
+
 @pytest.fixture(autouse=True, scope="class")
 def setup_testsuite(request, duts):
     """Setup the duts using the test suite(class) setup file"""
 
     logging.debug("Performing test suite setup")
     testsuite = get_current_fixture_testclass(request)
-    test_suites = test_defs["test_suites"]
+    suite = tests_tools.index_test_defs(config.test_defs).suites.get(testsuite)
     setup_config = []
     checkpoint = ""
-    for suite in test_suites:
-        if suite["name"] == testsuite:
-            logging.info(f"Performing setup for test suite: {testsuite}")
-            setup_config_file = suite.get("test_setup", "")
-            if setup_config_file != "":
-                logging.info("Applying test suite setup_config file")
-                setup_config = tests_tools.import_yaml(f"{suite['dir_path']}/{setup_config_file}")
+    if suite:
+        logging.info(f"Performing setup for test suite: {testsuite}")
+        setup_config_file = suite.get("test_setup", "")
+        if setup_config_file != "":
+            logging.info("Applying test suite setup_config file")
+            setup_config = tests_tools.import_yaml(f"{suite['dir_path']}/{setup_config_file}")
+            if dut_affinity(request.config):
+                # set up per dut by the tests of the dut, see setup_testcase
+                suite_setups[request.node.nodeid] = DutSuiteSetup(duts, testsuite, setup_config)
+            else:
                 checkpoint = perform_setup(duts, testsuite, setup_config)
                 logging.debug(f"Checkpoint created: {checkpoint}")
     yield
-    perform_teardown(duts, checkpoint, setup_config)
+    # the next test sharing the test case setup may have been skipped
+    end_active_testcase_setup()
+    suite_setup = suite_setups.pop(request.node.nodeid, None)
+    if suite_setup:
+        suite_setup.teardown()
+    else:
+        perform_teardown(duts, checkpoint, setup_config)
 
 
 @pytest.fixture(autouse=True, scope="function")
@@ -301,22 +900,16 @@ def setup_testcase(request, duts):
 
     logging.debug("Performing test suite setup")
     testname = get_current_fixture_testname(request)
-    test_suites = test_defs["test_suites"]
-    setup_config = []
-    checkpoint = ""
-    for suite in test_suites:
-        tests = suite["testcases"]
-        for test in tests:
-            if test["name"] == testname:
-                logging.info(f"Performing setup for test case: {testname}")
-                setup_config_file = test.get("test_setup", "")
-                if setup_config_file != "":
-                    logging.info("Applying test case setup_config file")
-                    setup_config = tests_tools.import_yaml(
-                        f"{suite['dir_path']}/{setup_config_file}"
-                    )
-                    checkpoint = perform_setup(duts, testname, setup_config)
-                    logging.debug(f"Checkpoint created: {checkpoint}")
 
+    if dut_affinity(request.config):
+        # only touch the duts of this test, other workers own the other duts
+        dut_names = item_dut_names(request.node)
+        class_node = request.node.getparent(pytest.Class)
+        suite_setup = suite_setups.get(class_node.nodeid) if class_node else None
+        if suite_setup:
+            suite_setup.setup(dut_names)
+        duts = {name: dutt for name, dutt in duts.items() if name in dut_names}
+
+    start_testcase_setup(request.node, duts, testname)
     yield
-    perform_teardown(duts, checkpoint, setup_config)
+    end_testcase_setup(request.node, runtest_nextitems.pop(request.node.nodeid, None))
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2023, Arista Networks EOS+
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the Arista nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Disk backed store of the show output collected from duts.
+
+Without a store every json and text output of every dut stays in memory for
+the whole session.  With a store, outputs are appended to a file per dut as
+they are collected and only an index of their offsets is kept in memory.
+Reading a field of dut["output"][show_cmd] decodes it from the file, and the
+decoded output is released once no test references it.  Files are only open
+while an output is written or read, so the number of duts is not bounded by
+the limit on open files.
+"""
+
+import os
+import json
+import threading
+import weakref
+from collections.abc import Mapping, MutableMapping
+from vane.utils import RawJson, prune_output
+from vane.vane_logging import logging
+
+
+class OutputFile:
+    """Append only file of json encoded outputs, opened on each write or read"""
+
+    def __init__(self, path, truncate=True):
+        """Initializes the Output File
+
+        Args:
+            path (str): file the outputs are stored in
+            truncate (bool): truncate the file when it exists, False opens the
+            outputs stored by another process
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._size = 0
+
+        if truncate:
+            with open(path, "wb"):
+                pass
+        else:
+            self._size = os.path.getsize(path)
+
+    def append(self, value):
+        """Append a value to the file
+
+        Args:
+            value (object): json serializable value, raw json is stored as is
+
+        Returns:
+            location (tuple): offset and length of the stored value, and the paths
+            raw json is pruned to when it is read
+        """
+        if isinstance(value, RawJson):
+            data = value.encode()
+        else:
+            data = json.dumps(value).encode()
+
+        with self._lock:
+            offset = self._size
+            with open(self.path, "ab") as output_file:
+                output_file.write(data)
+            self._size += len(data)
+
+        if isinstance(value, RawJson) and value.output_fields:
+            return offset, len(data), value.output_fields
+
+        return offset, len(data)
+
+    def read(self, location):
+        """Read a value from the file
+
+        Args:
+            location (tuple): offset and length returned by append
+
+        Returns:
+            value (object): decoded value
+        """
+        offset, length = location[:2]
+
+        with open(self.path, "rb") as output_file:
+            output_file.seek(offset)
+            data = output_file.read(length)
+
+        value = json.loads(data)
+
+        if len(location) > 2:
+            value = prune_output(value, location[2])
+
+        return value
+
+    def close(self):
+        """Nothing is kept open between writes and reads"""
+
+
+class StoredOutput(dict):
+    """Output of a show command decoded from the store, one field at a time
+    the first time it is read.  Updates are written back to the store, and a
+    text output that was not collected yet is fetched from the dut the first
+    time it is read"""
+
+    def __init__(self, dut_output, show_cmd, lazy_text):
+        """Initializes the stored output
+
+        Args:
+            dut_output (DutOutput): outputs of the dut the command ran on
+            show_cmd (str): show command
+            lazy_text (bool): text output is fetched on first use
+        """
+        super().__init__()
+        self.dut_output = dut_output
+        self.show_cmd = show_cmd
+        self.lazy_text = lazy_text
+
+    def __setitem__(self, key, value):
+        self.dut_output.write_field(self.show_cmd, key, value)
+        if isinstance(value, RawJson):
+            # decoded from the store when it is read
+            dict.pop(self, key, None)
+        else:
+            dict.__setitem__(self, key, value)
+
+    def __missing__(self, key):
+        if key == "text" and self.lazy_text and self.dut_output.fetch_text:
+            self.dut_output.fetch_text(self.dut_output.dut, [self.show_cmd])
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+
+        if key not in self.dut_output.stored_fields(self.show_cmd):
+            raise KeyError(key)
+
+        value = self.dut_output.read_field(self.show_cmd, key)
+        dict.__setitem__(self, key, value)
+
+        return value
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return self.dut_output.stored_fields(self.show_cmd)
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def get(self, key, default=None):
+        if key in self or (key == "text" and self.lazy_text):
+            return self[key]
+
+        return default
+
+
+class DutOutput(MutableMapping):
+    """Show outputs of a dut, used in place of the dut["output"] dictionary.
+    Dictionaries of show command outputs are kept in the store, any other
+    value (e.g. the interface list) is kept in memory"""
+
+    def __init__(self, output_file, dut, fetch_text=None, read_only=False):
+        """Initializes the dut outputs
+
+        Args:
+            output_file (OutputFile): file the outputs of the dut are stored in
+            dut (dict): structured data of the dut
+            fetch_text (func): fetches the text output of show commands collected lazily
+            read_only (bool): the file belongs to another process, outputs
+            written later are kept in memory
+        """
+        self.output_file = output_file
+        self.dut = dut
+        self.fetch_text = fetch_text
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._memory = {}
+        self._fields = {}
+        self._written = {}
+        self._lazy_text = set()
+        self._decoded = weakref.WeakValueDictionary()
+
+    def index(self):
+        """Return where the outputs are stored, for open_dut_output in another
+        process
+
+        Returns:
+            index (dict): file, field locations, lazy text commands and the
+            outputs kept in memory
+        """
+        with self._lock:
+            return {
+                "path": os.path.abspath(self.output_file.path),
+                "fields": {show_cmd: dict(fields) for show_cmd, fields in self._fields.items()},
+                "lazy_text": sorted(self._lazy_text),
+                "memory": dict(self._memory),
+            }
+
+    def stored_fields(self, show_cmd):
+        """Return the fields (json, text) stored for a show command"""
+
+        with self._lock:
+            return list(self._fields.get(show_cmd, {}))
+
+    def read_field(self, show_cmd, field):
+        """Decode a stored field of a show command output"""
+
+        with self._lock:
+            location = self._fields[show_cmd][field]
+            value = self._written.get((show_cmd, field))
+
+        if location is None:
+            return value.decode() if isinstance(value, RawJson) else value
+
+        return self.output_file.read(location)
+
+    def write_field(self, show_cmd, field, value):
+        """Store a field of a show command output"""
+
+        if self.read_only:
+            with self._lock:
+                self._fields.setdefault(show_cmd, {})[field] = None
+                self._written[(show_cmd, field)] = value
+            return
+
+        location = self.output_file.append(value)
+
+        with self._lock:
+            self._fields.setdefault(show_cmd, {})[field] = location
+
+    def __getitem__(self, key):
+        if key in self._memory:
+            return self._memory[key]
+
+        with self._lock:
+            if key not in self._fields:
+                raise KeyError(key)
+            output = self._decoded.get(key)
+
+        if output is None:
+            output = StoredOutput(self, key, key in self._lazy_text)
+            with self._lock:
+                output = self._decoded.setdefault(key, output)
+
+        return output
+
+    def __setitem__(self, key, value):
+        if not isinstance(value, Mapping):
+            with self._lock:
+                self._fields.pop(key, None)
+            self._memory[key] = value
+            return
+
+        self._memory.pop(key, None)
+
+        with self._lock:
+            self._fields[key] = {}
+            self._decoded.pop(key, None)
+            if getattr(value, "lazy_text", False):
+                self._lazy_text.add(key)
+            else:
+                self._lazy_text.discard(key)
+
+        for field, field_value in dict(value).items():
+            self.write_field(key, field, field_value)
+
+    def __delitem__(self, key):
+        if key in self._memory:
+            del self._memory[key]
+            return
+
+        with self._lock:
+            del self._fields[key]
+            self._decoded.pop(key, None)
+            self._lazy_text.discard(key)
+
+    def __iter__(self):
+        with self._lock:
+            keys = list(self._memory) + list(self._fields)
+
+        return iter(keys)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._memory) + len(self._fields)
+
+    def __repr__(self):
+        return f"DutOutput({self.dut['name']}, {len(self)} outputs in {self.output_file.path})"
+
+
+class OutputStore:
+    """Creates the output files of duts in a directory"""
+
+    def __init__(self, directory=None):
+        """Initializes the Output Store
+
+        Args:
+            directory (str): directory the output files are created in, None disables the store
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._files = {}
+
+    @property
+    def enabled(self):
+        """Return True when an output directory is configured"""
+
+        return bool(self.directory)
+
+    def new_output(self, dut, fetch_text=None):
+        """Return an empty output mapping for a dut
+
+        Args:
+            dut (dict): structured data of the dut
+            fetch_text (func): fetches the text output of show commands collected lazily
+
+        Returns:
+            output (dict or DutOutput): a dictionary when the store is disabled
+        """
+        if not self.enabled:
+            return {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{dut['name']}.outputs")
+
+        with self._lock:
+            if dut["name"] in self._files:
+                self._files[dut["name"]].close()
+            output_file = OutputFile(path)
+            self._files[dut["name"]] = output_file
+
+        logging.debug(f"Storing show output of {dut['name']} in {path}")
+
+        return DutOutput(output_file, dut, fetch_text)
+
+    def close_all(self):
+        """Close the output files of all duts"""
+
+        with self._lock:
+            output_files = list(self._files.values())
+            self._files.clear()
+
+        for output_file in output_files:
+            output_file.close()
+
+
+def open_dut_output(index, dut, fetch_text=None):
+    """Open the outputs of a dut stored by another process, e.g. by the vane
+    process for its pytest-xdist workers.  The file is only read, outputs
+    written later are kept in memory.
+
+    Args:
+        index (dict): index of the outputs returned by DutOutput.index
+        dut (dict): structured data of the dut
+        fetch_text (func): fetches the text output of show commands collected lazily
+
+    Returns:
+        output (DutOutput): outputs of the dut
+    """
+    output = DutOutput(OutputFile(index["path"], truncate=False), dut, fetch_text, read_only=True)
+    # pylint: disable=protected-access
+    output._memory.update(index["memory"])
+    output._fields.update(index["fields"])
+    output._lazy_text.update(index["lazy_text"])
+
+    return output
+
+
+_output_store = OutputStore()
+
+
+def configure_output_store(parameters):
+    """Create the output store named in the definitions file parameters
+
+    Args:
+        parameters (dict): parameters section of the definitions file
+
+    Returns:
+        store (OutputStore): the configured store
+    """
+    global _output_store  # pylint: disable=global-statement
+
+    _output_store.close_all()
+    _output_store = OutputStore(parameters.get("output_store"))
+
+    if _output_store.enabled:
+        logging.info(f"Storing show output in {_output_store.directory}")
+
+    return _output_store
+
+
+def get_output_store():
+    """Return the output store shared by the collection workers"""
+
+    return _output_store
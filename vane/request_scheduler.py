@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2023, Arista Networks EOS+
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the Arista nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Scheduler that bounds and paces the requests vane sends to duts.
+
+Every request to a dut (pre-test collection, TestOps commands and fixture
+setup/teardown) runs inside a scheduler slot.  A slot enforces:
+
+    - an optional global cap on the number of requests in flight
+    - an optional cap on the requests in flight per dut role
+    - an optional requests-per-second limit per dut
+
+A slot is taken in that order from last to first: the request is paced
+first, then waits for its role, and only then takes a global slot.  A
+request waiting for a saturated role or on the pace of its dut therefore
+holds no global slot; requests of other roles can pass it, while requests
+of the same role are admitted in the order they got their role slot.
+"""
+
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from vane.vane_logging import logging
+
+
+# requests in flight are unbounded unless collection_max_in_flight is set
+DEFAULT_MAX_IN_FLIGHT = None
+
+
+class RequestScheduler:
+    """Bounds the concurrency and rate of requests sent to duts"""
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, rate_limit=0, role_limits=None):
+        """Initializes the Request Scheduler
+
+        Args:
+            max_in_flight (int): Maximum requests in flight across all duts, None or 0
+                is unbounded
+            rate_limit (float): Maximum requests per second per dut, 0 is unbounded
+            role_limits (dict): Maximum requests in flight for duts of a role
+        """
+        self.max_in_flight = max_in_flight or None
+        self.rate_limit = rate_limit or 0
+        self.role_limits = role_limits or {}
+
+        self._lock = threading.Lock()
+        self._next_request = {}
+        self._global = (
+            threading.BoundedSemaphore(self.max_in_flight) if self.max_in_flight else None
+        )
+        self._roles = {
+            role: threading.BoundedSemaphore(limit) for role, limit in self.role_limits.items()
+        }
+
+        self._async_loop = None
+        self._async_global = None
+        self._async_roles = {}
+
+    def _reserve(self, dut_name):
+        """Reserve the next request time for a dut
+
+        Args:
+            dut_name (str): name of the dut
+
+        Returns:
+            delay (float): seconds to wait before sending the request
+        """
+        if not self.rate_limit:
+            return 0
+
+        interval = 1 / self.rate_limit
+
+        with self._lock:
+            current = time.monotonic()
+            start = max(current, self._next_request.get(dut_name, current))
+            self._next_request[dut_name] = start + interval
+
+        return start - current
+
+    @contextmanager
+    def slot(self, dut):
+        """Hold a request slot for dut while the request runs
+
+        Args:
+            dut (dict): data structure of dut parameters
+        """
+        role_semaphore = self._roles.get(dut.get("role"))
+
+        # pace and wait for the role before taking a global slot, so requests
+        # queued on a dut or a capped role do not hold slots other duts could use
+        delay = self._reserve(dut["name"])
+        if delay > 0:
+            logging.debug(f"Pacing request to {dut['name']} by {delay:.3f}s")
+            time.sleep(delay)
+
+        if role_semaphore:
+            role_semaphore.acquire()
+
+        try:
+            if self._global:
+                self._global.acquire()
+            try:
+                yield
+            finally:
+                if self._global:
+                    self._global.release()
+        finally:
+            if role_semaphore:
+                role_semaphore.release()
+
+    def _bind_async(self):
+        """Create the asyncio semaphores for the running event loop"""
+
+        loop = asyncio.get_running_loop()
+
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            self._async_global = (
+                asyncio.Semaphore(self.max_in_flight) if self.max_in_flight else None
+            )
+            self._async_roles = {
+                role: asyncio.Semaphore(limit) for role, limit in self.role_limits.items()
+            }
+
+    @asynccontextmanager
+    async def async_slot(self, dut):
+        """Hold a request slot for dut while an asyncio request runs
+
+        Args:
+            dut (dict): data structure of dut parameters
+        """
+        self._bind_async()
+        role_semaphore = self._async_roles.get(dut.get("role"))
+
+        delay = self._reserve(dut["name"])
+        if delay > 0:
+            logging.debug(f"Pacing request to {dut['name']} by {delay:.3f}s")
+            await asyncio.sleep(delay)
+
+        if role_semaphore:
+            await role_semaphore.acquire()
+
+        try:
+            if self._async_global:
+                await self._async_global.acquire()
+            try:
+                yield
+            finally:
+                if self._async_global:
+                    self._async_global.release()
+        finally:
+            if role_semaphore:
+                role_semaphore.release()
+
+
+_scheduler = RequestScheduler()
+
+
+def configure_scheduler(parameters):
+    """Create the request scheduler from the definitions file parameters
+
+    Args:
+        parameters (dict): parameters section of the definitions file
+
+    Returns:
+        scheduler (RequestScheduler): the configured scheduler
+    """
+    global _scheduler  # pylint: disable=global-statement
+
+    _scheduler = RequestScheduler(
+        max_in_flight=parameters.get("collection_max_in_flight", DEFAULT_MAX_IN_FLIGHT),
+        rate_limit=parameters.get("collection_rate_limit", 0),
+        role_limits=parameters.get("collection_role_limits", {}),
+    )
+
+    logging.info(
+        f"Request scheduler allows {_scheduler.max_in_flight or 'unbounded'} requests in "
+        f"flight, {_scheduler.rate_limit or 'unbounded'} requests/s per dut and role "
+        f"limits {_scheduler.role_limits}"
+    )
+
+    return _scheduler
+
+
+def get_scheduler():
+    """Return the request scheduler shared by collection, tests and fixtures"""
+
+    return _scheduler
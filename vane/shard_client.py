@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2023, Arista Networks EOS+
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the Arista nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+
+"""Split a vane run into shards of duts and merge their results.
+
+The coordinator writes one directory per shard holding a duts.yaml with its
+share of the duts and a definitions.yaml whose results, reports and evidence
+point inside the shard directory.  The shard duts.yaml leaves the credentials
+out and names the coordinator duts file instead, a shard reads them from there
+into a private temporary duts file for its run.  Shards run either as local
+subprocesses or on other hosts sharing the shard and duts files: each host runs
+``vane --run-shard <shard_dir>`` and leaves a done file behind when its run
+ends.  Each shard writes its logs inside its shard directory.  The per-shard
+results are then merged into the directories named in the coordinator
+definitions so ReportClient renders a single report.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import json
+import yaml
+from vane.snapshot import CREDENTIAL_KEYS
+from vane.tests_tools import import_yaml
+from vane.vane_logging import LOG_ROOT_ENV, logging
+
+
+SHARD_DUTS = "duts.yaml"
+SHARD_DEFINITIONS = "definitions.yaml"
+SHARD_DONE = "shard.done"
+# key of the shard duts.yaml naming the duts file the credentials are read from
+SOURCE_DUTS_FILE = "source_duts_file"
+EVIDENCE_DIR = "TEST RESULTS"
+
+# pytest json summary fields that are not test counts
+SUMMARY_DURATION = "duration"
+
+
+def shard_done(shard_dir):
+    """Return the status of a finished shard
+
+    Args:
+        shard_dir (str): Shard directory
+
+    Returns:
+        status (dict): done file contents, None while the shard runs
+    """
+    done_file = os.path.join(shard_dir, SHARD_DONE)
+    if not os.path.exists(done_file):
+        return None
+    return import_yaml(done_file)
+
+
+def mark_shard_done(shard_dir, exit_code):
+    """Leave the done file of a shard for the coordinator
+
+    Args:
+        shard_dir (str): Shard directory
+        exit_code (int): exit code of the shard run
+    """
+    done_file = os.path.join(shard_dir, SHARD_DONE)
+    with open(done_file, "w", encoding="utf-8") as file:
+        yaml.safe_dump({"exit_code": exit_code, "host": os.uname().nodename}, file)
+
+
+def shard_files(shard_dir):
+    """Return the definitions and duts files of a shard
+
+    Args:
+        shard_dir (str): Shard directory
+
+    Returns:
+        definitions_file (str), duts_file (str): shard input files
+    """
+    return (
+        os.path.join(shard_dir, SHARD_DEFINITIONS),
+        os.path.join(shard_dir, SHARD_DUTS),
+    )
+
+
+def write_shard_duts(shard_duts_file):
+    """Write the duts of a shard, with their credentials read from the
+    coordinator duts file, to a temporary file only the current user can read
+
+    Args:
+        shard_duts_file (str): duts.yaml of the shard
+
+    Returns:
+        duts_file (str): temporary duts file, removed by the caller
+    """
+    shard_model = import_yaml(shard_duts_file)
+    duts_model = import_yaml(shard_model[SOURCE_DUTS_FILE])
+
+    source_duts = {dut["name"]: dut for dut in duts_model.get("duts", [])}
+    duts_model["duts"] = [source_duts[dut["name"]] for dut in shard_model["duts"]]
+
+    # mkstemp creates the file readable by the current user only
+    fd, duts_file = tempfile.mkstemp(prefix="vane_shard_duts_", suffix=".yaml")
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        yaml.safe_dump(duts_model, file, sort_keys=False)
+
+    return duts_file
+
+
+def merge_json_reports(reports):
+    """Merge pytest json reports of several shards into one
+
+    Test counts are summed, the duration is the longest shard since shards
+    run side by side.
+
+    Args:
+        reports (list): pytest json reports
+
+    Returns:
+        report (dict): merged pytest json report
+    """
+    merged = {"report": {"tests": [], "summary": {}}}
+    merged_report = merged["report"]
+
+    for report in reports:
+        report = report.get("report", {})
+        for key, value in report.items():
+            if key not in ("tests", "summary"):
+                merged_report.setdefault(key, value)
+        if report.get("created_at"):
+            merged_report["created_at"] = min(merged_report["created_at"], report["created_at"])
+        merged_report["tests"].extend(report.get("tests", []))
+
+        summary = merged_report["summary"]
+        for key, value in report.get("summary", {}).items():
+            if not isinstance(value, (int, float)):
+                summary.setdefault(key, value)
+            elif key == SUMMARY_DURATION:
+                summary[key] = max(summary.get(key, 0), value)
+            else:
+                summary[key] = summary.get(key, 0) + value
+
+    return merged
+
+
+class ShardClient:
+    """Splits a vane run into shards of duts and merges their results"""
+
+    def __init__(self, definitions_file, duts_file, shards, shard_dir=None):
+        """Initializes the Shard Client
+
+        Args:
+            definitions_file (str): Path and name of definition file
+            duts_file (str): Path and name of duts file
+            shards (int): Number of shards
+            shard_dir (str): Directory shards are written to, defaults to
+                shards in the report directory
+        """
+        self.definitions_file = definitions_file
+        self.duts_file = os.path.abspath(duts_file)
+        self.data_model = import_yaml(definitions_file)
+        self.duts_model = import_yaml(duts_file)
+        self.parameters = self.data_model["parameters"]
+        self.shards = shards
+        self.shard_dir = shard_dir or os.path.join(self.parameters["report_dir"], "shards")
+
+    def split_duts(self):
+        """Split the duts round robin so each shard gets a similar count
+
+        Returns:
+            shard_duts (list): list of dut lists, one per non empty shard
+        """
+        duts = self.duts_model.get("duts", [])
+        shard_duts = [
+            [dut for index, dut in enumerate(duts) if index % self.shards == shard]
+            for shard in range(self.shards)
+        ]
+        return [dut_list for dut_list in shard_duts if dut_list]
+
+    def _shard_parameters(self, shard_path):
+        """Return the definitions parameters of a shard
+
+        Args:
+            shard_path (str): Shard directory
+
+        Returns:
+            parameters (dict): parameters writing results inside shard_path
+        """
+        parameters = dict(self.parameters)
+        report_dir = os.path.join(shard_path, "reports")
+        parameters["report_dir"] = report_dir
+        parameters["results_dir"] = os.path.join(report_dir, "results")
+
+        for report in ("html_report", "json_report"):
+            if parameters.get(report):
+                parameters[report] = os.path.join(report_dir, "report")
+
+        return parameters
+
+    def write_shards(self):
+        """Write the input files of every shard
+
+        Returns:
+            shard_dirs (list): shard directories
+        """
+        shard_dirs = []
+
+        for shard, duts in enumerate(self.split_duts()):
+            shard_path = os.path.join(self.shard_dir, f"shard-{shard}")
+            if os.path.exists(shard_path):
+                shutil.rmtree(shard_path)
+            os.makedirs(shard_path)
+
+            data_model = dict(self.data_model)
+            data_model["parameters"] = self._shard_parameters(shard_path)
+            duts_model = {
+                "duts": [
+                    {key: value for key, value in dut.items() if key not in CREDENTIAL_KEYS}
+                    for dut in duts
+                ],
+                SOURCE_DUTS_FILE: self.duts_file,
+            }
+
+            definitions_file, duts_file = shard_files(shard_path)
+            with open(definitions_file, "w", encoding="utf-8") as file:
+                yaml.safe_dump(data_model, file, sort_keys=False)
+            with open(duts_file, "w", encoding="utf-8") as file:
+                yaml.safe_dump(duts_model, file, sort_keys=False)
+
+            logging.info(f"Shard {shard} runs duts {[dut['name'] for dut in duts]}")
+            shard_dirs.append(shard_path)
+
+        return shard_dirs
+
+    def launch_local(self, shard_dirs):
+        """Run every shard as a local vane subprocess
+
+        Args:
+            shard_dirs (list): shard directories
+        """
+        processes = []
+
+        for shard_path in shard_dirs:
+            logging.info(f"Starting local shard {shard_path}")
+            # shards clear their logs when they start, keep them apart
+            env = dict(os.environ, **{LOG_ROOT_ENV: shard_path})
+            processes.append(
+                subprocess.Popen(  # pylint: disable=consider-using-with
+                    [sys.executable, "-m", "vane.vane_cli", "--run-shard", shard_path], env=env
+                )
+            )
+
+        for shard_path, process in zip(shard_dirs, processes):
+            exit_code = process.wait()
+            if not shard_done(shard_path):
+                mark_shard_done(shard_path, exit_code)
+
+    def wait_for_shards(self, shard_dirs, timeout=None, interval=5):
+        """Wait until every shard left its done file
+
+        Args:
+            shard_dirs (list): shard directories
+            timeout (int): seconds to wait, None waits forever
+            interval (int): seconds between checks
+
+        Returns:
+            statuses (dict): done file contents of each shard directory
+        """
+        start = time.monotonic()
+        statuses = {}
+
+        while True:
+            for shard_path in shard_dirs:
+                if shard_path not in statuses:
+                    status = shard_done(shard_path)
+                    if status is not None:
+                        logging.info(f"Shard {shard_path} finished: {status}")
+                        statuses[shard_path] = status
+
+            if len(statuses) == len(shard_dirs):
+                return statuses
+
+            if timeout is not None and time.monotonic() - start > timeout:
+                pending = [shard for shard in shard_dirs if shard not in statuses]
+                raise TimeoutError(f"Shards did not finish: {pending}")
+
+            time.sleep(interval)
+
+    def merge_results(self, shard_dirs):
+        """Merge results, pytest json and evidence of the shards
+
+        Args:
+            shard_dirs (list): shard directories
+        """
+        results_dir = self.parameters["results_dir"]
+        evidence_dir = os.path.join(self.parameters["report_dir"], EVIDENCE_DIR)
+        json_reports = []
+
+        # drop results of an earlier run before merging
+        if os.path.isdir(evidence_dir):
+            shutil.rmtree(evidence_dir)
+        os.makedirs(results_dir, exist_ok=True)
+        for name in os.listdir(results_dir):
+            if "result-" in name:
+                os.remove(os.path.join(results_dir, name))
+
+        for shard_path in shard_dirs:
+            parameters = import_yaml(shard_files(shard_path)[0])["parameters"]
+
+            shard_results = parameters["results_dir"]
+            if os.path.isdir(shard_results):
+                for name in os.listdir(shard_results):
+                    if "result-" in name:
+                        shutil.copy(os.path.join(shard_results, name), results_dir)
+
+            shard_evidence = os.path.join(parameters["report_dir"], EVIDENCE_DIR)
+            if os.path.isdir(shard_evidence):
+                shutil.copytree(shard_evidence, evidence_dir, dirs_exist_ok=True)
+
+            json_report = f"{parameters.get('json_report')}.json"
+            if parameters.get("json_report") and os.path.exists(json_report):
+                with open(json_report, "r", encoding="utf-8") as file:
+                    json_reports.append(json.load(file))
+            else:
+                logging.error(f"Shard {shard_path} has no json report")
+
+        if self.parameters.get("json_report"):
+            json_report = f"{self.parameters['json_report']}.json"
+            os.makedirs(os.path.dirname(json_report) or ".", exist_ok=True)
+            with open(json_report, "w", encoding="utf-8") as file:
+                json.dump(merge_json_reports(json_reports), file)
+
+    def run(self, launcher="local", timeout=None):
+        """Split the duts, run the shards and merge their results
+
+        Args:
+            launcher (str): local (subprocesses) or file (other hosts run
+                vane --run-shard on the shared shard directories)
+            timeout (int): seconds to wait for file launched shards
+
+        Returns:
+            statuses (dict): done file contents of each shard directory
+        """
+        shard_dirs = self.write_shards()
+
+        if launcher == "local":
+            self.launch_local(shard_dirs)
+        elif launcher == "file":
+            for shard_path in shard_dirs:
+                print(f"Run: {LOG_ROOT_ENV}='{shard_path}' vane --run-shard '{shard_path}'")
+        else:
+            raise ValueError(f"Unknown shard launcher: {launcher}")
+
+        statuses = self.wait_for_shards(shard_dirs, timeout)
+        self.merge_results(shard_dirs)
+
+        return statuses
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2023, Arista Networks EOS+
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the Arista nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+"""Snapshot of the collected state for pytest-xdist workers.
+
+setup_vane collects show output in the vane process, but xdist workers
+import vane.config afresh and would start without duts.  When tests run in
+several processes, the collected duts and test definitions are written to a
+private temporary snapshot file named in the VANE_SNAPSHOT environment
+variable, which is removed when the test run ends.  Workers load the
+snapshot when vane.fixtures is imported and set up their own dut
+connections on first use.
+
+The snapshot holds no credentials, workers read them from the duts file.
+With an output store, the snapshot holds the location of the outputs of each
+dut in the store instead of the outputs themselves.  Raw json outputs are
+written as collected and decoded by the workers on first read.
+
+Workers also share a temporary directory, named in the VANE_DUT_PHASE
+environment variable, where they publish how many tests of single duts they
+finished, see vane.fixtures.wait_for_dut_tests.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+from collections.abc import Mapping
+from vane import config, tests_tools
+from vane.connection_pool import configure_connection_pool
+from vane.output_store import DutOutput, open_dut_output
+from vane.request_scheduler import configure_scheduler
+from vane.utils import RawJson
+from vane.vane_logging import logging
+
+
+SNAPSHOT_ENV = "VANE_SNAPSHOT"
+DUT_PHASE_ENV = "VANE_DUT_PHASE"
+
+# live connections are set up again by each worker
+CONNECTION_KEYS = ("connection", "ssh_conn", "eapi_conn", "text_conn")
+
+# credentials are read again from the duts file by each worker
+CREDENTIAL_KEYS = ("password", "enable_pwd")
+
+
+def snapshot_dut(dut):
+    """Return the collected state of a dut without its connections and credentials
+
+    Args:
+        dut (dict): structured data of a dut
+
+    Returns:
+        dut (dict): show outputs and metadata of the dut
+    """
+    dut_data = {
+        key: value
+        for key, value in dut.items()
+        if key not in CONNECTION_KEYS + CREDENTIAL_KEYS + ("output",)
+    }
+
+    if isinstance(dut.get("output"), DutOutput):
+        # workers read the outputs from the store
+        dut_data["output_index"] = dut["output"].index()
+        return dut_data
+
+    outputs = {}
+    lazy_text = []
+    raw_json = {}
+
+    for show_cmd, output in dut.get("output", {}).items():
+        if not isinstance(output, Mapping):
+            outputs[show_cmd] = output
+            continue
+
+        if getattr(output, "lazy_text", False) and "text" not in output:
+            # fetched by the worker on first use
+            lazy_text.append(show_cmd)
+
+        # read the fields as stored, without decoding raw json
+        outputs[show_cmd] = dict(dict.items(output))
+        for field, value in outputs[show_cmd].items():
+            if isinstance(value, RawJson):
+                raw_json.setdefault(show_cmd, {})[field] = value.output_fields
+
+    dut_data["output"] = outputs
+    dut_data["lazy_text"] = lazy_text
+    dut_data["raw_json"] = raw_json
+
+    return dut_data
+
+
+def write_snapshot(duts, test_defs, test_parameters, duts_file):
+    """Write the collected state the test workers need to a private temporary
+    snapshot file
+
+    Args:
+        duts (list): structured data of duts returned by init_duts
+        test_defs (dict): test definitions
+        test_parameters (dict): Abstraction of testing parameters
+        duts_file (str): duts file the workers read the duts and their credentials from
+
+    Returns:
+        snapshot_file (str): file the snapshot was written to
+    """
+    snapshot = {
+        "duts": [snapshot_dut(dut) for dut in duts],
+        "test_defs": test_defs,
+        "test_parameters": test_parameters,
+        "duts_file": os.path.abspath(duts_file),
+    }
+
+    # created readable by the current user only
+    snapshot_fd, snapshot_file = tempfile.mkstemp(prefix="vane_snapshot_", suffix=".json")
+
+    try:
+        with os.fdopen(snapshot_fd, "w", encoding="utf-8") as json_out:
+            json.dump(snapshot, json_out, separators=(",", ":"))
+    except BaseException:
+        os.remove(snapshot_file)
+        raise
+
+    logging.info(f"Wrote snapshot of {len(duts)} duts to {snapshot_file}")
+
+    return snapshot_file
+
+
+def remove_snapshot():
+    """Remove the snapshot file named in VANE_SNAPSHOT once the test run ends"""
+
+    snapshot_file = os.environ.pop(SNAPSHOT_ENV, None)
+
+    if snapshot_file and os.path.exists(snapshot_file):
+        os.remove(snapshot_file)
+        logging.info(f"Removed snapshot {snapshot_file}")
+
+
+def create_dut_phase_dir():
+    """Create the directory the workers publish their finished tests in
+
+    Returns:
+        dut_phase_dir (str): directory named in VANE_DUT_PHASE
+    """
+    dut_phase_dir = tempfile.mkdtemp(prefix="vane_dut_phase_")
+    os.environ[DUT_PHASE_ENV] = dut_phase_dir
+
+    return dut_phase_dir
+
+
+def remove_dut_phase_dir():
+    """Remove the directory named in VANE_DUT_PHASE once the test run ends"""
+
+    dut_phase_dir = os.environ.pop(DUT_PHASE_ENV, None)
+
+    if dut_phase_dir:
+        shutil.rmtree(dut_phase_dir, ignore_errors=True)
+
+
+def load_snapshot(snapshot_file):
+    """Load a snapshot file into vane.config.  Connections to the duts are
+    set up on first use.
+
+    Args:
+        snapshot_file (str): file the snapshot was written to
+
+    Returns:
+        duts (list): structured data of duts
+    """
+    with open(snapshot_file, "r", encoding="utf-8") as json_in:
+        snapshot = json.load(json_in)
+
+    test_parameters = snapshot["test_parameters"]
+    test_duts = tests_tools.import_yaml(snapshot["duts_file"])
+
+    configure_scheduler(test_parameters["parameters"])
+    configure_connection_pool(test_parameters["parameters"])
+
+    snapshot_duts = {dut_data["name"]: dut_data for dut_data in snapshot["duts"]}
+    duts = []
+
+    for dut in tests_tools.login_duts(test_parameters, test_duts):
+        dut_data = snapshot_duts.get(dut["name"])
+        if dut_data is None:
+            continue
+
+        output_index = dut_data.pop("output_index", None)
+        lazy_text = set(dut_data.pop("lazy_text", []))
+        raw_json = dut_data.pop("raw_json", {})
+        outputs = dut_data.pop("output", {})
+        dut.update(dut_data)
+
+        if output_index is not None:
+            dut["output"] = open_dut_output(output_index, dut, tests_tools.fetch_text)
+            duts.append(dut)
+            continue
+
+        dut["output"] = {}
+        for show_cmd, output in outputs.items():
+            for field, output_fields in raw_json.get(show_cmd, {}).items():
+                output[field] = RawJson(output[field])
+                output[field].output_fields = output_fields
+            if isinstance(output, dict):
+                cmd_output = tests_tools.CmdOutput(dut, show_cmd, show_cmd in lazy_text)
+                cmd_output.update(output)
+                output = cmd_output
+            dut["output"][show_cmd] = output
+
+        duts.append(dut)
+
+    config.test_parameters = test_parameters
+    config.test_duts = test_duts
+    config.test_defs = snapshot["test_defs"]
+    config.dut_objs = duts
+
+    logging.info(f"Loaded snapshot of {len(duts)} duts from {snapshot_file}")
+
+    return duts
+
+
+def load_worker_snapshot():
+    """Load the snapshot named in VANE_SNAPSHOT when running in a pytest-xdist
+    worker, before the fixtures and test modules read vane.config
+
+    Returns:
+        loaded (bool): True when a snapshot was loaded
+    """
+    snapshot_file = os.environ.get(SNAPSHOT_ENV)
+
+    if not os.environ.get("PYTEST_XDIST_WORKER") or not snapshot_file:
+        return False
+    if config.dut_objs:
+        return False
+
+    load_snapshot(snapshot_file)
+
+    return True
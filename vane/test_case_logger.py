@@ -1,6 +1,8 @@
 """ Logger functionality for Vane testcases to add logs to vane html report and vane_test.log"""
 
 import logging
+import os
+from vane.vane_logging import LOG_DIRECTORY
 
 # pylint: disable=consider-using-with
 
@@ -20,7 +22,7 @@ def setup_logger(log_file):
     logger.propagate = False
 
     # Create the log file if it doesn't exist
-    path = "logs/" + log_file
+    path = os.path.join(LOG_DIRECTORY, log_file)
     open(path, "a", encoding="utf-8").close()
 
     # Logger functionality for Vane testcases to add logs to test case specific log file
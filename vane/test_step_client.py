@@ -32,6 +32,7 @@
 """Utilities for using PyTest in network testing"""
 
 import os
+import inspect
 import json
 import re
 from pathlib import Path
@@ -40,6 +41,54 @@ from vane.vane_logging import logging
 from vane.utils import return_date
 
 
+# Pattern to match to extract TS/TD
+TEST_STEPS_PATTERN = re.compile('(T[SD]:.*?)(?:"""|Args:)', re.DOTALL)
+
+# test steps and description of each test function, parsed once
+_function_docs = {}
+
+
+def parse_test_steps(content):
+    """Return the test steps (TS:) and definitions (TD:) in python source
+
+    Args:
+        content (str): python source
+
+    Returns:
+        comments (list): stripped TS: and TD: comments, in source order
+    """
+    return [x.strip() for x in TEST_STEPS_PATTERN.findall(content)]
+
+
+def function_docs(func):
+    """Return the test steps and description of a test function.  They are
+    parsed from its source and docstring the first time, usually while
+    pytest collects the tests, and served from a cache afterwards
+
+    Args:
+        func (obj): test function, or a method bound to it
+
+    Returns:
+        docs (dict): "steps" (list) and "description" (str) of the function
+    """
+    func = getattr(func, "__func__", func)
+    docs = _function_docs.get(func)
+
+    if docs is None:
+        lines, _ = inspect.getsourcelines(func)
+        comments = parse_test_steps(" ".join([str(elem) for elem in lines]))
+        steps = [x.lstrip("TS:") for x in comments if x.startswith("TS:")]
+        if not steps:
+            steps.append("N/a no Test Steps found")
+
+        docstring = str(func.__doc__)
+        description = docstring.split("Args:", maxsplit=1)[0] or docstring or "No Description"
+
+        docs = _function_docs[func] = {"steps": steps, "description": description}
+
+    return docs
+
+
 class TestStepClient:
     """Creates instance of Test Step Client."""
 
@@ -88,15 +137,9 @@ class TestStepClient:
         logging.info("Parsing files for test steps and definitions")
         for test_file in test_files:
             logging.debug(f"Parsing file: {test_file} for test steps and definitions")
-            comments = []
             with open(test_file, "r", encoding="utf_8") as infile:
                 content = infile.read()
-            # Pattern to match to extract TS/TD
-            pattern = re.compile('(T[SD]:.*?)(?:"""|Args:)', re.DOTALL)
-            # Find all matches to pattern
-            comments = pattern.findall(content)
-            # Format each item in list
-            comments = [x.strip() for x in comments]
+            comments = parse_test_steps(content)
             if not comments:
                 comments.append("N/a no Test Steps found")
             now, _ = return_date()
@@ -52,7 +52,7 @@ import yaml
 
 from jinja2 import Template, Undefined
 from pytest import ExitCode
-from vane.vane_logging import logging
+from vane.vane_logging import LOG_DIRECTORY, logging
 from vane import tests_tools
 from vane.utils import return_date
 
@@ -304,6 +304,11 @@ class TestsClient:
         logging.info(f"Setting PyTest parameter processes (extension: -n) to {processes}")
         self._set_cmdline_input(processes, "-n")
 
+        # run the tests of each dut on a single worker, see vane.fixtures
+        self.test_parameters = [x for x in self.test_parameters if not x.startswith("--dist")]
+        if processes:
+            self.test_parameters.append("--dist=loadgroup")
+
     def _get_markers(self):
         """Get markers for test run"""
         config = configparser.ConfigParser()
@@ -400,16 +405,16 @@ class TestsClient:
     def _remove_test_case_logs(self):
         """Removing the test case logs"""
 
-        logging.info("Remove any existing log files in logs directory: logs")
+        logging.info(f"Remove any existing log files in logs directory: {LOG_DIRECTORY}")
 
         # Get the list of files in the logs folder
         # This folder will always exist as it gets created
         # in the root logging configuration file
-        files = os.listdir("logs")
+        files = os.listdir(LOG_DIRECTORY)
 
         # Iterate over the files and delete each one
         for file_name in files:
             if file_name != "vane.log":
-                file_path = os.path.join("logs", file_name)
+                file_path = os.path.join(LOG_DIRECTORY, file_name)
                 if os.path.isfile(file_path):
                     os.remove(file_path)
@@ -32,24 +32,95 @@
 
 """Utilities for using PyTest in network testing"""
 
+import ast
 import copy
+import asyncio
 import concurrent.futures
 import sys
 import os
-import time
-import inspect
 import re
 import pprint
+import threading
+import contextlib
+from collections.abc import MutableMapping
 import yaml
 
 from jinja2 import Template
+from _pytest.mark.expression import Expression
 from pyeapi.eapilib import EapiError
-from vane import config, device_interface
-from vane.vane_logging import logging
-from vane.utils import render_cmds
+from vane import config, device_interface, test_step_client
+from vane.capability_cache import configure_capability_cache, get_capability_cache
+from vane.connection_pool import configure_connection_pool, get_connection_pool
+from vane.output_store import configure_output_store, get_output_store
+from vane.request_scheduler import configure_scheduler, get_scheduler
+from vane.vane_logging import NETMIKO_LOG_DIRECTORY, logging
+from vane.utils import caller_name, render_cmds, prune_output, RawJson
+
+try:
+    from _pytest.mark.expression import ParseError
+except ImportError:
+    # newer pytest releases raise SyntaxError for invalid expressions
+    ParseError = SyntaxError
 
 
 DEFAULT_EOS_CONN = "eapi"
+DEFAULT_COLLECTION_ENGINE = "thread"
+DEFAULT_TEXT_COLLECTION = "eager"
+DEFAULT_JSON_DECODE = "eager"
+DEFAULT_COLLECTION_PLAN = "global"
+# json output vane itself reads, kept when a show command is pruned
+BASE_OUTPUT_FIELDS = {"show version": ["modelName", "version"]}
+
+
+class DutIndex:
+    """Name and role keyed lookups into a list of duts, with the duts matched
+    by each regex filter cached, so filtering does not scan every dut"""
+
+    def __init__(self, duts):
+        """Index a list of duts
+
+        Args:
+            duts (list): duts, in the order filters return them
+        """
+        self.duts = duts
+        self.names = {}
+        self.roles = {}
+        self._regex_matches = {}
+
+        for dut in duts:
+            self.names.setdefault(dut["name"], []).append(dut)
+            self.roles.setdefault(dut.get("role"), []).append(dut)
+
+    def regex(self, pattern):
+        """Return the duts whose name matches a regex
+
+        Args:
+            pattern (str): regex matched at the start of dut names
+        """
+        if pattern not in self._regex_matches:
+            compiled = re.compile(pattern)
+            self._regex_matches[pattern] = [dut for dut in self.duts if compiled.match(dut["name"])]
+
+        return self._regex_matches[pattern]
+
+
+_dut_index = {"duts": None, "size": 0, "index": None}
+
+
+def index_duts(duts):
+    """Return the index of a list of duts, built the first time the duts are
+    filtered and again only when a different or resized list is passed
+
+    Args:
+        duts (list): duts
+
+    Returns:
+        index (DutIndex): index of duts
+    """
+    if _dut_index["duts"] is not duts or _dut_index["size"] != len(duts):
+        _dut_index.update(duts=duts, size=len(duts), index=DutIndex(duts))
+
+    return _dut_index["index"]
 
 
 def filter_duts(duts, criteria="", dut_filter=""):
@@ -67,27 +138,29 @@ def filter_duts(duts, criteria="", dut_filter=""):
     """
     logging.info(f"Filter: {dut_filter} by criteria: {criteria}")
 
-    subset_duts, dut_names = [], []
     if criteria == "roles":
-        for role in dut_filter:
-            subset_duts = subset_duts + [dut for dut in duts if role == dut["role"]]
-            dut_names = dut_names + [dut["name"] for dut in duts if role == dut["role"]]
+        dut_index = index_duts(duts)
+        subset_duts = [dut for role in dut_filter for dut in dut_index.roles.get(role, [])]
     elif criteria == "names":
-        for name in dut_filter:
-            subset_duts = subset_duts + [dut for dut in duts if name == dut["name"]]
-            dut_names = dut_names + [dut["name"] for dut in duts if name == dut["name"]]
+        dut_index = index_duts(duts)
+        subset_duts = [dut for name in dut_filter for dut in dut_index.names.get(name, [])]
     elif criteria == "regex":
-        subset_duts = [dut for dut in duts if re.match(dut_filter, dut["name"])]
-        dut_names = [dut["name"] for dut in duts if re.match(dut_filter, dut["name"])]
+        subset_duts = list(index_duts(duts).regex(dut_filter))
     else:
         subset_duts = duts
-        dut_names = [dut["name"] for dut in duts]
+
+    dut_names = [dut["name"] for dut in subset_duts]
 
     return subset_duts, dut_names
 
 
+_dut_parameters = {"test_defs": None, "dut_objs": None, "suites": {}}
+
+
 def parametrize_duts(test_fname, test_defs, dut_objs):
-    """Use a filter to create input variables for PyTest parametrize
+    """Use a filter to create input variables for PyTest parametrize.  The
+    parameters of a test suite are computed once and shared by every test
+    module of the suite
 
     Args:
         test_fname (str): Test suite path and file name
@@ -101,10 +174,15 @@ def parametrize_duts(test_fname, test_defs, dut_objs):
 
     testsuite = test_fname.split("/")[-1]
 
+    if _dut_parameters["test_defs"] is not test_defs or _dut_parameters["dut_objs"] is not dut_objs:
+        _dut_parameters.update(test_defs=test_defs, dut_objs=dut_objs, suites={})
+    elif testsuite in _dut_parameters["suites"]:
+        logging.info(f"Reusing dut parameters of test suite: {testsuite}")
+        return _dut_parameters["suites"][testsuite]
+
     logging.info(f"Filtering test definitions by test suite name: {testsuite}")
 
-    subset_def = [defs for defs in test_defs["test_suites"] if testsuite == defs["name"]]
-    testcases = subset_def[0]["testcases"]
+    testcases = index_test_defs(test_defs).suite(testsuite)["testcases"]
 
     logging.info("Unpack testcases by defining dut and criteria")
 
@@ -123,12 +201,14 @@ def parametrize_duts(test_fname, test_defs, dut_objs):
 
             duts, ids = filter_duts(dut_objs, criteria, dut_filter)
 
-            logging.debug(f"Creating dut parameters.  \nDuts: {duts} \nIds: {ids}")
+            logging.debug(f"Creating dut parameters for {testname}.  \nIds: {ids}")
 
             dut_parameters[testname] = {}
             dut_parameters[testname]["duts"] = duts
             dut_parameters[testname]["ids"] = ids
 
+    _dut_parameters["suites"][testsuite] = dut_parameters
+
     return dut_parameters
 
 
@@ -176,16 +256,18 @@ def yaml_read(yaml_file):
             sys.exit(1)
 
 
-def init_duts(show_cmds, test_parameters, test_duts):
+def init_duts(show_cmds, test_parameters, test_duts, output_fields=None):
     """Use PS LLD spreadsheet to find interesting duts and then execute
     inputted show commands on each dut.  Return structured data of
     dut's output data, hostname, and connection.  Using threading to
     make method more efficient.
 
     Args:
-      show_cmds (str): list of interesting show commands
+      show_cmds (list or dict): list of interesting show commands, or the
+      list of show commands per dut name
       test_parameters (dict): Abstraction of testing parameters
       test_duts (dict): Dictionary of duts
+      output_fields (dict, optional): paths the json output of show commands is pruned to
 
     Returns:
       duts (dict): structured data of duts output data, hostname, and
@@ -197,19 +279,43 @@ def init_duts(show_cmds, test_parameters, test_duts):
         "data, hostname, and connection."
     )
 
+    configure_scheduler(test_parameters["parameters"])
+    configure_capability_cache(test_parameters["parameters"])
+    configure_connection_pool(test_parameters["parameters"])
+    configure_output_store(test_parameters["parameters"])
     duts = login_duts(test_parameters, test_duts)
-    workers = len(duts)
+    parameters = test_parameters["parameters"]
+    engine = parameters.get("collection_engine", DEFAULT_COLLECTION_ENGINE)
+    text_collection = parameters.get("text_collection", DEFAULT_TEXT_COLLECTION)
+    json_decode = parameters.get("json_decode", DEFAULT_JSON_DECODE)
+
+    if text_collection not in ("eager", "lazy"):
+        raise ValueError(f"Invalid text collection {text_collection} specified")
+    if json_decode not in ("eager", "lazy"):
+        raise ValueError(f"Invalid json decode {json_decode} specified")
+    if engine not in ("thread", "async"):
+        raise ValueError(f"Invalid collection engine {engine} specified")
+
+    track_collection(duts)
+    # built once here, looked up by every collection worker
+    index_topology(test_duts)
+
+    if parameters.get("streaming_collection", False):
+        if parameters.get("processes"):
+            logging.warning("Streaming collection is not supported with processes, waiting")
+        else:
+            logging.info("Streaming show output, tests start once their duts are collected")
 
-    logging.debug(f"Duts login info: {duts} and create {workers} workers")
-    logging.debug(f"Passing the following show commands to workers: {show_cmds}")
+            threading.Thread(
+                target=collect_duts,
+                args=(duts, show_cmds, test_parameters, test_duts, output_fields),
+                name="vane-collection",
+                daemon=True,
+            ).start()
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        future_object = {
-            executor.submit(dut_worker, dut, show_cmds, test_duts): dut for dut in duts
-        }
+            return duts
 
-    if future_object:
-        logging.debug("Future object generated successfully")
+    collect_duts(duts, show_cmds, test_parameters, test_duts, output_fields)
 
     logging.info("Returning duts data structure")
     logging.debug(f"Return duts data structure: {duts}")
@@ -217,6 +323,144 @@ def init_duts(show_cmds, test_parameters, test_duts):
     return duts
 
 
+def collect_duts(duts, show_cmds, test_parameters, test_duts, output_fields=None):
+    """Execute inputted show commands on each dut with the configured
+    collection engine
+
+    Args:
+      duts (list): structured data of duts returned by login_duts
+      show_cmds (list or dict): list of interesting show commands, or the
+      list of show commands per dut name
+      test_parameters (dict): Abstraction of testing parameters
+      test_duts (dict): Dictionary of duts
+      output_fields (dict, optional): paths the json output of show commands is pruned to
+    """
+    parameters = test_parameters["parameters"]
+    engine = parameters.get("collection_engine", DEFAULT_COLLECTION_ENGINE)
+    eos_conn = parameters.get("eos_conn", DEFAULT_EOS_CONN)
+    lazy_text = parameters.get("text_collection", DEFAULT_TEXT_COLLECTION) == "lazy"
+    lazy_json = parameters.get("json_decode", DEFAULT_JSON_DECODE) == "lazy"
+    scheduler = get_scheduler()
+
+    if engine == "async" and eos_conn == "eapi":
+        logging.info("Collecting show output with asyncio engine")
+        logging.debug(f"Passing the following show commands to async workers: {show_cmds}")
+
+        asyncio.run(
+            async_init_duts(duts, show_cmds, test_duts, lazy_text, lazy_json, output_fields)
+        )
+    else:
+        if engine == "async":
+            logging.warning(f"Async collection engine requires eapi, using threads for {eos_conn}")
+
+        workers = len(duts)
+        if scheduler.max_in_flight:
+            # threads beyond the in-flight cap would only wait on the scheduler
+            workers = min(workers, scheduler.max_in_flight)
+
+        logging.debug(f"Duts login info: {duts} and create {workers} workers")
+        logging.debug(f"Passing the following show commands to workers: {show_cmds}")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            future_object = {}
+            for dut in duts:
+                future = executor.submit(
+                    dut_worker,
+                    dut,
+                    return_dut_cmds(show_cmds, dut),
+                    test_duts,
+                    lazy_text,
+                    lazy_json,
+                    output_fields,
+                )
+                future.add_done_callback(
+                    lambda _, dut_name=dut["name"]: mark_dut_collected(dut_name)
+                )
+                future_object[future] = dut
+
+        if future_object:
+            logging.debug("Future object generated successfully")
+
+    get_capability_cache().save()
+    prefetch_duts_text(duts, show_cmds, test_parameters)
+
+
+_collection_events = {}
+
+
+def track_collection(duts):
+    """Start tracking which duts have their show output collected
+
+    Args:
+        duts (list): structured data of duts returned by login_duts
+    """
+    _collection_events.clear()
+    _collection_events.update({dut["name"]: threading.Event() for dut in duts})
+
+
+def mark_dut_collected(dut_name):
+    """Publish that the show output of a dut is collected
+
+    Args:
+        dut_name (str): name of the dut
+    """
+    if dut_name in _collection_events:
+        _collection_events[dut_name].set()
+
+
+def duts_collected(dut_names=None):
+    """Check whether the show output of duts is collected
+
+    Args:
+        dut_names (list, optional): names of the duts, defaults to every dut
+
+    Returns:
+        collected (bool): True when every dut is collected or not tracked
+    """
+    if dut_names is None:
+        dut_names = list(_collection_events)
+
+    return all(
+        _collection_events[dut_name].is_set()
+        for dut_name in dut_names
+        if dut_name in _collection_events
+    )
+
+
+def wait_for_duts(dut_names=None):
+    """Wait until the show output of duts is collected
+
+    Args:
+        dut_names (list, optional): names of the duts, defaults to every dut
+    """
+    if dut_names is None:
+        dut_names = list(_collection_events)
+
+    for dut_name in dut_names:
+        event = _collection_events.get(dut_name)
+
+        if event and not event.is_set():
+            logging.info(f"Waiting for show output of {dut_name}")
+            event.wait()
+
+
+def return_dut_cmds(show_cmds, dut):
+    """Return the show commands to collect from a dut
+
+    Args:
+        show_cmds (list or dict): list of show commands, or the list of show
+        commands per dut name
+        dut (dict): structured data of a dut
+
+    Returns:
+        show_cmds (list): show commands to collect from dut
+    """
+    if isinstance(show_cmds, dict):
+        return show_cmds.get(dut["name"], [])
+
+    return show_cmds
+
+
 def login_duts(test_parameters, test_duts):
     """Use eapi to connect to Arista switches for testing
 
@@ -249,21 +493,27 @@ def login_duts(test_parameters, test_duts):
         logging.debug(f"Connecting to switch: {name} using parameters: {dut}")
 
         eos_conn = test_parameters["parameters"].get("eos_conn", DEFAULT_EOS_CONN)
-        netmiko_conn = device_interface.NetmikoConn()
-        netmiko_conn.set_up_conn(dut)
+
+        # connections are set up on first use, by the collection workers in parallel
+        netmiko_conn = device_interface.LazyConn(device_interface.NetmikoConn, dut)
         login_ptr["ssh_conn"] = netmiko_conn
 
-        pyeapi_conn = device_interface.PyeapiConn()
-        pyeapi_conn.set_up_conn(dut)
+        pyeapi_conn = device_interface.LazyConn(device_interface.PyeapiConn, dut)
         login_ptr["eapi_conn"] = pyeapi_conn
 
         if eos_conn == "eapi":
             login_ptr["connection"] = pyeapi_conn
+            text_conn_class = device_interface.PyeapiConn
         elif eos_conn == "ssh":
             login_ptr["connection"] = netmiko_conn
+            text_conn_class = device_interface.NetmikoConn
         else:
             raise ValueError(f"Invalid EOS conn type {eos_conn} specified")
 
+        # lazy text output is fetched, also in the background, over its own
+        # connection, drivers do not support concurrent use of one connection
+        login_ptr["text_conn"] = device_interface.LazyConn(text_conn_class, dut)
+
         login_ptr["name"] = name
         login_ptr["mgmt_ip"] = dut["mgmt_ip"]
         login_ptr["username"] = dut["username"]
@@ -274,6 +524,11 @@ def login_duts(test_parameters, test_duts):
         login_ptr["results_dir"] = test_parameters["parameters"]["results_dir"]
         login_ptr["report_dir"] = test_parameters["parameters"]["report_dir"]
 
+        if dut.get("eapi_gzip"):
+            login_ptr["eapi_gzip"] = dut["eapi_gzip"]
+        if dut.get("ssh_batch_cmds"):
+            login_ptr["ssh_batch_cmds"] = dut["ssh_batch_cmds"]
+
         if name in network_configs:
             login_ptr["network_configs"] = network_configs[name]
 
@@ -282,25 +537,36 @@ def login_duts(test_parameters, test_duts):
     return logins
 
 
-def send_cmds(show_cmds, conn, encoding):
-    """Send show commands to duts and recurse on failure
+def send_cmds(show_cmds, conn, encoding, dut=None, raw_json=False):
+    """Send show commands to duts and isolate failing commands by splitting
+    the batch in halves on failure
 
     Args:
         show_cmds (list): List of pre-processed commands
         conn (obj): connection
         encoding (string): encoding type of show commands: either json or text
+        dut (dict, optional): dut the requests are paced for by the request scheduler
+        raw_json (bool, optional): return json outputs undecoded, see raw_json_cmds
 
     Returns:
-        show_cmd_list (list): list of show commands
+        show_cmd_list (list): list of show command outputs
+        show_cmds (list): list of show commands that produced the outputs
     """
+    if not show_cmds:
+        return [], []
 
     try:
         logging.debug(f"List of show commands in show_cmds with encoding {encoding}: {show_cmds}")
 
-        if encoding == "json":
-            show_cmd_list = conn.run_commands(show_cmds)
-        elif encoding == "text":
-            show_cmd_list = conn.run_commands(show_cmds, encoding="text")
+        with request_slot(dut):
+            if encoding == "json" and raw_json:
+                show_cmd_list = raw_json_outputs(
+                    conn.run_commands(raw_json_cmds(show_cmds), encoding="text"), show_cmds
+                )
+            elif encoding == "json":
+                show_cmd_list = conn.run_commands(show_cmds)
+            elif encoding == "text":
+                show_cmd_list = conn.run_commands(show_cmds, encoding="text")
 
         logging.info("Ran all show commands on dut")
         logging.debug(f"Ran all show cmds with encoding {encoding}: {show_cmds}")
@@ -309,49 +575,140 @@ def send_cmds(show_cmds, conn, encoding):
     except Exception as err:
         logging.error(f"Error running all cmds: {err}")
 
-        show_cmds = remove_cmd(err, show_cmds)
+        if not split_failed_batch(err, show_cmds, encoding, dut):
+            return [], []
 
-        logging.debug(f"New show_cmds: {show_cmds}")
+        middle = len(show_cmds) // 2
+        first_list, first_cmds = send_cmds(show_cmds[:middle], conn, encoding, dut, raw_json)
+        second_list, second_cmds = send_cmds(show_cmds[middle:], conn, encoding, dut, raw_json)
 
-        show_cmd_list = send_cmds(show_cmds, conn, encoding)
-        show_cmd_list = show_cmd_list[0]
+        show_cmd_list = list(first_list) + list(second_list)
+        show_cmds = first_cmds + second_cmds
+
+        logging.debug(f"New show_cmds: {show_cmds}")
 
     logging.debug(f"Return all show cmds: {show_cmd_list}")
 
     return show_cmd_list, show_cmds
 
 
-def remove_cmd(err, show_cmds):
-    """Remove command that is not supported by pyeapi
+def raw_json_cmds(show_cmds):
+    """Pipe show commands to json so the device returns their json output as
+    text, which is kept undecoded until a test reads it
 
     Args:
-        err (str): Error string
-        show_cmds (list): List of pre-processed commands
+        show_cmds (list): List of show commands
 
     Returns:
-        show_cmds (list): List of post-processed commands
+        show_cmds (list): show commands piped to json
     """
-    logging.debug(f"remove_cmd: {err}")
-    logging.debug(f"remove_cmd show_cmds list: {show_cmds}")
+    return [f"{show_cmd} | json" for show_cmd in show_cmds]
 
-    longest_matching_cmd = ""
 
-    for show_cmd in show_cmds:
-        if show_cmd in str(err) and longest_matching_cmd in show_cmd:
-            longest_matching_cmd = show_cmd
+def raw_json_outputs(show_cmd_list, show_cmds):
+    """Wrap the text outputs of raw_json_cmds as undecoded json.  A command
+    the device can not pipe to json answers with a CLI error (e.g. "% This is
+    an unconverted command") instead of failing, which is raised as a failed
+    command, same as with json encoding
+
+    Args:
+        show_cmd_list (list): text outputs of the commands
+        show_cmds (list): List of show commands
 
-    # longest_matching_cmd is the one in error string, lets bump it out
-    if longest_matching_cmd:
-        cmd_index = show_cmds.index(longest_matching_cmd)
-        show_cmds.pop(cmd_index)
+    Returns:
+        show_cmd_list (list): RawJson outputs
+    """
+    outputs = []
 
-        logging.info(f"Removed {longest_matching_cmd} due to an error")
-        logging.debug(f"Removed {longest_matching_cmd} because of {err}")
+    for show_cmd, show_cmd_output in zip(show_cmds, show_cmd_list):
+        output = show_cmd_output["output"]
+
+        if not output.lstrip().startswith(("{", "[")):
+            raise device_interface.CommandError(
+                f"Could not execute {show_cmd} | json. Got error: {output}", show_cmds
+            )
+
+        outputs.append(RawJson(output))
+
+    return outputs
+
+
+def request_slot(dut):
+    """Return a request scheduler slot for dut, or a no-op context without a dut
+
+    Args:
+        dut (dict): data structure of dut parameters
+    """
+    if dut is None:
+        return contextlib.nullcontext()
+
+    return get_scheduler().slot(dut)
 
-    return show_cmds
 
+def split_failed_batch(err, show_cmds, encoding, dut=None):
+    """Decide whether a failed batch of commands should be split to isolate
+    the failing commands
 
-def dut_worker(dut, show_cmds, test_parameters):
+    Args:
+        err (Exception): Error raised by the batch
+        show_cmds (list): List of commands in the batch
+        encoding (string): encoding type of show commands: either json or text
+        dut (dict, optional): dut the rejected commands are recorded on
+
+    Returns:
+        split (bool): True when the batch holds more than one command and the
+        error is not a connection error that every command would hit
+    """
+    if isinstance(err, device_interface.CONNECTION_ERRORS):
+        logging.info(f"Not retrying {show_cmds} after connection error")
+        return False
+
+    if len(show_cmds) == 1:
+        logging.info(f"Removed {show_cmds[0]} due to an error")
+        logging.debug(f"Removed {show_cmds[0]} because of {err}")
+
+        # only commands the platform does not support are cached across runs,
+        # other failures, like timeouts and agent errors, fail for this run only
+        if dut is not None and device_interface.is_rejected_cmd(err):
+            dut.setdefault("rejected_cmds", {}).setdefault(encoding, []).append(show_cmds[0])
+
+        return False
+
+    return True
+
+
+def record_failed_cmds(dut, encoding, show_cmds, ran_cmds):
+    """Record the show commands that failed on a dut
+
+    Args:
+        dut (dict): structured data of a dut
+        encoding (string): encoding type of show commands: either json or text
+        show_cmds (list): List of commands sent to the dut
+        ran_cmds (list): List of commands that ran successfully
+    """
+    failed_cmds = [show_cmd for show_cmd in show_cmds if show_cmd not in ran_cmds]
+    dut.setdefault("failed_cmds", {})[encoding] = failed_cmds
+
+    if failed_cmds:
+        logging.warning(
+            f"Show commands failed on {dut['name']} with {encoding} encoding: {failed_cmds}"
+        )
+
+
+def cache_rejected_cmds(dut, platform):
+    """Add the commands a dut rejected to the capability cache of its platform
+
+    Args:
+        dut (dict): structured data of a dut
+        platform (tuple): model name and EOS version of the dut
+    """
+    for encoding, rejected_cmds in dut.get("rejected_cmds", {}).items():
+        get_capability_cache().add(platform, encoding, rejected_cmds)
+
+
+def dut_worker(
+    dut, show_cmds, test_parameters, lazy_text=False, lazy_json=False, output_fields=None
+):
     """Execute inputted show commands on dut.  Update dut structured data
     with show output.
 
@@ -359,24 +716,67 @@ def dut_worker(dut, show_cmds, test_parameters):
       dut (dict): structured data of a dut output data, hostname, and
       show_cmds (list): List of show commands
       test_parameters (dict): Abstraction of testing parameters
+      lazy_text (bool): Fetch text output on first use instead of collecting it now
+      lazy_json (bool): Decode json output on first use instead of at collection
+      output_fields (dict): paths the json output of show commands is pruned to
     """
     name = dut["name"]
     conn = dut["connection"]
-    dut["output"] = {}
+    dut["output"] = get_output_store().new_output(dut, fetch_text)
     dut["output"]["interface_list"] = return_interfaces(name, test_parameters)
 
     logging.info(f"Executing show commands on {name}")
     logging.debug(f"List of show commands {show_cmds}")
 
-    all_cmds_json = show_cmds.copy()
-    show_cmd_json_list, show_cmds_json = send_cmds(all_cmds_json, conn, "json")
+    cache = get_capability_cache()
+    platform = None
+    if cache.enabled:
+        show_version, _ = send_cmds(["show version"], conn, "json", dut)
+        platform = cache.platform(show_version[0] if show_version else None)
+
+    all_cmds_json = cache.supported_cmds(platform, "json", show_cmds)
+    show_cmd_json_list, show_cmds_json = send_cmds(all_cmds_json, conn, "json", dut, lazy_json)
 
     logging.debug(f"Returned from send_cmds_json {show_cmds_json}")
+    record_failed_cmds(dut, "json", show_cmds, show_cmds_json)
+
+    if lazy_text:
+        add_dut_output(
+            dut, show_cmds, (show_cmd_json_list, show_cmds_json), output_fields=output_fields
+        )
+        cache_rejected_cmds(dut, platform)
+        return
 
-    all_cmds_txt = show_cmds.copy()
-    show_cmd_txt_list, show_cmds_txt = send_cmds(all_cmds_txt, conn, "text")
+    all_cmds_txt = cache.supported_cmds(platform, "text", show_cmds)
+    show_cmd_txt_list, show_cmds_txt = send_cmds(all_cmds_txt, conn, "text", dut)
 
     logging.debug(f"Returned from send_cmds_txt {show_cmds_txt}")
+    record_failed_cmds(dut, "text", show_cmds, show_cmds_txt)
+    cache_rejected_cmds(dut, platform)
+
+    add_dut_output(
+        dut,
+        show_cmds,
+        (show_cmd_json_list, show_cmds_json),
+        (show_cmd_txt_list, show_cmds_txt),
+        output_fields,
+    )
+
+
+def add_dut_output(dut, show_cmds, json_results, txt_results=None, output_fields=None):
+    """Update dut structured data with the json and text output of show commands
+
+    Args:
+      dut (dict): structured data of a dut output data, hostname, and
+      show_cmds (list): List of show commands
+      json_results (tuple): json outputs and the show commands that produced them
+      txt_results (tuple, optional): text outputs and the show commands that produced
+      them. Without text results the text output is fetched on first use.
+      output_fields (dict, optional): paths the json output of show commands is pruned to
+    """
+    name = dut["name"]
+    show_cmd_json_list, show_cmds_json = json_results
+    output_fields = output_fields or {}
 
     for show_cmd in show_cmds:
         function_def = f'test_{("_").join(show_cmd.split())}'
@@ -384,7 +784,7 @@ def dut_worker(dut, show_cmds, test_parameters):
         logging.debug(f"Executing show command: {show_cmd} for test {function_def}")
         logging.debug(f"Adding output of {show_cmd} to duts data structure")
 
-        dut["output"][show_cmd] = {}
+        dut["output"][show_cmd] = CmdOutput(dut, show_cmd, lazy_text=txt_results is None)
 
         if show_cmd in show_cmds_json:
             cmd_index = show_cmds_json.index(show_cmd)
@@ -396,6 +796,14 @@ def dut_worker(dut, show_cmds, test_parameters):
             )
 
             show_output = show_cmd_json_list[cmd_index]
+
+            if show_cmd in output_fields:
+                if isinstance(show_output, RawJson):
+                    # pruned when it is decoded
+                    show_output.output_fields = output_fields[show_cmd]
+                elif isinstance(show_output, dict):
+                    show_output = prune_output(show_output, output_fields[show_cmd])
+
             dut["output"][show_cmd]["json"] = show_output
 
             logging.debug(f"Adding cmd {show_cmd} to dut and data {show_output}")
@@ -404,6 +812,11 @@ def dut_worker(dut, show_cmds, test_parameters):
 
             logging.debug(f"No json output for {show_cmd}")
 
+        if txt_results is None:
+            continue
+
+        show_cmd_txt_list, show_cmds_txt = txt_results
+
         if show_cmd in show_cmds_txt:
             cmd_index = show_cmds_txt.index(show_cmd)
 
@@ -426,6 +839,326 @@ def dut_worker(dut, show_cmds, test_parameters):
     logging.info(f"{name} updated with show output {dut}")
 
 
+class CmdOutput(dict):
+    """Output of a show command on a dut.  A text encoding that was not
+    collected is fetched from the dut the first time it is read, and a raw
+    json encoding is decoded the first time it is read"""
+
+    def __init__(self, dut, show_cmd, lazy_text=True):
+        """Initializes the show command output
+
+        Args:
+            dut (dict): structured data of the dut the command runs on
+            show_cmd (str): show command
+            lazy_text (bool): fetch the text encoding on first use
+        """
+        super().__init__()
+        self.dut = dut
+        self.show_cmd = show_cmd
+        self.lazy_text = lazy_text
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+
+        if isinstance(value, RawJson):
+            value = value.decode()
+            dict.__setitem__(self, key, value)
+
+        return value
+
+    def __missing__(self, key):
+        if key != "text" or not self.lazy_text:
+            raise KeyError(key)
+
+        fetch_text(self.dut, [self.show_cmd])
+
+        if not dict.__contains__(self, key):
+            raise KeyError(key)
+
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self or (key == "text" and self.lazy_text):
+            return self[key]
+
+        return default
+
+
+_text_locks = {}
+_text_locks_lock = threading.Lock()
+
+
+def fetch_text(dut, show_cmds):
+    """Fetch the text output of show commands that have not been fetched yet,
+    in a single request per dut.  Requests are sent over the text connection
+    of the dut, which tests and fixtures do not use.
+
+    Args:
+        dut (dict): structured data of a dut
+        show_cmds (list): List of show commands
+    """
+
+    def pending_cmds():
+        return [
+            show_cmd
+            for show_cmd in dict.fromkeys(show_cmds)
+            if getattr(dut["output"].get(show_cmd), "lazy_text", False)
+            and "text" not in dut["output"][show_cmd]
+        ]
+
+    if not pending_cmds():
+        return
+
+    with _text_locks_lock:
+        text_lock = _text_locks.setdefault(dut["name"], threading.Lock())
+
+    with text_lock:
+        # another thread may have fetched the commands while we waited
+        text_cmds = pending_cmds()
+        if not text_cmds:
+            return
+
+        logging.info(f"Fetching text output of {text_cmds} from {dut['name']}")
+
+        show_cmd_txt_list, show_cmds_txt = send_cmds(
+            text_cmds.copy(), dut["text_conn"], "text", dut
+        )
+
+        for show_cmd in text_cmds:
+            show_output_txt = ""
+            if show_cmd in show_cmds_txt:
+                show_output_txt = show_cmd_txt_list[show_cmds_txt.index(show_cmd)]["output"]
+            dut["output"][show_cmd]["text"] = show_output_txt
+
+
+def prefetch_duts_text(duts, show_cmds, test_parameters):
+    """Fetch in the background the lazily collected text output that test
+    evidence will need, so tests rarely wait on it
+
+    Args:
+        duts (list): structured data of duts
+        show_cmds (list): List of show commands
+        test_parameters (dict): Abstraction of testing parameters
+    """
+    parameters = test_parameters["parameters"]
+
+    if parameters.get("text_collection", DEFAULT_TEXT_COLLECTION) != "lazy":
+        return
+    if not parameters.get("text_prefetch", True) or not duts:
+        return
+
+    logging.info(f"Prefetching text output of {show_cmds} in the background")
+
+    workers = len(duts)
+    if get_scheduler().max_in_flight:
+        workers = min(workers, get_scheduler().max_in_flight)
+
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="vane-text-prefetch"
+    )
+    for dut in duts:
+        executor.submit(fetch_text, dut, return_dut_cmds(show_cmds, dut))
+
+    # queued prefetches keep running while the tests start
+    executor.shutdown(wait=False)
+
+
+async def async_init_duts(
+    duts, show_cmds, test_duts, lazy_text=False, lazy_json=False, output_fields=None
+):
+    """Execute inputted show commands on all duts from a single event loop.
+    The request scheduler bounds the number of eAPI requests in flight.
+
+    Args:
+      duts (list): structured data of duts returned by login_duts
+      show_cmds (list): List of show commands
+      test_duts (dict): Dictionary of duts
+      lazy_text (bool): Fetch text output on first use instead of collecting it now
+      lazy_json (bool): Decode json output on first use instead of at collection
+      output_fields (dict): paths the json output of show commands is pruned to
+    """
+
+    async def collect(dut):
+        try:
+            await async_dut_worker(
+                dut,
+                return_dut_cmds(show_cmds, dut),
+                test_duts,
+                lazy_text,
+                lazy_json,
+                output_fields,
+            )
+        finally:
+            mark_dut_collected(dut["name"])
+
+    results = await asyncio.gather(*(collect(dut) for dut in duts), return_exceptions=True)
+
+    for dut, result in zip(duts, results):
+        if isinstance(result, Exception):
+            logging.error(f"Error collecting show output from {dut['name']}: {result}")
+
+
+async def async_dut_worker(
+    dut, show_cmds, test_duts, lazy_text=False, lazy_json=False, output_fields=None
+):
+    """Execute inputted show commands on dut using the async eapi driver.
+    Update dut structured data with show output.
+
+    Args:
+      dut (dict): structured data of a dut output data, hostname, and
+      show_cmds (list): List of show commands
+      test_duts (dict): Dictionary of duts
+      lazy_text (bool): Fetch text output on first use instead of collecting it now
+      lazy_json (bool): Decode json output on first use instead of at collection
+      output_fields (dict): paths the json output of show commands is pruned to
+    """
+    name = dut["name"]
+    conn = device_interface.AsyncEapiConn()
+    conn.set_up_conn(dut)
+    dut["output"] = get_output_store().new_output(dut, fetch_text)
+    dut["output"]["interface_list"] = return_interfaces(name, test_duts)
+
+    logging.info(f"Executing show commands on {name}")
+    logging.debug(f"List of show commands {show_cmds}")
+
+    cache = get_capability_cache()
+    platform = None
+    if cache.enabled:
+        show_version, _ = await async_send_cmds(["show version"], conn, "json", dut)
+        platform = cache.platform(show_version[0] if show_version else None)
+
+    json_results = await async_send_cmds(
+        cache.supported_cmds(platform, "json", show_cmds), conn, "json", dut, lazy_json
+    )
+
+    logging.debug(f"Returned from async_send_cmds_json {json_results[1]}")
+    record_failed_cmds(dut, "json", show_cmds, json_results[1])
+
+    if lazy_text:
+        add_dut_output(dut, show_cmds, json_results, output_fields=output_fields)
+        cache_rejected_cmds(dut, platform)
+        return
+
+    txt_results = await async_send_cmds(
+        cache.supported_cmds(platform, "text", show_cmds), conn, "text", dut
+    )
+
+    logging.debug(f"Returned from async_send_cmds_txt {txt_results[1]}")
+    record_failed_cmds(dut, "text", show_cmds, txt_results[1])
+    cache_rejected_cmds(dut, platform)
+
+    add_dut_output(dut, show_cmds, json_results, txt_results, output_fields)
+
+
+async def async_send_cmds(show_cmds, conn, encoding, dut, raw_json=False):
+    """Send show commands to duts over an async connection and isolate failing
+    commands by splitting the batch in halves on failure
+
+    Args:
+        show_cmds (list): List of pre-processed commands
+        conn (obj): async connection
+        encoding (string): encoding type of show commands: either json or text
+        dut (dict): dut the requests are paced for by the request scheduler
+        raw_json (bool, optional): return json outputs undecoded, see raw_json_cmds
+
+    Returns:
+        show_cmd_list (list): list of show command outputs
+        show_cmds (list): list of show commands that produced the outputs
+    """
+    if not show_cmds:
+        return [], []
+
+    try:
+        logging.debug(f"List of show commands in show_cmds with encoding {encoding}: {show_cmds}")
+
+        async with get_scheduler().async_slot(dut):
+            if encoding == "json" and raw_json:
+                show_cmd_list = raw_json_outputs(
+                    await conn.run_commands(raw_json_cmds(show_cmds), encoding="text"), show_cmds
+                )
+            else:
+                show_cmd_list = await conn.run_commands(show_cmds, encoding=encoding)
+
+        logging.debug(f"Ran all show cmds with encoding {encoding}: {show_cmds}")
+
+    # pylint: disable-next=broad-exception-caught
+    except Exception as err:
+        logging.error(f"Error running all cmds: {err}")
+
+        if not split_failed_batch(err, show_cmds, encoding, dut):
+            return [], []
+
+        middle = len(show_cmds) // 2
+        (first_list, first_cmds), (second_list, second_cmds) = await asyncio.gather(
+            async_send_cmds(show_cmds[:middle], conn, encoding, dut, raw_json),
+            async_send_cmds(show_cmds[middle:], conn, encoding, dut, raw_json),
+        )
+
+        show_cmd_list = list(first_list) + list(second_list)
+        show_cmds = first_cmds + second_cmds
+
+    return show_cmd_list, show_cmds
+
+
+class TopologyIndex:
+    """Name keyed topology of the duts file: the neighbors of each dut and,
+    for each of its local interfaces, the remote dut and port"""
+
+    def __init__(self, test_duts):
+        """Index the neighbors of the duts
+
+        Args:
+            test_duts (dict): duts file data, with the neighbors of each dut
+        """
+        self.neighbors = {}
+        self.links = {}
+
+        for dut in test_duts.get("duts", []):
+            neighbors = self.neighbors.setdefault(dut["name"], [])
+            links = self.links.setdefault(dut["name"], {})
+
+            for neighbor in dut.get("neighbors") or []:
+                neighbors.append(neighbor)
+                links[neighbor["port"]] = {
+                    "z_hostname": neighbor["neighborDevice"],
+                    "z_interface_name": neighbor["neighborPort"],
+                }
+
+    def neighbor(self, hostname, interface_name):
+        """Return the remote end of a local interface
+
+        Args:
+            hostname (str): name of the dut
+            interface_name (str): local interface of the dut
+
+        Returns:
+            link (dict): z_hostname and z_interface_name, None when the
+            interface has no neighbor
+        """
+        return self.links.get(hostname, {}).get(interface_name)
+
+
+_topology_index = {"duts": None, "size": 0, "index": None}
+
+
+def index_topology(test_duts):
+    """Return the topology index of the duts file data, built the first time
+    interfaces are looked up and again only when the duts change
+
+    Args:
+        test_duts (dict): duts file data
+
+    Returns:
+        index (TopologyIndex): topology of test_duts
+    """
+    duts = test_duts.get("duts", [])
+
+    if _topology_index["duts"] is not duts or _topology_index["size"] != len(duts):
+        _topology_index.update(duts=duts, size=len(duts), index=TopologyIndex(test_duts))
+
+    return _topology_index["index"]
+
+
 def return_interfaces(hostname, test_parameters):
     """Parse test_parameters for interface connections and return them to test
 
@@ -440,27 +1173,22 @@ def return_interfaces(hostname, test_parameters):
     logging.info("Parse test_parameters for interface connections and return them to test")
 
     interface_list = []
-    duts = test_parameters["duts"]
-
-    for dut in duts:
-        dut_name = dut["name"]
-
-        if dut_name == hostname:
-            logging.info(f"Discovering interface parameters for: {hostname}")
+    topology = index_topology(test_parameters)
 
-            neighbors = dut["neighbors"]
+    if hostname in topology.neighbors:
+        logging.info(f"Discovering interface parameters for: {hostname}")
 
-            for neighbor in neighbors:
-                interface = {}
+        for neighbor in topology.neighbors[hostname]:
+            interface = {}
 
-                logging.debug(f"Adding interface parameters: {neighbor} neighbor for: {dut_name}")
+            logging.debug(f"Adding interface parameters: {neighbor} neighbor for: {hostname}")
 
-                interface["hostname"] = dut_name
-                interface["interface_name"] = neighbor["port"]
-                interface["z_hostname"] = neighbor["neighborDevice"]
-                interface["z_interface_name"] = neighbor["neighborPort"]
-                interface["media_type"] = ""
-                interface_list.append(interface)
+            interface["hostname"] = hostname
+            interface["interface_name"] = neighbor["port"]
+            interface["z_hostname"] = neighbor["neighborDevice"]
+            interface["z_interface_name"] = neighbor["neighborPort"]
+            interface["media_type"] = ""
+            interface_list.append(interface)
 
     logging.info("Returning interface list.")
     logging.debug(f"Returning interface list: {interface_list}")
@@ -479,7 +1207,7 @@ def get_parameters(tests_parameters, test_suite, test_case=""):
         case_parameters: test parameters for a test case
     """
     if not test_case:
-        test_case = inspect.stack()[1][3]
+        test_case = caller_name()
 
         logging.info(f"Setting testcase name to {test_case}")
 
@@ -489,23 +1217,20 @@ def get_parameters(tests_parameters, test_suite, test_case=""):
 
     logging.info(f"Return testcases for Test Suite: {test_suite}")
 
-    suite_parameters = [
-        param for param in tests_parameters["test_suites"] if param["name"] == test_suite
-    ]
+    test_defs_index = index_test_defs(tests_parameters)
+    suite_parameters = test_defs_index.suite(test_suite)
 
     logging.debug(f"Suite_parameters: {suite_parameters}")
 
     logging.info(f"Return parameters for Test Case: {test_case}")
 
-    case_parameters = [
-        param for param in suite_parameters[0]["testcases"] if param["name"] == test_case
-    ]
+    case_parameters = test_defs_index.testcase(test_suite, test_case)
 
-    logging.debug(f"Case_parameters: {case_parameters[0]}")
+    logging.debug(f"Case_parameters: {case_parameters}")
 
-    case_parameters[0]["test_suite"] = test_suite
+    case_parameters["test_suite"] = test_suite
 
-    return case_parameters[0]
+    return case_parameters
 
 
 def verify_show_cmd(show_cmd, dut):
@@ -636,6 +1361,328 @@ def return_show_cmds(test_parameters):
     return show_cmds
 
 
+def return_output_fields(test_parameters):
+    """Return the paths of the json output the test cases read per show command.
+    A show command is only pruned when every test case that runs it lists
+    its output_fields, as a list of paths or as paths per show command
+
+    Args:
+        test_parameters (dict): Abstraction of testing parameters
+
+    Returns:
+        output_fields (dict): union of the paths to keep per show command
+    """
+    output_fields = {}
+    full_cmds = set()
+
+    for test_suite in test_parameters["test_suites"]:
+        for test_case in test_suite.get("testcases", []):
+            if test_case.get("show_cmd"):
+                show_cmds = [test_case["show_cmd"]]
+            else:
+                show_cmds = test_case.get("show_cmds", [])
+
+            fields = test_case.get("output_fields")
+
+            for show_cmd in show_cmds:
+                cmd_fields = fields.get(show_cmd) if isinstance(fields, dict) else fields
+                if cmd_fields:
+                    output_fields.setdefault(show_cmd, set()).update(cmd_fields)
+                else:
+                    full_cmds.add(show_cmd)
+
+    for show_cmd, fields in BASE_OUTPUT_FIELDS.items():
+        if show_cmd in output_fields:
+            output_fields[show_cmd].update(fields)
+
+    output_fields = {
+        show_cmd: sorted(fields)
+        for show_cmd, fields in output_fields.items()
+        if show_cmd not in full_cmds
+    }
+
+    logging.info(f"Pruning json output of show commands to fields: {output_fields}")
+
+    return output_fields
+
+
+def return_collection_plan(show_cmds, test_defs, test_parameters, test_duts):
+    """Return the show commands to collect, either one list for every dut or,
+    with the per_dut collection plan, the commands each dut needs
+
+    Args:
+        show_cmds (list): show commands from the test_definitions
+        test_defs (dict): test definitions
+        test_parameters (dict): Abstraction of testing parameters
+        test_duts (dict): Dictionary of duts
+
+    Returns:
+        show_cmds (list or dict): show commands or show commands per dut name
+    """
+    collection_plan = test_parameters["parameters"].get("collection_plan", DEFAULT_COLLECTION_PLAN)
+
+    if collection_plan == "global":
+        return show_cmds
+    if collection_plan != "per_dut":
+        raise ValueError(f"Invalid collection plan {collection_plan} specified")
+
+    return return_dut_show_cmds(test_defs, test_parameters, test_duts)
+
+
+def return_dut_show_cmds(test_defs, test_parameters, test_duts):
+    """Return the show commands of the test cases that select each dut.  A test
+    case selects a dut when its criteria and filter match the dut and it is not
+    deselected by the test_cases (-k) and mark (-m) parameters.
+
+    Args:
+        test_defs (dict): test definitions
+        test_parameters (dict): Abstraction of testing parameters
+        test_duts (dict): Dictionary of duts
+
+    Returns:
+        dut_show_cmds (dict): show commands per dut name
+    """
+    parameters = test_parameters["parameters"]
+    duts = test_duts["duts"]
+    test_cases = parameters.get("test_cases")
+    keyword_expression = compile_test_filter("" if test_cases == "All" else test_cases)
+    mark_expression = compile_test_filter(parameters.get("mark"))
+
+    base_cmds = ["show version"]
+    if parameters.get("show_clock", False):
+        base_cmds.append("show clock")
+
+    dut_show_cmds = {dut["name"]: base_cmds.copy() for dut in duts}
+
+    for test_suite in test_defs["test_suites"]:
+        test_file = f"{test_suite.get('dir_path', '.')}/{test_suite['name']}"
+        test_functions = return_test_functions(test_file)
+
+        for testcase in test_suite["testcases"]:
+            show_cmds = (
+                [testcase["show_cmd"]] if testcase.get("show_cmd") else testcase.get("show_cmds")
+            )
+            if not show_cmds:
+                continue
+
+            _, dut_names = filter_duts(
+                duts, testcase.get("criteria", ""), testcase.get("filter", "")
+            )
+            if "name" not in testcase:
+                dut_names = list(dut_show_cmds)
+
+            test_function = test_functions.get(testcase.get("name"))
+
+            for dut_name in dut_names:
+                if not testcase_selected(
+                    test_function, test_file, dut_name, keyword_expression, mark_expression
+                ):
+                    continue
+
+                dut_show_cmds[dut_name] += [
+                    show_cmd for show_cmd in show_cmds if show_cmd not in dut_show_cmds[dut_name]
+                ]
+
+    for dut_name, show_cmds in dut_show_cmds.items():
+        logging.info(f"The following show commands are required on {dut_name}: {show_cmds}")
+
+    return dut_show_cmds
+
+
+def compile_test_filter(test_filter):
+    """Compile a pytest -k or -m expression
+
+    Args:
+        test_filter (str): pytest expression
+
+    Returns:
+        expression (Expression): compiled expression, None when the filter is
+        empty or not a valid expression
+    """
+    if not test_filter:
+        return None
+
+    try:
+        return Expression.compile(str(test_filter))
+    except ParseError as err:
+        logging.warning(f"Collecting for every test, could not parse filter {test_filter}: {err}")
+        return None
+
+
+def return_test_functions(test_file):
+    """Return the test functions of a test suite with their class and marks
+
+    Args:
+        test_file (str): Test suite path and file name
+
+    Returns:
+        test_functions (dict): class name and marks per test function name, empty
+        when the test suite can not be parsed
+    """
+    try:
+        with open(test_file, "r", encoding="utf-8") as test_input:
+            tree = ast.parse(test_input.read(), filename=test_file)
+    except (OSError, SyntaxError) as err:
+        logging.warning(f"Could not parse test suite {test_file}: {err}")
+        return {}
+
+    def node_marks(node):
+        marks = set()
+        decorators = getattr(node, "decorator_list", [])
+
+        for statement in getattr(node, "body", []):
+            if isinstance(statement, ast.Assign) and any(
+                getattr(target, "id", "") == "pytestmark" for target in statement.targets
+            ):
+                value = statement.value
+                decorators = decorators + (
+                    value.elts if isinstance(value, (ast.List, ast.Tuple)) else [value]
+                )
+
+        for decorator in decorators:
+            if isinstance(decorator, ast.Call):
+                decorator = decorator.func
+            if (
+                isinstance(decorator, ast.Attribute)
+                and isinstance(decorator.value, ast.Attribute)
+                and decorator.value.attr == "mark"
+            ):
+                marks.add(decorator.attr)
+
+        return marks
+
+    module_marks = node_marks(tree)
+    test_functions = {}
+
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            class_marks = module_marks | node_marks(node)
+            functions = [(node.name, class_marks, function) for function in node.body]
+        else:
+            functions = [(None, module_marks, node)]
+
+        for class_name, marks, function in functions:
+            if isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                test_functions[function.name] = {
+                    "name": function.name,
+                    "class": class_name,
+                    "marks": marks | node_marks(function),
+                }
+
+    return test_functions
+
+
+def testcase_selected(test_function, test_file, dut_name, keyword_expression, mark_expression):
+    """Check whether the -k and -m expressions select a test case on a dut.
+    Test cases that can not be found in their test suite are always selected.
+
+    Args:
+        test_function (dict): class name and marks of the test function
+        test_file (str): Test suite path and file name
+        dut_name (str): name of the dut the test case is parametrized with
+        keyword_expression (Expression): compiled -k expression
+        mark_expression (Expression): compiled -m expression
+
+    Returns:
+        selected (bool): True when the test case runs on the dut
+    """
+    if test_function is None:
+        return True
+
+    marks = test_function["marks"]
+
+    if mark_expression and not mark_expression.evaluate(lambda name, **kwargs: name in marks):
+        return False
+
+    if keyword_expression:
+        keywords = [
+            f"{test_function['name']}[{dut_name}]",
+            test_function["class"] or "",
+            *test_file.split("/"),
+            *marks,
+        ]
+
+        def keyword_matcher(subname, **kwargs):
+            return any(subname.lower() in keyword.lower() for keyword in keywords)
+
+        if not keyword_expression.evaluate(keyword_matcher):
+            return False
+
+    return True
+
+
+class TestDefsIndex:
+    """Name keyed lookups into test definitions, so fixtures and TestOps do not
+    scan every test suite and test case on each test"""
+
+    def __init__(self, test_defs):
+        """Index the test suites and test cases of test definitions
+
+        Args:
+            test_defs (dict): test definitions
+        """
+        self.suites = {}
+        self.testcases = {}
+        self.setup_files = {}
+
+        for suite in test_defs.get("test_suites", []):
+            self.suites.setdefault(suite["name"], suite)
+
+            for testcase in suite.get("testcases", []):
+                if "name" not in testcase:
+                    continue
+                self.testcases.setdefault((suite["name"], testcase["name"]), testcase)
+                if testcase.get("test_setup", ""):
+                    self.setup_files.setdefault(
+                        testcase["name"], f"{suite['dir_path']}/{testcase['test_setup']}"
+                    )
+
+    def suite(self, test_suite):
+        """Return the definition of a test suite
+
+        Args:
+            test_suite (str): test suite file name, or its path
+        """
+        return self.suites[test_suite.split("/")[-1]]
+
+    def testcase(self, test_suite, test_case):
+        """Return the definition of a test case
+
+        Args:
+            test_suite (str): test suite file name, or its path
+            test_case (str): name of the test case
+        """
+        return self.testcases[(test_suite.split("/")[-1], test_case)]
+
+    def setup_file(self, test_case):
+        """Return the setup file path of a test case, None without one
+
+        Args:
+            test_case (str): name of the test case
+        """
+        return self.setup_files.get(test_case)
+
+
+_test_defs_index = {"test_defs": None, "index": None}
+
+
+def index_test_defs(test_defs):
+    """Return the index of test definitions, built the first time the test
+    definitions are looked up
+
+    Args:
+        test_defs (dict): test definitions
+
+    Returns:
+        index (TestDefsIndex): index of test_defs
+    """
+    if _test_defs_index["test_defs"] is not test_defs:
+        _test_defs_index["index"] = TestDefsIndex(test_defs)
+        _test_defs_index["test_defs"] = test_defs
+
+    return _test_defs_index["index"]
+
+
 def return_test_defs(test_parameters):
     """Return test_definitions from the test_parameters
 
@@ -665,6 +1712,7 @@ def return_test_defs(test_parameters):
     logging.info(f"Creating {report_dir} reports directory")
     os.makedirs(report_dir, exist_ok=True)
     export_yaml(report_dir + "/" + test_definitions_file, test_defs)
+    index_test_defs(test_defs)
 
     logging.debug(f"Return the following test definitions data structure {test_defs}")
 
@@ -929,20 +1977,80 @@ def create_duts_file(topology_file, inventory_file):
     return None
 
 
+class TestParameters(MutableMapping):
+    """Copy-on-write view of the parameters of a test case.  Values are read
+    from the test case definition, shared by every TestOps of the test case,
+    until they are set.  Lists and dicts are copied on first read, so changes
+    to them stay in the view too."""
+
+    def __init__(self, template):
+        """Initializes the view
+
+        Args:
+            template (dict): test case definition, never modified
+        """
+        self._template = template
+        self._overlay = {}
+        self._deleted = set()
+
+    def __getitem__(self, key):
+        if key in self._overlay:
+            return self._overlay[key]
+        if key in self._deleted:
+            raise KeyError(key)
+
+        value = self._template[key]
+        if isinstance(value, (dict, list, set)):
+            value = self._overlay[key] = copy.deepcopy(value)
+
+        return value
+
+    def __setitem__(self, key, value):
+        self._overlay[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overlay.pop(key, None)
+        if key in self._template:
+            self._deleted.add(key)
+
+    def __contains__(self, key):
+        if key in self._overlay:
+            return True
+        return key in self._template and key not in self._deleted
+
+    def __iter__(self):
+        for key in self._template:
+            if key not in self._deleted:
+                yield key
+        for key in self._overlay:
+            if key not in self._template:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 # pylint: disable-next=too-many-instance-attributes
 class TestOps:
     """Common testcase operations and variables"""
 
-    def __init__(self, tests_definitions, test_suite, dut):
+    def __init__(self, tests_definitions, test_suite, dut, test_case=None):
         """Initializes TestOps Object
 
         Args:
             tests_definition (str): YAML representation of NRFU tests
             test_suite (str): name of test suite
             dut (dict): device under test
+            test_case (str, optional): name of the test case, defaults to the
+                name of the calling function
         """
-        test_case = inspect.stack()[1][3]
-        self.test_case = test_case
+        self.test_case = test_case or caller_name()
         self.test_parameters = self._get_parameters(tests_definitions, test_suite, self.test_case)
         self.expected_output = self.test_parameters["expected_output"]
         self.dut = dut
@@ -985,6 +2093,8 @@ class TestOps:
 
         if len(self._show_cmds[self.dut_name]) > 0 and self.dut:
             self._verify_show_cmd(self._show_cmds[self.dut_name], self.dut)
+            # fetch lazily collected text output in a single request
+            fetch_text(self.dut, self._show_cmds[self.dut_name])
             if self.show_cmd:
                 self.show_cmd_txt = self.dut["output"][self.show_cmd]["text"]
             for show_cmd in self.show_cmds[self.dut_name]:
@@ -1034,7 +2144,7 @@ class TestOps:
 
         logging.debug(f"Creating results file named {yaml_file}")
 
-        yaml_data = self.test_parameters
+        yaml_data = dict(self.test_parameters)
         export_yaml(yaml_file, yaml_data)
 
     def _write_text_results(self):
@@ -1081,7 +2191,7 @@ class TestOps:
             case_parameters: test parameters for a test case
         """
         if not test_case:
-            test_case = inspect.stack()[1][3]
+            test_case = caller_name()
 
             logging.info(f"Setting testcase name to {test_case}")
 
@@ -1091,27 +2201,22 @@ class TestOps:
 
         logging.debug(f"Return testcases for Test Suite: {test_suite}")
 
-        suite_parameters = [
-            copy.deepcopy(param)
-            for param in tests_parameters["test_suites"]
-            if param["name"] == test_suite
-        ]
+        test_defs_index = index_test_defs(tests_parameters)
+        suite_parameters = test_defs_index.suite(test_suite)
 
         logging.debug(f"Suite_parameters: {suite_parameters}")
 
         logging.info(f"Returning parameters for Test Case: {test_case}")
 
-        case_parameters = [
-            copy.deepcopy(param)
-            for param in suite_parameters[0]["testcases"]
-            if param["name"] == test_case
-        ]
+        testcase = test_defs_index.testcase(test_suite, test_case)
+
+        logging.debug(f"Case_parameters: {testcase}")
 
-        logging.debug(f"Case_parameters: {case_parameters[0]}")
+        case_parameters = TestParameters(testcase)
 
-        case_parameters[0]["test_suite"] = test_suite
+        case_parameters["test_suite"] = test_suite
 
-        return case_parameters[0]
+        return case_parameters
 
     def generate_report(self, dut_name, output):
         """Utility to generate report
@@ -1199,27 +2304,8 @@ class TestOps:
             func (obj): function reference with body to inspect for test steps
         """
 
-        # Extracting lines from the function
-        comments = []
-        lines, _ = inspect.getsourcelines(func)
-
-        # converting list of strings into a single string
-        content = " ".join([str(elem) for elem in lines])
-
-        # Pattern to match to extract TS
-        pattern = re.compile('(TS:.*?)(?:"""|Args:)', re.DOTALL)
-
-        # Find all matches to pattern
-        comments = pattern.findall(content)
-
-        # Format each item in list
-        comments = [x.strip() for x in comments]
-        if not comments:
-            comments.append("N/a no Test Steps found")
-
-        for step in comments:
-            # Add Test steps to list to be added to file
-            self.test_steps.append(step.lstrip("TS:"))
+        # Test steps are parsed once per function, see test_step_client.function_docs
+        self.test_steps.extend(test_step_client.function_docs(func)["steps"])
 
         logging.info(f"These are test steps {self.test_steps}")
 
@@ -1232,7 +2318,51 @@ class TestOps:
         self.show_cmd_txts.setdefault(dut_name, [])
 
     def get_new_conn(self, dut, conn_type, timeout):
-        """get new conn returns a new connection to dut of type 'conn_type'
+        """get new conn returns a connection to dut of type 'conn_type'
+        with read timeout set to timeout.  Connections are checked out of the
+        connection pool, and reused across test cases while they are alive.
+        Hand the connection back with release_conn once it is no longer used.
+        Args: dut: the device to get the connection to
+        conn_type: eapi or ssh
+        timeout: Read time out for the connection
+
+        Returns an eapi or ssh connection to dut
+        """
+        if conn_type not in ("eapi", "ssh"):
+            raise ValueError(f"conn_type [{conn_type}] not supported")
+
+        return get_connection_pool().checkout(
+            self.pool_key(dut, conn_type, timeout),
+            lambda: self._create_conn(dut, conn_type, timeout),
+        )
+
+    def release_conn(self, dut, conn_type, timeout, conn, reuse=True):
+        """release conn hands a connection returned by get_new_conn back to
+        the connection pool
+        Args: dut: the device the connection is to
+        conn_type: eapi or ssh
+        timeout: Read time out for the connection
+        conn: the connection
+        reuse: False closes the connection instead, e.g. after it was altered
+        """
+        if reuse:
+            get_connection_pool().release(self.pool_key(dut, conn_type, timeout), conn)
+        else:
+            get_connection_pool().discard(self.pool_key(dut, conn_type, timeout), conn)
+
+    @staticmethod
+    def pool_key(dut, conn_type, timeout):
+        """pool key returns the connection pool key of a connection to dut
+        Args: dut: the device the connection is to
+        conn_type: eapi or ssh
+        timeout: Read time out for the connection
+
+        Returns the connection pool key
+        """
+        return (dut["name"], conn_type, timeout, dut.get("session_log"))
+
+    def _create_conn(self, dut, conn_type, timeout):
+        """create conn returns a new connection to dut of type 'conn_type'
         with read timeout set to timeout
         Args: dut: the device to get the connection to
         conn_type: eapi or ssh
@@ -1250,6 +2380,10 @@ class TestOps:
         device_data["name"] = dut["name"]
         if dut.get("session_log"):
             device_data["session_log"] = dut["session_log"]
+        if dut.get("eapi_gzip"):
+            device_data["eapi_gzip"] = dut["eapi_gzip"]
+        if dut.get("ssh_batch_cmds"):
+            device_data["ssh_batch_cmds"] = dut["ssh_batch_cmds"]
         if conn_type == "eapi":
             logging.info(f"Creating new eapi connection to {dut['name']}")
             pyeapi_conn = device_interface.PyeapiConn()
@@ -1376,9 +2510,28 @@ class TestOps:
                 raise ValueError(f"conn_type [{conn_type}] not supported")
         elif timeout > 0 or new_conn:
             # if timeout is non-zero or user wants a new connection
-            # get the new connection
+            # check a connection out of the pool for these cmds only
             conn = self.get_new_conn(dut, conn_type, timeout)
+            try:
+                output = self._record_cmds(
+                    conn, cmds, conn_type, encoding, cmd_type, dut, hidden_cmd
+                )
+            except BaseException:
+                # a timed out or broken connection may still hold unread output
+                self.release_conn(dut, conn_type, timeout, conn, reuse=False)
+                raise
+            self.release_conn(dut, conn_type, timeout, conn)
+            return output
+
+        return self._record_cmds(conn, cmds, conn_type, encoding, cmd_type, dut, hidden_cmd)
 
+    # pylint: disable-next=too-many-arguments
+    def _record_cmds(self, conn, cmds, conn_type, encoding, cmd_type, dut, hidden_cmd):
+        """_record_cmds runs both config and show cmds over conn and records
+        the output of these commands, see _run_and_record_cmds
+
+        Returns: A dict object that includes the response for each command
+        """
         dut_name = dut["name"]
 
         # initializing evidence values for other duts since
@@ -1391,7 +2544,8 @@ class TestOps:
             show_clock_cmds = ["show clock"]
             # run the show_clock_cmds
             try:
-                show_clock_op = conn.enable(show_clock_cmds, "text")
+                with request_slot(dut):
+                    show_clock_op = conn.enable(show_clock_cmds, "text")
             except BaseException as e:
                 # add the show clock cmd to _show_cmds evidence list
                 for cmd in show_clock_cmds:
@@ -1415,13 +2569,15 @@ class TestOps:
                 if hidden_cmd:
                     run_cmds = render_cmds(dut, cmds)
                 # if encoding is json run the commands, store the results
-                if encoding == "json":
-                    json_results = conn.enable(run_cmds)
-                # also run the commands in text mode
-                txt_results = conn.enable(run_cmds, encoding="text")
+                with request_slot(dut):
+                    if encoding == "json":
+                        json_results = conn.enable(run_cmds)
+                    # also run the commands in text mode
+                    txt_results = conn.enable(run_cmds, encoding="text")
             else:
                 # run the config cmd
-                txt_results = conn.config(cmds)
+                with request_slot(dut):
+                    txt_results = conn.config(cmds)
         except BaseException as e:  # pylint: disable=broad-except
             logging.error(f"Following cmds {cmds} generated exception {str(e)}")
             # add the cmds to _show_cmds cmds list
@@ -1475,58 +2631,69 @@ class TestOps:
             raise ValueError(f"operation [{operation}] not supported")
 
         new_dut = dut.copy()
-        session_log = (
-            f"netmiko-logs/file_transfer_{new_dut['name']}-{time.strftime('%Y%m%d-%H%M%S')}.log"
-        )
+        session_log = os.path.join(NETMIKO_LOG_DIRECTORY, f"file_transfer_{new_dut['name']}.log")
         new_dut["session_log"] = session_log
         conn = self.get_new_conn(new_dut, conn_type="ssh", timeout=60)
-
-        # first run show clock if flag is set
-        if self.show_clock_flag:
-            show_clock_cmds = ["show clock"]
-            # run the show_clock_cmds
+        # sftp replaces the ssh channel of the connection, so it can not be reused
+        reuse_conn = not sftp
+        try:
+            # the pooled connection keeps appending to the session log, so only
+            # the part written by this transfer is evidence
             try:
-                show_clock_op = conn.enable(show_clock_cmds, "text")
-            except BaseException as e:
-                # add the show clock cmd to _show_cmds
-                for cmd in show_clock_cmds:
-                    self._show_cmds[dut_name].append(cmd)
-                    # add the exception result to _show_cmds_txts
-                    self._show_cmd_txts[dut_name].append(str(e))
-                raise e
+                log_offset = os.path.getsize(session_log)
+            except OSError:
+                log_offset = 0
+
+            # first run show clock if flag is set
+            if self.show_clock_flag:
+                show_clock_cmds = ["show clock"]
+                # run the show_clock_cmds
+                try:
+                    with request_slot(dut):
+                        show_clock_op = conn.enable(show_clock_cmds, "text")
+                except BaseException as e:
+                    # add the show clock cmd to _show_cmds
+                    for cmd in show_clock_cmds:
+                        self._show_cmds[dut_name].append(cmd)
+                        # add the exception result to _show_cmds_txts
+                        self._show_cmd_txts[dut_name].append(str(e))
+                    raise e
 
-            # add the show_clock_cmds to internal cmds list
-            # also add the o/p of show_clock_cmds to external cmd output list
-            for result_dict in show_clock_op:
-                self._show_cmds[dut_name].append(result_dict["command"])
-                self._show_cmd_txts[dut_name].append(result_dict["result"]["output"])
+                # add the show_clock_cmds to internal cmds list
+                # also add the o/p of show_clock_cmds to external cmd output list
+                for result_dict in show_clock_op:
+                    self._show_cmds[dut_name].append(result_dict["command"])
+                    self._show_cmd_txts[dut_name].append(result_dict["result"]["output"])
 
-        if sftp:
-            cmd_str = "sftp"
-        else:
-            cmd_str = "scp"
+            if sftp:
+                cmd_str = "sftp"
+            else:
+                cmd_str = "scp"
 
-        # form request for evidence gathering
-        transfer_request = f"{cmd_str} src_file: {src_file} dest_file: {dest_file} op: {operation}"
+            # form request for evidence gathering
+            transfer_request = (
+                f"{cmd_str} src_file: {src_file} dest_file: {dest_file} op: {operation}"
+            )
 
-        # transfer file
-        try:
-            result = conn.transfer_file(src_file, dest_file, file_system, operation, sftp)
-        except BaseException as e:
-            self._show_cmds[new_dut["name"]].append(transfer_request)
-            self._show_cmd_txts[new_dut["name"]].append(str(e))
-            raise e
+            # transfer file
+            try:
+                with request_slot(dut):
+                    result = conn.transfer_file(src_file, dest_file, file_system, operation, sftp)
+            except BaseException as e:
+                self._show_cmds[new_dut["name"]].append(transfer_request)
+                self._show_cmd_txts[new_dut["name"]].append(str(e))
+                reuse_conn = False
+                raise e
+        finally:
+            self.release_conn(new_dut, "ssh", 60, conn, reuse=reuse_conn)
 
         self._show_cmds[new_dut["name"]].append(transfer_request)
-        # open session log and copy over the evidence
+        # open session log and copy over the evidence of this transfer
         # hide the username from the evidence collection
         with open(session_log, "r", encoding="utf-8") as file:
+            file.seek(log_offset)
             self._show_cmd_txts[new_dut["name"]].append(
                 file.read().replace(new_dut["username"], "XXXXX")
             )
 
-        try:
-            os.remove(session_log)
-        except OSError:
-            pass
         return result
@@ -33,11 +33,92 @@ Collection of misc functions that dont fit anywhere else but are still required.
 """
 
 import sys
+import json
 import collections
 import datetime
 from jinja2 import Template
 
 
+class RawJson(str):
+    """JSON output of a show command kept undecoded until it is first read"""
+
+    # paths the decoded output is pruned to, see prune_output
+    output_fields = None
+
+    def decode(self):
+        """Return the decoded JSON output"""
+        output = json.loads(self)
+
+        if self.output_fields:
+            output = prune_output(output, self.output_fields)
+
+        return output
+
+
+def prune_output(output, paths):
+    """Prune the JSON output of a show command down to paths.
+
+    A path is a dot separated list of keys, e.g. 'interfaces.*.lineProtocolStatus',
+    where '*' matches every key of a dictionary.  Lists are pruned item by item.
+
+    Args:
+        output (dict): JSON output of a show command
+        paths (list): paths to keep
+
+    Returns:
+        output (dict): pruned output
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        for key in path.split("."):
+            node = node.setdefault(key, {})
+        # an empty node keeps everything below it
+        node.clear()
+        node[None] = True
+
+    return _prune_node(output, tree)
+
+
+def _prune_node(value, tree):
+    """Prune value down to the keys of a tree of paths built by prune_output"""
+
+    if None in tree:
+        return value
+
+    if isinstance(value, list):
+        return [_prune_node(item, tree) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    pruned = {}
+    for key, item in value.items():
+        subtrees = [tree[name] for name in (key, "*") if name in tree]
+        if not subtrees:
+            continue
+
+        subtree = subtrees[0]
+        if len(subtrees) > 1:
+            subtree = _merge_trees(*subtrees)
+        pruned[key] = _prune_node(item, subtree)
+
+    return pruned
+
+
+def _merge_trees(first, second):
+    """Merge two trees of paths built by prune_output"""
+
+    if None in first or None in second:
+        return {None: True}
+
+    merged = dict(first)
+    for key, subtree in second.items():
+        merged[key] = _merge_trees(merged[key], subtree) if key in merged else subtree
+
+    return merged
+
+
 def make_iterable(value):
     """Converts the supplied value to a list object
     This function will inspect the supplied value and return an
@@ -89,6 +170,17 @@ def get_current_fixture_testname(request):
     return test_name.split("[")[0]
 
 
+def caller_name():
+    """
+    Method to get the name of the function calling the function which
+    calls caller_name.  Only the calling frame is looked up, unlike
+    inspect.stack() which builds a record, with source lines, of every frame.
+    Returns: Name of the calling function
+    """
+
+    return sys._getframe(2).f_code.co_name  # pylint: disable=protected-access
+
+
 def remove_comments(input_string):
     """
     Method to remove a line that starts with #
@@ -48,6 +48,8 @@ from vane import test_step_client
 import vane.config
 from vane.vane_logging import logging
 from vane import nrfu_client
+from vane import snapshot
+from vane import shard_client
 import app
 
 
@@ -122,6 +124,28 @@ def parse_cli():
         action="store_true",
     )
 
+    parser.add_argument(
+        "--shards",
+        help="Split the duts into this many shards, run them and merge their results",
+        type=int,
+    )
+
+    parser.add_argument(
+        "--shard-launcher",
+        help=(
+            "local runs the shards as subprocesses, file waits for other hosts to run"
+            " vane --run-shard on the shard directories"
+        ),
+        choices=["local", "file"],
+        default="local",
+    )
+
+    parser.add_argument(
+        "--run-shard",
+        help="Run the shard written by a coordinator in this directory",
+        metavar=("shard_dir"),
+    )
+
     args = parser.parse_args()
 
     return args
@@ -138,12 +162,28 @@ def setup_vane():
 
     vane.config.test_defs = tests_tools.return_test_defs(vane.config.test_parameters)
     show_cmds = tests_tools.return_show_cmds(vane.config.test_defs)
+    show_cmds = tests_tools.return_collection_plan(
+        show_cmds, vane.config.test_defs, vane.config.test_parameters, vane.config.test_duts
+    )
+    output_fields = tests_tools.return_output_fields(vane.config.test_defs)
     vane.config.dut_objs = tests_tools.init_duts(
-        show_cmds, vane.config.test_parameters, vane.config.test_duts
+        show_cmds, vane.config.test_parameters, vane.config.test_duts, output_fields
     )
 
     logging.debug(f"Return to test suites: \nduts: {vane.config.dut_objs}")
 
+    parameters = vane.config.test_parameters["parameters"]
+    if parameters.get("processes"):
+        # pytest-xdist workers start with an empty vane.config
+        snapshot_file = snapshot.write_snapshot(
+            vane.config.dut_objs,
+            vane.config.test_defs,
+            vane.config.test_parameters,
+            vane.config.DUTS_FILE,
+        )
+        os.environ[snapshot.SNAPSHOT_ENV] = snapshot_file
+        snapshot.create_dut_phase_dir()
+
 
 def run_tests(definitions_file, duts_file):
     """Make request to test client to run tests
@@ -157,8 +197,52 @@ def run_tests(definitions_file, duts_file):
     vane_tests_client = tests_client.TestsClient(definitions_file, duts_file)
     vane_tests_client.generate_test_definitions()
     vane_tests_client.setup_test_runner()
-    setup_vane()
-    vane_tests_client.test_runner()
+    try:
+        setup_vane()
+        vane_tests_client.test_runner()
+    finally:
+        snapshot.remove_snapshot()
+        snapshot.remove_dut_phase_dir()
+
+
+def run_shard(shard_dir):
+    """Run the tests of one shard and leave its done file for the coordinator
+
+    Args:
+        shard_dir (str): Shard directory written by a coordinator
+    """
+    logging.info(f"Running shard {shard_dir}")
+
+    definitions_file, shard_duts_file = shard_client.shard_files(shard_dir)
+    duts_file = shard_client.write_shard_duts(shard_duts_file)
+    vane.config.DEFINITIONS_FILE = definitions_file
+    vane.config.DUTS_FILE = duts_file
+    exit_code = 1
+
+    try:
+        run_tests(definitions_file, duts_file)
+        exit_code = 0
+    except SystemExit as err:
+        exit_code = err.code
+        raise
+    finally:
+        os.remove(duts_file)
+        shard_client.mark_shard_done(shard_dir, exit_code)
+
+
+def run_shards(definitions_file, duts_file, shards, launcher):
+    """Split the duts into shards, run them and merge their results
+
+    Args:
+        definitions_file (str): Path and name of definition file
+        duts_file (str): Path and name of duts file
+        shards (int): Number of shards
+        launcher (str): local or file
+    """
+    logging.info(f"Using class ShardClient to run {shards} shards with the {launcher} launcher")
+
+    vane_shard_client = shard_client.ShardClient(definitions_file, duts_file, shards)
+    vane_shard_client.run(launcher)
 
 
 def write_results(definitions_file):
@@ -287,6 +371,9 @@ def main():
     elif args.run:
         app.app.run()
 
+    elif args.run_shard:
+        run_shard(args.run_shard)
+
     else:
         if args.nrfu:
             logging.info("Invoking the Nrfu client to run Nrfu tests")
@@ -321,7 +408,15 @@ def main():
                 )
                 create_duts_from_topo(args.generate_duts_from_topo[0])
 
-        run_tests(vane.config.DEFINITIONS_FILE, vane.config.DUTS_FILE)
+        if args.shards:
+            run_shards(
+                vane.config.DEFINITIONS_FILE,
+                vane.config.DUTS_FILE,
+                args.shards,
+                args.shard_launcher,
+            )
+        else:
+            run_tests(vane.config.DEFINITIONS_FILE, vane.config.DUTS_FILE)
         write_results(vane.config.DEFINITIONS_FILE)
         download_test_results()
 
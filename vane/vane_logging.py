@@ -5,7 +5,10 @@ import os
 
 FORMAT = "[%(asctime)s %(filename)s->%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
 
-LOG_DIRECTORY = "logs"
+# directory the logs directories are created in, the working directory by default
+LOG_ROOT_ENV = "VANE_LOG_ROOT"
+LOG_DIRECTORY = os.path.join(os.environ.get(LOG_ROOT_ENV, ""), "logs")
+NETMIKO_LOG_DIRECTORY = os.path.join(os.environ.get(LOG_ROOT_ENV, ""), "netmiko-logs")
 os.makedirs(LOG_DIRECTORY, exist_ok=True)
 log_file = os.path.join(LOG_DIRECTORY, "vane.log")
 